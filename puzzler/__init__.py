@@ -34,12 +34,28 @@ import threading
 import copy
 import optparse
 import time
+import random
+import itertools
+import Queue
+import multiprocessing
+import traceback
 import cPickle as pickle
+from cStringIO import StringIO
 from datetime import datetime, timedelta
+from puzzler import distributed
+from puzzler import exact_cover_bits
+from puzzler import exact_cover_board
+from puzzler import exact_cover_cells
 from puzzler import exact_cover_dlx
+from puzzler import exact_cover_dlxa
+from puzzler import exact_cover_implicit
 from puzzler import exact_cover_x2
+from puzzler import exact_cover_zdd
 from puzzler import info
-from puzzler.utils import thousands, plural_s
+from puzzler import preprocessing
+from puzzler import shared_matrix
+from puzzler import strategies
+from puzzler.utils import thousands, plural_s, luby
 
 try:
     import locale
@@ -56,10 +72,17 @@ version_template = (
        sys.version.split()[0], sys.platform))
 
 exact_cover_modules = {
+    'bits': exact_cover_bits,
+    'board': exact_cover_board,
+    'cells': exact_cover_cells,
     'dlx': exact_cover_dlx,
-    'x2': exact_cover_x2,}
+    'dlxa': exact_cover_dlxa,
+    'implicit': exact_cover_implicit,
+    'x2': exact_cover_x2,
+    'zdd': exact_cover_zdd,}
 
-algorithm_choices = ('x2', 'dlx',)
+algorithm_choices = ('x2', 'bits', 'dlx', 'dlxa', 'cells', 'zdd', 'board',
+                     'implicit',)
 
 try:
     from puzzler import exact_cover_c
@@ -68,6 +91,13 @@ try:
 except ImportError:
     pass
 
+try:
+    from puzzler import exact_cover_numpy
+    exact_cover_modules['numpy'] = exact_cover_numpy
+    algorithm_choices += ('numpy',)
+except ImportError:
+    pass
+
 
 class ApplicationError(StandardError):
 
@@ -83,10 +113,32 @@ def run(puzzle_class, output_stream=sys.stdout, settings=None):
     """
     if settings is None:
         settings = process_command_line()
+    check_options(settings)
+    if getattr(settings, 'algorithm', '') is None:
+        choose_algorithm(puzzle_class, settings)
     if settings.read_solution:
         read_solution(puzzle_class, settings)
     elif settings.report_search_state:
         report_search_state(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'count', False):
+        return solve_count(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'zdd', None):
+        return solve_zdd(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'first', False):
+        return solve_first(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'portfolio', False) and not settings.dry_run:
+        return solve_portfolio(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'coordinator', None) and not settings.dry_run:
+        return distributed.solve_coordinator(
+            puzzle_class, output_stream, settings)
+    elif getattr(settings, 'worker', None):
+        return distributed.work(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'shard', None):
+        return distributed.solve_shard(puzzle_class, output_stream, settings)
+    elif getattr(settings, 'merge_shards', False):
+        return distributed.merge_shards(puzzle_class, output_stream, settings)
+    elif (getattr(settings, 'jobs', None) or 1) > 1:
+        return solve_parallel(puzzle_class, output_stream, settings)
     else:
         return solve(puzzle_class, output_stream, settings)
 
@@ -97,10 +149,19 @@ def process_command_line():
         add_help_option=None)
     parser.add_option(
         '-a', '--algorithm', metavar='NAME', choices=algorithm_choices,
-        default=algorithm_choices[0],
-        help=('Choice of exact cover algorithm.  Choices: %s.'
+        help=('Choice of exact cover algorithm.  Choices: %s.  If neither '
+              'this nor --strategy is given, the winner of an earlier '
+              '--portfolio run is used, if any.'
               % ('"%s" (default), "%s"'
                  % (algorithm_choices[0], '", "'.join(algorithm_choices[1:])))))
+    parser.add_option(
+        '--strategy', metavar='NAME', choices=strategies.choices,
+        help=('Exact cover column selection strategy.  Choices: %s.  '
+              'Default: the puzzle\'s preferred strategy if it has one, '
+              'otherwise "%s".'
+              % ('; '.join('"%s" (%s)' % (name, strategies.strategies[name])
+                           for name in strategies.choices),
+                 strategies.default)))
     parser.add_option(
         '-d', '--dry-run', action='store_true',
         help=("Do a dry run: load the puzzle into memory, but don't solve it. "
@@ -109,6 +170,123 @@ def process_command_line():
         '-n', '--stop-after', type='int', metavar='N',
         help='Stop processing after generating N solution(s). '
         'Or, combined with -r/--read-solution, read solution number N.')
+    parser.add_option(
+        '--first', action='store_true',
+        help=('Find one solution quickly: randomized searches, restarted '
+              'after a growing number of searches (the Luby sequence, times '
+              '%s).  No search state is saved.  Useful with -s/--svg and '
+              '-x/--x3d.' % thousands(first_restart_unit)))
+    parser.add_option(
+        '--seed', type='int', metavar='N',
+        help=('Random seed for --first (the seed used is always reported, '
+              'to reproduce a run).  Default: random.'))
+    parser.add_option(
+        '--portfolio', action='store_true',
+        help=('Race several combinations of algorithm & column selection '
+              'strategy in parallel processes (one per CPU, at least 2), '
+              'keep the output of the first to finish (or to reach the '
+              '-n/--stop-after limit), and stop the others.  The winner is '
+              'recorded in the --portfolio-file for later runs.  No search '
+              'state is saved.'))
+    parser.add_option(
+        '-j', '--jobs', type='int', metavar='N',
+        help=('Search with N processes: the first one or two levels of the '
+              'search tree are split into independent subtrees, searched in '
+              'parallel.  Solutions are reported in search order, and the '
+              'search state is saved after each subtree.  Puzzles with at '
+              'least N components have their components searched in '
+              'parallel instead, largest first.  Multiple jobs are not '
+              'supported with --decompose or column multiplicities.'))
+    parser.add_option(
+        '--coordinator', metavar='HOST:PORT',
+        help=('Coordinate a search by --worker processes (on this or other '
+              'machines), listening on HOST:PORT (an empty HOST for all '
+              'interfaces).  The search tree is split into work items, '
+              'handed out on request; busy workers are asked to split their '
+              'items when there are none left, and the items of lost workers '
+              'are reissued.  Solutions are reported in search order, and '
+              'the work queue is saved in the search state file.  Not '
+              'supported with --decompose or column multiplicities.'))
+    parser.add_option(
+        '--worker', metavar='HOST:PORT',
+        help=('Search work items for the --coordinator at HOST:PORT, '
+              'running the same puzzle, until the search is over.  The '
+              'coordinator\'s algorithm & options are used.'))
+    parser.add_option(
+        '--authkey', metavar='KEY',
+        help=('The key authenticating --coordinator & --worker connections '
+              '(required by --worker).  Default for --coordinator: a random '
+              'key, reported for the workers.  Messages are not encrypted: '
+              'use trusted networks only.'))
+    parser.add_option(
+        '--shard', metavar='I/N',
+        help=('Search shard I (from 1 to N) of N: every Nth subtree at '
+              '--shard-depth of the search tree, starting with the Ith.  '
+              'The solutions & counts of each subtree are written to the '
+              '--shard-log, and the search state is saved after each '
+              'subtree, by default in a file of its own for each shard.  '
+              'Not supported with -n/--stop-after, --decompose or column '
+              'multiplicities.'))
+    parser.add_option(
+        '--shard-depth', type='int', metavar='D',
+        help=('The depth of the search tree at which --shard splits it '
+              '(the same for all the shards).  Default: %s.'
+              % distributed.default_shard_depth))
+    parser.add_option(
+        '--shard-log', metavar='FILE',
+        help=('The --shard log file.  Default: "%s".'
+              % distributed.shard_file_default('I', 'N', 'log')))
+    parser.add_option(
+        '--merge-shards', action='store_true',
+        help=('Merge the --shard logs given as command-line arguments (all '
+              'N shards of the same search) into the report of a single '
+              'search: the solutions in search order, and the counts.'))
+    default = portfolio_file_default()
+    parser.add_option(
+        '--portfolio-file', metavar='FILE', default=default,
+        help=('Record the --portfolio winners (by puzzle) in FILE.  '
+              'Default: "%s".' % default))
+    parser.add_option(
+        '--count', action='store_true',
+        help=('Count the solutions (before any duplicate elimination) '
+              'without producing them, with the "bits" algorithm, caching '
+              'the counts of recurring search states.  No search state is '
+              'saved.'))
+    default = exact_cover_bits.ExactCover.count_cache_size
+    parser.add_option(
+        '--cache-size', type='int', metavar='N', default=default,
+        help=('The maximum number of search states cached by --count.  '
+              'Default: %s.' % default))
+    parser.add_option(
+        '--decompose', action='store_true',
+        help=('Split the search into independent groups of columns '
+              '(e.g. separate board regions with their own pieces) '
+              'wherever possible, and solve each group once: solutions are '
+              'combinations of the groups\' solutions, and --count '
+              'multiplies their counts.  Costs time when there are no such '
+              'groups.  Solutions come in a different order, so no search '
+              'state is saved.'))
+    parser.add_option(
+        '--prune', action='store_true',
+        help=('Cut off search states which the puzzle\'s pruning check '
+              'shows to be dead ends (e.g. board regions which no '
+              'combination of the remaining pieces can fill), and report '
+              'the number of states pruned.  The solutions are the same, '
+              'with fewer searches.'))
+    parser.add_option(
+        '--preprocess', action='store_true',
+        help=('Remove the exact cover matrix rows which can\'t be part of '
+              'any solution (rows conflicting with every row of some '
+              'column) before the search, and report their number.'))
+    parser.add_option(
+        '--zdd', metavar='FILE',
+        help=('Build a zero-suppressed decision diagram (ZDD) of all the '
+              'solutions with the "zdd" algorithm, instead of producing them '
+              'one by one.  Report the number of solutions (before any '
+              'duplicate elimination) and write the diagrams (one per '
+              'puzzle component) to FILE; see '
+              'puzzler.exact_cover_zdd.read_diagrams.  No search state is '
+              'saved.'))
     parser.add_option(
         '-r', '--read-solution', metavar='FILE',
         help='Read a solution record from FILE for further processing '
@@ -147,12 +325,56 @@ def process_command_line():
     parser.add_option(
         '-h', '--help', help='Show this help message and exit.', action='help')
     settings, args = parser.parse_args()
-    if args:
+    if settings.merge_shards:
+        settings.shard_logs = args
+    elif args:
         print >>sys.stderr, (
             '%s takes no command-line arguments; "%s" ignored.'
             % (sys.argv[0], ' '.join(args)))
     return settings
 
+def check_options(settings):
+    """
+    Exit if `settings` combine search modes, or give a mode options it would
+    ignore.
+    """
+    modes = [name for (name, value) in (
+        ('--count', getattr(settings, 'count', False)),
+        ('--zdd', getattr(settings, 'zdd', None)),
+        ('--first', getattr(settings, 'first', False)),
+        ('--portfolio', getattr(settings, 'portfolio', False)),
+        ('--coordinator', getattr(settings, 'coordinator', None)),
+        ('--worker', getattr(settings, 'worker', None)),
+        ('--shard', getattr(settings, 'shard', None)),
+        ('--merge-shards', getattr(settings, 'merge_shards', False)),
+        ('-j/--jobs', (getattr(settings, 'jobs', 1) or 1) > 1))
+             if value]
+    if len(modes) > 1:
+        print >>sys.stderr, '%s cannot be combined.' % ' & '.join(modes)
+        sys.exit(1)
+    if not modes:
+        return
+    mode = modes[0]
+    # the algorithms used by each mode, if not the selected one:
+    algorithms = {'--count': ('bits',), '--zdd': ('zdd',), '--portfolio': (),
+                  '--worker': (), '--merge-shards': ()}
+    algorithm = getattr(settings, 'algorithm', None)
+    if algorithm and algorithm not in algorithms.get(mode, (algorithm,)):
+        print >>sys.stderr, (
+            '%s does not support -a/--algorithm %s.' % (mode, algorithm))
+        sys.exit(1)
+    # the options ignored by each mode:
+    ignored = {'--count': ('stop_after',),
+               '--zdd': ('decompose', 'prune', 'stop_after'),
+               '--first': ('decompose', 'prune', 'preprocess', 'strategy',
+                           'stop_after')}
+    for option in ignored.get(mode, ()):
+        if getattr(settings, option, None):
+            print >>sys.stderr, (
+                '%s does not support --%s.'
+                % (mode, {'stop_after': 'stop-after'}.get(option, option)))
+            sys.exit(1)
+
 def search_state_default():
     """Return the default name for the search state file."""
     prog = os.path.basename(sys.argv[0])
@@ -160,6 +382,104 @@ def search_state_default():
         prog = prog[:prog.rfind('.py')]
     return '%s.state' % prog
 
+def portfolio_file_default():
+    """Return the default name for the portfolio record file."""
+    return os.path.join(os.path.expanduser('~'), '.puzzler-portfolio')
+
+def choose_algorithm(puzzle_class, settings):
+    """
+    No algorithm was specified: use the configuration recorded by an earlier
+    `solve_portfolio` run if there is one (and no strategy was specified),
+    otherwise the default algorithm (among those supporting column
+    multiplicities, if the puzzle requires them, or decomposition, pruning,
+    searches split into subtrees, and randomized restarts (--first), if
+    requested).
+    """
+    multiplicities = requires_multiplicities(puzzle_class)
+    capabilities = [capability for (option, capability)
+                    in (('decompose', 'decomposition'), ('prune', 'pruning'),
+                        ('first', 'restarts'))
+                    if getattr(settings, option, False)]
+    if splits_search(settings):
+        capabilities.append('subtrees')
+    settings.algorithm = [
+        algorithm for algorithm in algorithm_choices
+        if ( (not multiplicities
+              or matrix_options(exact_cover_modules[algorithm].ExactCover)[
+                  'multiplicities'])
+             and all(has_capability(algorithm, capability)
+                     for capability in capabilities))][0]
+    if capabilities:
+        return
+    path = getattr(settings, 'portfolio_file', None)
+    if ( getattr(settings, 'strategy', None) or getattr(settings, 'portfolio',
+                                                         False) or not path):
+        return
+    record = read_portfolio_record(path).get(portfolio_key(puzzle_class))
+    if record and record[0] in exact_cover_modules:
+        settings.algorithm, settings.strategy = record
+        print >>sys.stderr, (
+            'Using the portfolio winner for %s: -a %s --strategy %s'
+            % (puzzle_class.__name__, settings.algorithm, settings.strategy))
+
+def has_capability(algorithm, capability):
+    """
+    Return True if the exact cover engine of `algorithm` has `capability`,
+    declared by a class attribute of its ``ExactCover``.  Capabilities are
+    not assumed, except for 'restarts' (randomized column strategies and
+    search limits, used by `solve_first`), which only the C extension
+    lacks.
+    """
+    return getattr(exact_cover_modules[algorithm].ExactCover, capability,
+                   capability == 'restarts')
+
+def splits_search(settings):
+    """
+    Return True if `settings` request a search split into subtrees (with
+    -j/--jobs, --coordinator/--worker, or --shard).
+    """
+    return bool((getattr(settings, 'jobs', 1) or 1) > 1
+                or getattr(settings, 'coordinator', None)
+                or getattr(settings, 'worker', None)
+                or getattr(settings, 'shard', None))
+
+def check_subtrees(settings, options):
+    """
+    Exit if the selected algorithm's search can't be split into the subtrees
+    of `puzzler.exact_cover_bits.ExactCover.subtree_prefixes` (with
+    `options`): its searches and solutions would differ from a whole
+    search's.
+    """
+    if has_capability(settings.algorithm, 'subtrees'):
+        return
+    print >>sys.stderr, (
+        'The "%s" algorithm does not support %s (its search tree differs '
+        'from the subtree split\'s).  Use %s.'
+        % (settings.algorithm, options,
+           ' or '.join('-a %s' % algorithm for algorithm in algorithm_choices
+                       if has_capability(algorithm, 'subtrees'))))
+    sys.exit(1)
+
+def check_preprocess(state, settings):
+    """
+    Exit if the search `state` being resumed was saved with the opposite
+    --preprocess setting (preprocessing renumbers the matrix rows, so its
+    partial solutions would be replayed against the wrong rows).  Otherwise
+    record the setting in `state`.
+    """
+    preprocess = bool(getattr(settings, 'preprocess', False))
+    if state.num_searches and state.preprocess != preprocess:
+        if state.preprocess:
+            print >>sys.stderr, (
+                'The search state file was saved with --preprocess.  Use '
+                '"--preprocess", or remove the file.')
+        else:
+            print >>sys.stderr, (
+                'The search state file was saved without --preprocess.  '
+                'Resume without --preprocess, or remove the file.')
+        sys.exit(1)
+    state.preprocess = preprocess
+
 def read_solution(puzzle_class, settings):
     """A solution record was supplied; just read & process it."""
     puzzle = puzzle_class.components()[0](init_puzzle=False)
@@ -175,8 +495,9 @@ def read_solution(puzzle_class, settings):
 def report_search_state(puzzle_class, output_stream, settings):
     state = SessionState.restore(settings.search_state_file, read_only=True)
     solver = exact_cover_modules[settings.algorithm].ExactCover(state=state)
-    puzzle = puzzle_class.components()[0]()
-    solver.load_matrix(puzzle.matrix, puzzle.secondary_columns)
+    puzzle = make_puzzle(puzzle_class.components()[0], solver)
+    # the rows are numbered as in the saved search:
+    load_matrix(solver, puzzle, preprocessed_matrix(puzzle, state))
     solution = solver.full_solution()
     if state.num_searches:
         print >>output_stream, (
@@ -192,16 +513,69 @@ def report_search_state(puzzle_class, output_stream, settings):
     if settings.x3d:
         puzzle.write_x3d(settings.x3d, solution)
 
-def solve(puzzle_class, output_stream, settings):
-    """Find and record all solutions to a puzzle.  Report on `output_stream`."""
+def solve(puzzle_class, output_stream, settings, puzzles=None):
+    """
+    Find and record all solutions to a puzzle.  Report on `output_stream`.
+    `puzzles` is an optional list of already instantiated puzzle components
+    (used when no search state is being resumed).
+    """
     start = datetime.now()
+    decompose = getattr(settings, 'decompose', False)
+    prune = getattr(settings, 'prune', False)
+    check_multiplicities(puzzle_class, settings.algorithm)
     try:
-        state = SessionState.restore(settings.search_state_file)
+        if decompose:
+            # solutions come in a different order; no resuming
+            state = SessionState.restore(None)
+        else:
+            state = SessionState.restore(settings.search_state_file)
     except IOError, error:
         print >>sys.stderr, 'Unable to initialize the search state file:'
         print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
         sys.exit(1)
-    solver = exact_cover_modules[settings.algorithm].ExactCover(state=state)
+    strategy = (getattr(settings, 'strategy', None)
+                or puzzle_class.column_strategy or strategies.default)
+    if state.num_searches and state.strategy != strategy:
+        print >>sys.stderr, (
+            'The search state file was saved with the "%s" column selection '
+            'strategy, not "%s".  Use "--strategy=%s", or remove the file.'
+            % (state.strategy, strategy, state.strategy))
+        sys.exit(1)
+    check_preprocess(state, settings)
+    state.strategy = strategy
+    if state.subtrees:
+        print >>sys.stderr, (
+            'The search state file was saved by a -j/--jobs search.  Use '
+            '"--jobs", or remove the file.')
+        sys.exit(1)
+    if state.work_items is not None:
+        print >>sys.stderr, (
+            'The search state file was saved by a --coordinator search.  Use '
+            '"--coordinator", or remove the file.')
+        sys.exit(1)
+    if state.shard is not None:
+        print >>sys.stderr, (
+            'The search state file was saved by a --shard search.  Use '
+            '"--shard %s/%s", or remove the file.' % state.shard[:2])
+        sys.exit(1)
+    try:
+        solver = exact_cover_modules[settings.algorithm].ExactCover(
+            state=state, strategy=strategy)
+    except strategies.StrategyError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    if decompose:
+        if not getattr(solver, 'decomposition', False):
+            print >>sys.stderr, (
+                'The "%s" algorithm does not support --decompose.'
+                % settings.algorithm)
+            sys.exit(1)
+        solver.decompose = True
+    if prune and not getattr(solver, 'pruning', False):
+        print >>sys.stderr, (
+            'The "%s" algorithm does not support --prune.'
+            % settings.algorithm)
+        sys.exit(1)
     if state.num_searches:
         print >>output_stream, (
             '\nResuming session (%s solution%s, %s searches).\n'
@@ -210,29 +584,33 @@ def solve(puzzle_class, output_stream, settings):
                thousands(state.num_searches)))
         output_stream.flush()
     starting_solutions = state.num_solutions
-    matrices = []
     stats = []
-    puzzles = []
+    if state.completed_components:
+        puzzles = None
     try:
         try:
-            for component in puzzle_class.components():
-                if component.__name__ not in state.completed_components:
-                    # !!! instantiate inside the loop instead?  will save time
-                    # initially (and memory) with multi-part puzzles
-                    puzzles.append(component())
+            if puzzles is None:
+                puzzles = []
+                for component in puzzle_class.components():
+                    if component.__name__ not in state.completed_components:
+                        # !!! instantiate inside the loop instead?  will save
+                        # time initially (and memory) with multi-part puzzles
+                        puzzles.append(make_puzzle(component, solver))
             for puzzle in puzzles:
                 check_matrix_for_duplicate_rows(puzzle)
-                matrices.append((puzzle.matrix, puzzle.secondary_columns))
             if settings.dry_run:
                 return
             state.init_periodic_save(solver)
             last_solutions = state.last_solutions
             last_searches = state.last_searches
-            for i, puzzle in enumerate(puzzles):
+            for puzzle in puzzles:
                 print >>output_stream, ('solving %s:\n'
                                         % puzzle.__class__.__name__)
                 output_stream.flush()
-                solver.load_matrix(*matrices[i])
+                matrix = preprocessed_matrix(puzzle, settings, output_stream)
+                if prune:
+                    solver.pruning_check = puzzle.pruning_check()
+                load_matrix(solver, puzzle, matrix)
                 for solution in solver.solve():
                     state.save(solver)
                     if not puzzle.record_solution(solution, solver,
@@ -268,10 +646,11 @@ def solve(puzzle_class, output_stream, settings):
         end = datetime.now()
         duration = end - start
         print >>output_stream, (
-            '%s solution%s, %s searches, duration %s'
+            '%s solution%s, %s searches%s, duration %s'
             % (thousands(solver.num_solutions),
                plural_s(solver.num_solutions),
                thousands(solver.num_searches),
+               pruned_report(getattr(solver, 'num_pruned', 0), prune),
                duration))
         if len(stats) > 1:
             for i, (solutions, searches) in enumerate(stats):
@@ -285,6 +664,938 @@ def solve(puzzle_class, output_stream, settings):
         state.cleanup()
     return solver.num_solutions
 
+subtrees_per_job = 4
+"""The minimum number of subtrees per process of a `solve_parallel` search
+(to keep the processes busy while the subtree sizes vary)."""
+
+def solve_parallel(puzzle_class, output_stream, settings):
+    """
+    Find and record all solutions to a puzzle with `settings.jobs` worker
+    processes.  Report on `output_stream`.
+
+    The first levels of the search tree are expanded into independent
+    subtrees (see `puzzler.exact_cover_bits.ExactCover.subtree_prefixes`),
+    each identified by a partial solution (a list of row indices), as a
+    resumed search is.  The subtrees are searched by a pool of processes
+    (see `parallel_worker`), and their solutions are recorded here, in
+    subtree order: the order of the solutions doesn't depend on the number
+    of processes.  The search state is saved after each subtree.
+
+    Puzzles split into at least as many components as processes have their
+    components searched concurrently instead, whole (see
+    `solve_components_parallel`).
+
+    The worker processes get their matrices as `puzzler.shared_matrix`
+    files, mapped into memory: one compact copy is shared by all, and
+    handing it over is cheap however large the matrix.
+    """
+    start = datetime.now()
+    prune = getattr(settings, 'prune', False)
+    if getattr(settings, 'decompose', False):
+        print >>sys.stderr, '-j/--jobs does not support --decompose.'
+        sys.exit(1)
+    if requires_multiplicities(puzzle_class):
+        print >>sys.stderr, (
+            '-j/--jobs does not support column multiplicities, required by '
+            '%s.' % puzzle_class.__name__)
+        sys.exit(1)
+    try:
+        state = SessionState.restore(settings.search_state_file)
+    except IOError, error:
+        print >>sys.stderr, 'Unable to initialize the search state file:'
+        print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
+        sys.exit(1)
+    strategy = (getattr(settings, 'strategy', None)
+                or puzzle_class.column_strategy or strategies.default)
+    if state.num_searches and state.strategy != strategy:
+        print >>sys.stderr, (
+            'The search state file was saved with the "%s" column selection '
+            'strategy, not "%s".  Use "--strategy=%s", or remove the file.'
+            % (state.strategy, strategy, state.strategy))
+        sys.exit(1)
+    check_preprocess(state, settings)
+    if state.solution:
+        print >>sys.stderr, (
+            'The search state file was saved by a single-process search.  '
+            'Resume without -j/--jobs, or remove the file.')
+        sys.exit(1)
+    if state.work_items is not None:
+        print >>sys.stderr, (
+            'The search state file was saved by a --coordinator search.  Use '
+            '"--coordinator", or remove the file.')
+        sys.exit(1)
+    if state.shard is not None:
+        print >>sys.stderr, (
+            'The search state file was saved by a --shard search.  Use '
+            '"--shard %s/%s", or remove the file.' % state.shard[:2])
+        sys.exit(1)
+    state.strategy = strategy
+    module = exact_cover_modules[settings.algorithm]
+    try:
+        # formats the solutions, and keeps the totals:
+        solver = module.ExactCover(strategy=strategy)
+    except strategies.StrategyError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    if prune and not getattr(solver, 'pruning', False):
+        print >>sys.stderr, (
+            'The "%s" algorithm does not support --prune.'
+            % settings.algorithm)
+        sys.exit(1)
+    solver.num_solutions = state.num_solutions
+    solver.num_searches = state.num_searches
+    num_pruned = 0
+    if state.num_searches:
+        print >>output_stream, (
+            '\nResuming session (%s solution%s, %s searches).\n'
+            % (thousands(state.num_solutions),
+               plural_s(state.num_solutions),
+               thousands(state.num_searches)))
+        output_stream.flush()
+    starting_solutions = state.num_solutions
+    options = dict(colored_columns=matrix_options(module.ExactCover)[
+        'colored_columns'])
+    puzzles = [component(**options)
+               for component in puzzle_class.components()
+               if component.__name__ not in state.completed_components]
+    for puzzle in puzzles:
+        check_matrix_for_duplicate_rows(puzzle)
+    by_components = (len(puzzles) > 1 and len(puzzles) >= settings.jobs
+                     and state.subtrees is None)
+    if not by_components:
+        # components are searched whole, by any algorithm
+        check_subtrees(settings, '-j/--jobs')
+    if settings.dry_run:
+        return
+    stats = []
+    pool = None
+    shared = []
+    saved = None
+    try:
+        try:
+            if by_components:
+                pool = multiprocessing.Pool(settings.jobs)
+                num_pruned = solve_components_parallel(
+                    puzzles, pool, solver, state, strategy, settings,
+                    output_stream, starting_solutions, stats, shared)
+                subtree_puzzles = []
+            else:
+                subtree_puzzles = puzzles
+            for puzzle in subtree_puzzles:
+                print >>output_stream, ('solving %s:\n'
+                                        % puzzle.__class__.__name__)
+                output_stream.flush()
+                last_solutions = solver.num_solutions
+                last_searches = solver.num_searches
+                matrix = (preprocessed_matrix(puzzle, settings, output_stream)
+                          or puzzle.matrix)
+                if state.subtrees is None:
+                    splitter = exact_cover_bits.ExactCover(
+                        matrix, puzzle.secondary_columns, strategy=strategy)
+                    state.subtrees = splitter.subtree_prefixes(
+                        settings.jobs * subtrees_per_job)
+                    state.subtree_index = 0
+                    solver.num_searches += splitter.num_searches
+                    del splitter
+                # the totals as of the last completed subtree:
+                saved = (solver.num_solutions, solver.num_searches)
+                prefixes = state.subtrees[state.subtree_index:]
+                print >>output_stream, (
+                    'searching %s subtree%s with %s processes\n'
+                    % (thousands(len(prefixes)), plural_s(len(prefixes)),
+                       settings.jobs))
+                output_stream.flush()
+                solver.load_matrix(matrix, puzzle.secondary_columns)
+                limit = None
+                if settings.stop_after and not puzzle.check_for_duplicates:
+                    limit = (settings.stop_after
+                             - (solver.num_solutions - starting_solutions))
+                shared.append(shared_matrix.pack(matrix))
+                pool = multiprocessing.Pool(
+                    settings.jobs, init_parallel_worker,
+                    (shared[-1], puzzle.secondary_columns, settings.algorithm,
+                     strategy, prune and puzzle.pruning_check(), limit))
+                results = pool.imap(parallel_worker, prefixes)
+                stop = False
+                for solutions, searches, pruned in interruptible(results):
+                    solver.num_searches += searches
+                    num_pruned += pruned
+                    stop = record_parallel_solutions(
+                        puzzle, solver, solutions, settings, output_stream,
+                        starting_solutions)
+                    if stop:
+                        break
+                    state.subtree_index += 1
+                    state.save(solver, final=True)
+                    saved = (solver.num_solutions, solver.num_searches)
+                pool.terminate()
+                pool.join()
+                pool = None
+                shared.pop().close()
+                stats.append((solver.num_solutions - last_solutions,
+                              solver.num_searches - last_searches))
+                if stop:
+                    print >>output_stream, (
+                        'User-requested solution limit reached.')
+                    break
+                state.subtrees = None
+                state.subtree_index = 0
+                state.completed_components.add(puzzle.__class__.__name__)
+                state.save(solver, final=True)
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            if saved:
+                # the current subtree will be searched again on resume:
+                solver.num_solutions, solver.num_searches = saved
+            state.save(solver, final=True)
+            state.close()
+            sys.exit(1)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        for packed in shared:
+            packed.close()
+        end = datetime.now()
+        duration = end - start
+        print >>output_stream, (
+            '%s solution%s, %s searches%s, duration %s'
+            % (thousands(solver.num_solutions),
+               plural_s(solver.num_solutions),
+               thousands(solver.num_searches),
+               pruned_report(num_pruned, prune),
+               duration))
+        if len(stats) > 1:
+            for i, (solutions, searches) in enumerate(stats):
+                print >>output_stream, (
+                    '(%s: %s solution%s, %s searches)'
+                    % (puzzles[i].__class__.__name__,
+                       thousands(solutions),
+                       plural_s(solutions),
+                       thousands(searches)))
+        output_stream.flush()
+        state.cleanup()
+    return solver.num_solutions
+
+def solve_components_parallel(puzzles, pool, solver, state, strategy,
+                              settings, output_stream, starting_solutions,
+                              stats, shared):
+    """
+    Search the components of a `solve_parallel` session concurrently, one
+    `pool` process per component, and record their solutions on
+    `output_stream` in component order.  The components are scheduled
+    largest first (by number of matrix rows) to keep the processes busy
+    until the end.  The per-component (solutions, searches) totals are
+    appended to `stats`, and each component is recorded as completed in the
+    search `state` (saved) once its solutions are recorded.  The matrices
+    are handed to the processes as `puzzler.shared_matrix` files, appended
+    to `shared` (to be closed by the caller).  Return the number of states
+    pruned.
+    """
+    prune = getattr(settings, 'prune', False)
+    matrices = [preprocessed_matrix(puzzle, settings, output_stream)
+                or puzzle.matrix for puzzle in puzzles]
+    limit = None
+    if settings.stop_after:
+        limit = (settings.stop_after
+                 - (solver.num_solutions - starting_solutions))
+    results = [None] * len(puzzles)
+    order = sorted(range(len(puzzles)), key=lambda i: -len(matrices[i]))
+    for i in order:
+        puzzle = puzzles[i]
+        shared.append(shared_matrix.pack(matrices[i]))
+        results[i] = pool.apply_async(search_worker, (
+            shared[-1], puzzle.secondary_columns, settings.algorithm,
+            strategy, prune and puzzle.pruning_check(),
+            not puzzle.check_for_duplicates and limit or None))
+    print >>output_stream, (
+        'searching %s components with %s processes, largest first (%s)\n'
+        % (len(puzzles), settings.jobs,
+           ', '.join(puzzles[i].__class__.__name__ for i in order)))
+    output_stream.flush()
+    num_pruned = 0
+    # the totals as of the last completed component:
+    saved = (solver.num_solutions, solver.num_searches)
+    try:
+        for i, puzzle in enumerate(puzzles):
+            solutions, searches, pruned = wait_for(results[i])
+            print >>output_stream, ('solving %s:\n'
+                                    % puzzle.__class__.__name__)
+            output_stream.flush()
+            solver.num_searches += searches
+            num_pruned += pruned
+            solver.load_matrix(matrices[i], puzzle.secondary_columns)
+            stop = record_parallel_solutions(
+                puzzle, solver, solutions, settings, output_stream,
+                starting_solutions)
+            stats.append((solver.num_solutions - saved[0],
+                          solver.num_searches - saved[1]))
+            if stop:
+                print >>output_stream, 'User-requested solution limit reached.'
+                break
+            state.completed_components.add(puzzle.__class__.__name__)
+            state.save(solver, final=True)
+            saved = (solver.num_solutions, solver.num_searches)
+    except KeyboardInterrupt:
+        # the current component will be searched again on resume:
+        solver.num_solutions, solver.num_searches = saved
+        raise
+    return num_pruned
+
+def record_parallel_solutions(puzzle, solver, solutions, settings,
+                              output_stream, starting_solutions):
+    """
+    Record the `solutions` (lists of row indices) of `puzzle` found by
+    `solve_parallel` worker processes, as `solve` does, with `solver` (its
+    matrix loaded).  Return True if the user-requested solution limit is
+    reached.
+    """
+    for rows in solutions:
+        solver.solution[:] = rows
+        solution = solver.full_solution()
+        if not puzzle.record_solution(solution, solver, stream=output_stream):
+            continue
+        if settings.svg:
+            puzzle.write_svg(settings.svg, solution, thin=settings.thin_svg)
+            settings.svg = False
+        if settings.x3d:
+            puzzle.write_x3d(settings.x3d, solution)
+            settings.x3d = False
+        if ( settings.stop_after
+             and ((solver.num_solutions - starting_solutions)
+                  >= settings.stop_after)):
+            return True
+    return False
+
+wait_interval = 1
+"""The number of seconds between checks for keyboard interrupts while
+waiting for worker process results."""
+
+def wait_for(result):
+    """
+    Return the value of `result` (a `multiprocessing` asynchronous result).
+    A wait without a timeout would block keyboard interrupts.
+    """
+    while True:
+        try:
+            return result.get(wait_interval)
+        except multiprocessing.TimeoutError:
+            pass
+
+def interruptible(results):
+    """
+    Iterate over `results` (a `multiprocessing.Pool.imap` iterator),
+    allowing keyboard interrupts while waiting (see `wait_for`).
+    """
+    while True:
+        try:
+            yield results.next(wait_interval)
+        except multiprocessing.TimeoutError:
+            pass
+        except StopIteration:
+            return
+
+parallel_search = None
+"""The search settings of a `solve_parallel` worker process: a tuple of
+the arguments of `init_parallel_worker`."""
+
+def init_parallel_worker(matrix, secondary, algorithm, strategy,
+                         pruning_check, limit):
+    """
+    Initialize a `solve_parallel` worker process: store the exact cover
+    `matrix` (with `secondary` secondary columns), the `algorithm` &
+    `strategy` names, the `pruning_check` (or None), and the maximum number
+    of solutions per subtree (`limit`, or None).
+    """
+    global parallel_search
+    parallel_search = (
+        matrix, secondary, algorithm, strategy, pruning_check, limit)
+
+def parallel_worker(prefix):
+    """
+    Search the subtree of partial solution `prefix` (a list of row indices)
+    in a `solve_parallel` worker process (see `search_prefix`).
+    """
+    matrix, secondary, algorithm, strategy, pruning_check, limit = (
+        parallel_search)
+    return search_prefix(matrix, secondary, prefix, algorithm, strategy,
+                         pruning_check, limit)
+
+def search_prefix(matrix, secondary, prefix, algorithm, strategy,
+                  pruning_check=None, limit=None):
+    """
+    Search the subtree of partial solution `prefix` (a list of row indices)
+    of exact cover `matrix` (with `secondary` secondary columns), as
+    `search_worker` does.  Return a 3-tuple: a list of the solutions (lists
+    of row indices of the full matrix, starting with `prefix`), the number
+    of searches, and the number of states pruned.
+    """
+    reduced, row_indices = prefix_matrix(matrix, secondary, prefix)
+    if len(reduced[0]) == secondary:
+        # all primary columns are covered: the prefix is a solution
+        return [prefix], 0, 0
+    solutions, searches, pruned = search_worker(
+        reduced, secondary, algorithm, strategy, pruning_check, limit)
+    return ([prefix + [row_indices[r] for r in rows] for rows in solutions],
+            searches, pruned)
+
+def search_worker(matrix, secondary, algorithm, strategy, pruning_check,
+                  limit):
+    """
+    Search exact cover `matrix` (with `secondary` secondary columns) with
+    the `algorithm` & `strategy` named, and the `pruning_check` (or None),
+    in a `solve_parallel` worker process.  Return a 3-tuple: a list of up
+    to `limit` (or all, if None) solutions (lists of row indices), the
+    number of searches, and the number of states pruned.
+    """
+    solver = exact_cover_modules[algorithm].ExactCover(strategy=strategy)
+    if pruning_check:
+        solver.pruning_check = pruning_check
+    solver.load_matrix(matrix, secondary)
+    solutions = []
+    for solution in solver.solve():
+        solutions.append(list(solver.solution))
+        if len(solutions) == limit:
+            break
+    return solutions, solver.num_searches, getattr(solver, 'num_pruned', 0)
+
+def prefix_matrix(matrix, secondary, prefix):
+    """
+    Return a 2-tuple: the exact cover subproblem of `matrix` (with
+    `secondary` secondary columns) left once the rows of `prefix` (a list
+    of row indices) are chosen, and a list of the indices in `matrix` of
+    its rows.  The primary columns covered by `prefix` and the rows
+    conflicting with it are left out; secondary columns are all kept.
+    """
+    header = matrix[0]
+    num_primary = len(header) - secondary
+    covered = set()
+    colors = {}
+    for r in prefix:
+        for j, value in enumerate(matrix[r + 1]):
+            if not value:
+                continue
+            if j < num_primary:
+                covered.add(j)
+            elif isinstance(value, tuple):
+                colors[j] = value[1]
+            else:
+                colors[j] = None
+    kept = [j for j in range(len(header)) if j not in covered]
+    reduced = [tuple(header[j] for j in kept)]
+    row_indices = []
+    for r, row in enumerate(matrix[1:]):
+        for j, value in enumerate(row):
+            if value and (
+                    j in covered
+                    or (j in colors
+                        and (colors[j] is None
+                             or not isinstance(value, tuple)
+                             or value[1] != colors[j]))):
+                break
+        else:
+            reduced.append(tuple(row[j] for j in kept))
+            row_indices.append(r)
+    return reduced, row_indices
+
+first_restart_unit = 1000
+"""The search limit of the first `solve_first` attempt(s); it is multiplied by
+the terms of the Luby sequence for subsequent attempts."""
+
+def solve_first(puzzle_class, output_stream, settings):
+    """
+    Find and record one solution to a puzzle, as quickly as possible.  Report
+    on `output_stream`.
+
+    Each attempt shuffles the matrix rows, breaks column selection ties at
+    random, and is limited to a number of searches following the Luby
+    sequence.  An attempt that ends within its limit exhausted the search:
+    that puzzle (component) has no solutions.  Attempts are reproducible from
+    the random seed.
+    """
+    start = datetime.now()
+    seed = settings.seed
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+    rng = random.Random(seed)
+    if not has_capability(settings.algorithm, 'restarts'):
+        print >>sys.stderr, (
+            'The "%s" algorithm does not support --first.' % settings.algorithm)
+        sys.exit(1)
+    check_multiplicities(puzzle_class, settings.algorithm)
+    module = exact_cover_modules[settings.algorithm]
+    num_solutions = 0
+    num_searches = 0
+    attempts = 0
+    print >>output_stream, 'random seed: %s\n' % seed
+    output_stream.flush()
+    try:
+        try:
+            for component in puzzle_class.components():
+                puzzle = component(**matrix_options(module.ExactCover))
+                check_matrix_for_duplicate_rows(puzzle)
+                if settings.dry_run:
+                    continue
+                print >>output_stream, ('solving %s:\n'
+                                        % puzzle.__class__.__name__)
+                output_stream.flush()
+                header = puzzle.matrix[0]
+                rows = list(puzzle.matrix[1:])
+                for attempt in itertools.count(1):
+                    attempts += 1
+                    rng.shuffle(rows)
+                    strategy = strategies.random_strategy(rng.getrandbits(32))
+                    try:
+                        solver = module.ExactCover(strategy=strategy)
+                    except strategies.StrategyError, error:
+                        print >>sys.stderr, error
+                        sys.exit(1)
+                    solver.max_searches = luby(attempt) * first_restart_unit
+                    load_matrix(solver, puzzle, [header] + rows)
+                    for solution in solver.solve():
+                        puzzle.record_solution(
+                            solution, solver, stream=output_stream)
+                        num_solutions = 1
+                        if settings.svg:
+                            puzzle.write_svg(
+                                settings.svg, solution, thin=settings.thin_svg)
+                        if settings.x3d:
+                            puzzle.write_x3d(settings.x3d, solution)
+                        break
+                    num_searches += solver.num_searches
+                    if ( num_solutions
+                         or solver.num_searches < solver.max_searches):
+                        # found one, or exhausted the search space
+                        break
+                if num_solutions:
+                    break
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            sys.exit(1)
+    finally:
+        end = datetime.now()
+        duration = end - start
+        print >>output_stream, (
+            '%s solution%s, %s searches, %s attempt%s, random seed %s, '
+            'duration %s'
+            % (thousands(num_solutions), plural_s(num_solutions),
+               thousands(num_searches), thousands(attempts),
+               plural_s(attempts), seed, duration))
+        output_stream.flush()
+    return num_solutions
+
+def solve_count(puzzle_class, output_stream, settings):
+    """
+    Count the solutions to a puzzle, with the "bits" algorithm's cached
+    counting (and decomposition & pruning, if requested).  Report on
+    `output_stream`.
+    """
+    start = datetime.now()
+    strategy = (getattr(settings, 'strategy', None)
+                or puzzle_class.column_strategy or strategies.default)
+    module = exact_cover_bits
+    cache_size = getattr(settings, 'cache_size', None)
+    prune = getattr(settings, 'prune', False)
+    num_solutions = 0
+    num_searches = 0
+    num_pruned = 0
+    try:
+        try:
+            for component in puzzle_class.components():
+                puzzle = component(**matrix_options(module.ExactCover))
+                check_matrix_for_duplicate_rows(puzzle)
+                if settings.dry_run:
+                    continue
+                print >>output_stream, ('solving %s:\n'
+                                        % puzzle.__class__.__name__)
+                output_stream.flush()
+                try:
+                    solver = module.ExactCover(strategy=strategy)
+                except strategies.StrategyError, error:
+                    print >>sys.stderr, error
+                    sys.exit(1)
+                solver.decompose = getattr(settings, 'decompose', False)
+                if prune:
+                    solver.pruning_check = puzzle.pruning_check()
+                matrix = preprocessed_matrix(puzzle, settings, output_stream)
+                load_matrix(solver, puzzle, matrix)
+                count = solver.count_solutions(cache_size)
+                num_solutions += count
+                num_searches += solver.num_searches
+                num_pruned += solver.num_pruned
+                print >>output_stream, (
+                    '%s solution%s, %s searches%s\n'
+                    % (thousands(count), plural_s(count),
+                       thousands(solver.num_searches),
+                       pruned_report(solver.num_pruned, prune)))
+                output_stream.flush()
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            sys.exit(1)
+    finally:
+        end = datetime.now()
+        duration = end - start
+        print >>output_stream, (
+            '%s solution%s, %s searches%s, duration %s'
+            % (thousands(num_solutions), plural_s(num_solutions),
+               thousands(num_searches), pruned_report(num_pruned, prune),
+               duration))
+        output_stream.flush()
+    return num_solutions
+
+def solve_zdd(puzzle_class, output_stream, settings):
+    """
+    Build a ZDD of all solutions to each component of a puzzle, with the
+    "zdd" algorithm, and save them to the `settings.zdd` file.  Report the
+    number of solutions on `output_stream`.  The first solution is written
+    to the SVG & X3D files, if requested.
+    """
+    start = datetime.now()
+    check_multiplicities(puzzle_class, 'zdd')
+    strategy = (getattr(settings, 'strategy', None)
+                or puzzle_class.column_strategy or strategies.default)
+    module = exact_cover_zdd
+    diagrams = []
+    num_solutions = 0
+    num_searches = 0
+    try:
+        try:
+            for component in puzzle_class.components():
+                puzzle = component(**matrix_options(module.ExactCover))
+                check_matrix_for_duplicate_rows(puzzle)
+                if settings.dry_run:
+                    continue
+                print >>output_stream, ('solving %s:\n'
+                                        % puzzle.__class__.__name__)
+                output_stream.flush()
+                try:
+                    solver = module.ExactCover(strategy=strategy)
+                except strategies.StrategyError, error:
+                    print >>sys.stderr, error
+                    sys.exit(1)
+                matrix = preprocessed_matrix(puzzle, settings, output_stream)
+                load_matrix(solver, puzzle, matrix)
+                solver.build_zdd()
+                diagram = solver.zdd
+                diagram.name = puzzle.__class__.__name__
+                diagrams.append(diagram)
+                count = diagram.count()
+                num_solutions += count
+                num_searches += solver.num_searches
+                print >>output_stream, (
+                    '%s solution%s, %s searches, %s ZDD nodes\n'
+                    % (thousands(count), plural_s(count),
+                       thousands(solver.num_searches),
+                       thousands(len(diagram))))
+                output_stream.flush()
+                if count and settings.svg:
+                    puzzle.write_svg(settings.svg, diagram.solution(0),
+                                     thin=settings.thin_svg)
+                    settings.svg = False
+                if count and settings.x3d:
+                    puzzle.write_x3d(settings.x3d, diagram.solution(0))
+                    settings.x3d = False
+            if not settings.dry_run:
+                exact_cover_zdd.write_diagrams(settings.zdd, diagrams)
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            sys.exit(1)
+    finally:
+        end = datetime.now()
+        duration = end - start
+        print >>output_stream, (
+            '%s solution%s, %s searches, duration %s'
+            % (thousands(num_solutions), plural_s(num_solutions),
+               thousands(num_searches), duration))
+        output_stream.flush()
+    return num_solutions
+
+def solve_portfolio(puzzle_class, output_stream, settings):
+    """
+    Race several combinations of algorithm & column selection strategy on a
+    puzzle, each in its own process, and report the output of the first to
+    finish (or to reach the solution limit) on `output_stream`.  The others
+    are stopped.  The winning combination is recorded in the portfolio file.
+    A worker process which dies without a result (killed, or crashed in a
+    C extension) counts as a failed combination.
+    """
+    start = datetime.now()
+    path = getattr(settings, 'portfolio_file', None)
+    if path:
+        records = read_portfolio_record(path)
+    else:
+        records = {}
+    key = portfolio_key(puzzle_class)
+    size = max(2, multiprocessing.cpu_count())
+    configurations = portfolio_configurations(records.get(key))
+    if requires_multiplicities(puzzle_class):
+        configurations = [
+            (algorithm, strategy) for (algorithm, strategy) in configurations
+            if matrix_options(exact_cover_modules[algorithm].ExactCover)[
+                'multiplicities']]
+    configurations = configurations[:size]
+    print >>output_stream, (
+        'portfolio: racing %s configurations: %s\n'
+        % (len(configurations),
+           ', '.join('%s/%s' % pair for pair in configurations)))
+    output_stream.flush()
+    # the puzzles are shared by the worker processes (one set per matrix
+    # format):
+    formats = [
+        tuple(sorted(matrix_options(
+            exact_cover_modules[algorithm].ExactCover).items()))
+        for (algorithm, strategy) in configurations]
+    puzzles = {}
+    for options in formats:
+        if options not in puzzles:
+            puzzles[options] = [component(**dict(options))
+                                for component in puzzle_class.components()]
+    results = multiprocessing.Queue()
+    workers = []
+    winner = None
+    try:
+        try:
+            for index, (algorithm, strategy) in enumerate(configurations):
+                worker_settings = copy.copy(settings)
+                worker_settings.algorithm = algorithm
+                worker_settings.strategy = strategy
+                worker_settings.search_state_file = None
+                worker = multiprocessing.Process(
+                    target=portfolio_worker,
+                    args=(puzzle_class, puzzles[formats[index]],
+                          worker_settings, index, results))
+                worker.daemon = True
+                worker.start()
+                workers.append(worker)
+            pending = set(range(len(workers)))
+            while pending:
+                try:
+                    index, num_solutions, output, svg, x3d = results.get(
+                        timeout=wait_interval)
+                except Queue.Empty:
+                    # a worker which put its result exited normally:
+                    for index in sorted(pending):
+                        exitcode = workers[index].exitcode
+                        if exitcode:
+                            pending.remove(index)
+                            print >>sys.stderr, (
+                                'portfolio: %s/%s failed: the process died '
+                                '(exit code %s).'
+                                % (configurations[index] + (exitcode,)))
+                    continue
+                if index not in pending:
+                    continue
+                pending.remove(index)
+                if num_solutions is not None:
+                    winner = index
+                    break
+                print >>sys.stderr, (
+                    'portfolio: %s/%s failed:\n%s'
+                    % (configurations[index] + (output,)))
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            sys.exit(1)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+            worker.join()
+    if winner is None:
+        print >>sys.stderr, 'portfolio: all configurations failed.'
+        sys.exit(1)
+    output_stream.write(output)
+    if svg:
+        write_text(settings.svg, svg)
+    if x3d:
+        write_text(settings.x3d, x3d)
+    algorithm, strategy = configurations[winner]
+    print >>output_stream, (
+        'portfolio winner: -a %s --strategy %s, duration %s'
+        % (algorithm, strategy, datetime.now() - start))
+    output_stream.flush()
+    if path:
+        records[key] = (algorithm, strategy)
+        write_portfolio_record(path, records)
+    return num_solutions
+
+def portfolio_worker(puzzle_class, puzzles, settings, index, results):
+    """
+    Solve a puzzle in a `solve_portfolio` worker process, using the
+    algorithm & strategy of `settings`.  Put the outcome on the `results`
+    queue: the worker `index`, the number of solutions (None on failure),
+    the output text (or the traceback), and the SVG & X3D texts (or None).
+    """
+    output = StringIO()
+    svg = settings.svg and StringIO()
+    x3d = settings.x3d and StringIO()
+    settings.svg = svg
+    settings.x3d = x3d
+    try:
+        num_solutions = solve(puzzle_class, output, settings, puzzles)
+    except (Exception, SystemExit):
+        results.put((index, None, traceback.format_exc(), None, None))
+    else:
+        results.put((index, num_solutions, output.getvalue(),
+                     svg and svg.getvalue(), x3d and x3d.getvalue()))
+
+def portfolio_configurations(preferred=None):
+    """
+    Return a list of (algorithm, strategy) pairs for `solve_portfolio`, in
+    order of priority: the `preferred` pair first (if any), then the others
+    in an order alternating between new algorithms and new strategies, so
+    that any leading part of the list covers as many of each as possible.
+    """
+    keyed = []
+    for i, algorithm in enumerate(algorithm_choices):
+        for j, strategy in enumerate(strategies.choices):
+            try:
+                exact_cover_modules[algorithm].ExactCover(strategy=strategy)
+            except strategies.StrategyError:
+                continue
+            keyed.append(((max(i, j), i + j, i), (algorithm, strategy)))
+    configurations = [pair for key, pair in sorted(keyed)]
+    if preferred in configurations:
+        configurations.remove(preferred)
+        configurations.insert(0, preferred)
+    return configurations
+
+def portfolio_key(puzzle_class):
+    """Return the portfolio record key for `puzzle_class`."""
+    return '%s.%s' % (puzzle_class.__module__, puzzle_class.__name__)
+
+def read_portfolio_record(path):
+    """
+    Return the portfolio record stored in file `path` (if it exists): a
+    dictionary mapping puzzle keys to (algorithm, strategy) pairs.  Each line
+    of the file contains a puzzle key, an algorithm, and a strategy.
+    """
+    records = {}
+    if os.path.exists(path):
+        record_file = open(path)
+        for line in record_file:
+            fields = line.split()
+            if len(fields) == 3:
+                records[fields[0]] = tuple(fields[1:])
+        record_file.close()
+    return records
+
+def write_portfolio_record(path, records):
+    """Store the portfolio `records` dictionary in file `path`."""
+    record_file = open(path, 'w')
+    for key in sorted(records):
+        print >>record_file, key, '%s %s' % records[key]
+    record_file.close()
+
+def write_text(output_path, text):
+    """Write `text` to `output_path`: a file path, a stream, or "-" (STDOUT)."""
+    if output_path == '-':
+        sys.stdout.write(text)
+    elif hasattr(output_path, 'write'):
+        output_path.write(text)
+    else:
+        output_file = open(output_path, 'w')
+        output_file.write(text)
+        output_file.close()
+
+def matrix_options(solver):
+    """
+    Return the keyword arguments for puzzle instantiation corresponding to
+    the matrix extensions supported by `solver` (an exact cover engine
+    instance or class): colored secondary columns & column multiplicities.
+    """
+    return dict(colored_columns=getattr(solver, 'colored_columns', False),
+                multiplicities=getattr(solver, 'multiplicities', False))
+
+def make_puzzle(component, solver):
+    """
+    Return an instance of puzzle class `component`, with the matrix
+    extensions supported by `solver`.  If `solver` can generate the matrix
+    rows itself (see `puzzler.exact_cover_implicit`), only the matrix header
+    is built, if possible.
+    """
+    if not getattr(solver, 'implicit_matrix', False):
+        return component(**matrix_options(solver))
+    puzzle = component(init_puzzle=False, **matrix_options(solver))
+    puzzle.init_puzzle(implicit=True)
+    return puzzle
+
+def preprocessed_matrix(puzzle, settings, output_stream=None):
+    """
+    Return the matrix of `puzzle` without the rows which can't be part of
+    any solution (see `puzzler.preprocessing`) if `settings.preprocess` is
+    set, reporting the number removed on `output_stream` (if given).
+    Otherwise, or if the puzzle's matrix is implicit, return None (for the
+    puzzle's own matrix).
+    """
+    if not getattr(settings, 'preprocess', False) or puzzle.implicit_matrix:
+        return None
+    matrix, num_removed = preprocessing.reduce_matrix(
+        puzzle.matrix, puzzle.secondary_columns,
+        puzzle.column_multiplicities)
+    if output_stream is not None:
+        report_preprocessing(puzzle, matrix, output_stream)
+    return matrix
+
+def report_preprocessing(puzzle, matrix, output_stream):
+    """
+    Report the number of rows of `puzzle`'s matrix removed from `matrix` by
+    preprocessing on `output_stream`.
+    """
+    num_removed = len(puzzle.matrix) - len(matrix)
+    print >>output_stream, (
+        'preprocessing removed %s of %s row%s\n'
+        % (thousands(num_removed), thousands(len(puzzle.matrix) - 1),
+           plural_s(len(puzzle.matrix) - 1)))
+    output_stream.flush()
+
+def pruned_report(num_pruned, prune):
+    """
+    Return a report of the number of search states pruned, to follow the
+    number of searches (an empty string if not `prune`).
+    """
+    if not prune:
+        return ''
+    return ' (%s pruned)' % thousands(num_pruned)
+
+def requires_multiplicities(puzzle_class):
+    """
+    Return True if `puzzle_class` can only be solved by exact cover engines
+    supporting column multiplicities.
+    """
+    return bool([component for component in puzzle_class.components()
+                 if component.piece_multiplicities])
+
+def check_multiplicities(puzzle_class, algorithm):
+    """
+    Exit if `puzzle_class` requires column multiplicities and the exact
+    cover engine of `algorithm` doesn't support them.
+    """
+    if ( requires_multiplicities(puzzle_class)
+         and not matrix_options(exact_cover_modules[algorithm].ExactCover)[
+             'multiplicities']):
+        print >>sys.stderr, (
+            'The "%s" algorithm does not support column multiplicities, '
+            'required by %s.' % (algorithm, puzzle_class.__name__))
+        sys.exit(1)
+
+def load_matrix(solver, puzzle, matrix=None):
+    """
+    Load the exact cover matrix of `puzzle` (or `matrix`, a version of it
+    with the rows reordered) into `solver`, with its column multiplicities
+    (if any).  A puzzle with an implicit matrix (only the header built) is
+    loaded whole, for `solver` to generate the rows.
+    """
+    if puzzle.implicit_matrix:
+        solver.load_puzzle(puzzle)
+        return
+    if matrix is None:
+        matrix = puzzle.matrix
+    if puzzle.column_multiplicities:
+        solver.load_matrix(matrix, puzzle.secondary_columns,
+                           puzzle.column_multiplicities)
+    else:
+        solver.load_matrix(matrix, puzzle.secondary_columns)
+
 def check_matrix_for_duplicate_rows(puzzle):
     matrix_set = set(puzzle.matrix)
     if len(puzzle.matrix) == len(matrix_set):
@@ -311,6 +1622,33 @@ class SessionState(object):
 
     save_interval = 60                 # seconds, for thread
 
+    strategy = strategies.default
+    """The column selection strategy of the search (older state files were
+    all saved with the default strategy)."""
+
+    preprocess = False
+    """True if the matrix was preprocessed (older state files were all saved
+    without preprocessing)."""
+
+    subtrees = None
+    """The subtree prefixes (partial solutions) of the puzzle component
+    being searched by a `solve_parallel` session, or None."""
+
+    subtree_index = 0
+    """The number of `subtrees` already searched."""
+
+    work_items = None
+    """The work queue of a coordinated session (see `puzzler.distributed`),
+    or None."""
+
+    shard = None
+    """The (shard, number of shards, depth) of a sharded session (see
+    `puzzler.distributed.solve_shard`), or None."""
+
+    shard_log_size = 0
+    """The size of the shard log as of the last save of a sharded
+    session."""
+
     def __init__(self, path=None):
         self.solution = []
         self.num_solutions = 0
@@ -344,6 +1682,12 @@ class SessionState(object):
         del odict['state_file'], odict['lock']
         return odict
 
+    def __setstate__(self, odict):
+        self.__dict__.update(odict)
+        # restore runtime state:
+        self.lock = threading.Lock()
+        self.state_file = None
+
     def save(self, solver, final=False):
         if self.state_file and self.lock.acquire(final):
             # GIL check interval hack (r512, to prevent corrupted state
@@ -369,6 +1713,8 @@ class SessionState(object):
     def close(self):
         if self.state_file:
             self.state_file.close()
+            # keep the file (`cleanup` is a no-op now):
+            self.state_file = None
 
     def cleanup(self):
         if self.state_file:
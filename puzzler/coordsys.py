@@ -951,6 +951,45 @@ class TriangularGrid3DCoordSetMixin:
         return icoords
 
 
+    def crossing_colors(self):
+        """
+        Represent constraints on intersections via colors: one colored
+        secondary column per intersection (point), instead of the up to 6
+        columns of `self.intersections`.  Return a dictionary mapping points
+        (x,y) to colors (strings).
+
+        The segments of a polytrig at point (x,y) occupy some of its 6 rays,
+        numbered counterclockwise from 0 (see `self.intersections`).  Two
+        polytrigs cross at a point if their rays alternate around it.  A
+        polytrig whose rays at a point are contiguous (or which has only one
+        ray there) cannot be crossed; the point gets no color.  Otherwise
+        the color is the list of rays, as a string of digits ("02" for rays
+        0 & 2).  The only two polytrigs with crossable rays that can share a
+        point without crossing are one-gappers back to back, such as rays
+        {0,2} and {3,5}; they share a color ("02").
+        """
+        rays = {}
+        for (x, y, z) in self:
+            rays.setdefault((x, y), []).append(z)
+            delta_x, delta_y = self.coord_class.endpoint_deltas[z]
+            rays.setdefault((x + delta_x, y + delta_y), []).append(z + 3)
+        colors = {}
+        for point, point_rays in rays.items():
+            point_rays.sort()
+            occupied = set(point_rays)
+            ends = [ray for ray in point_rays if (ray + 1) % 6 not in occupied]
+            if len(ends) < 2:
+                # contiguous rays
+                continue
+            if ( len(point_rays) == 2
+                 and point_rays[1] - point_rays[0] in (2, 4)):
+                # one-gapper; same color as the back-to-back one-gapper:
+                point_rays = min(point_rays,
+                                 sorted((ray + 3) % 6 for ray in point_rays))
+            colors[point] = ''.join(str(ray) for ray in point_rays)
+        return colors
+
+
 class TriangularGrid3DCoordSet(TriangularGrid3DCoordSetMixin,
                                Cartesian3DCoordSet):
 
@@ -0,0 +1,1137 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+Coordinated searches: one search spread over worker processes on several
+machines, connected over TCP.
+
+The coordinator (`solve_coordinator`, the ``--coordinator`` option) expands
+the first levels of the search tree of each puzzle component into work
+items: lists of subtree prefixes (partial solutions, lists of row indices,
+as in `puzzler.solve_parallel`), searched in order.  Workers (`work`, the
+``--worker`` option) build the same puzzle matrices (checked by digest),
+request work items, search them, and return their solutions.  A worker
+given a single prefix first expands it into the subtrees below it.
+
+Work stealing: when there is no work item left to hand out, the
+coordinator asks the busy workers to split their items.  A worker returns
+the second half of its unstarted prefixes as a new work item, between its
+own item and the next one.
+
+Workers send heartbeats; the items of a worker not heard from for
+`worker_timeout` seconds are reissued, and its late results are ignored.
+The coordinator reports the solutions in search order (the order of a
+single-process search), and saves its work queue in the search state file,
+so it can be restarted: the items being searched are reissued.
+
+Connections are authenticated with a shared key (``--authkey``; the
+coordinator generates and reports a random one if none is given, and
+workers must be given it), but the messages themselves are pickles: anyone
+knowing the key can run code on the coordinator.  Use this on trusted
+networks only.
+
+Sharded searches need no coordinator: shard I of N (`solve_shard`, the
+``--shard I/N`` option) searches every Nth subtree at a fixed depth of the
+search tree, checkpointing in its own search state file, and writes the
+solutions (row indices) & counts of each subtree to a shard log.  Once all
+the shards are done, `merge_shards` (``--merge-shards``) combines their logs
+into the report of a single-process search.
+"""
+
+import os
+import sys
+import binascii
+import time
+import socket
+import hashlib
+import threading
+import cPickle as pickle
+from datetime import datetime, timedelta
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import (
+    Listener, Client, answer_challenge, deliver_challenge)
+
+import puzzler
+from puzzler import exact_cover_bits
+from puzzler import strategies
+from puzzler.utils import thousands, plural_s
+
+
+initial_work_items = 64
+"""The minimum number of work items per puzzle component to start with (up
+to two levels of the search tree are expanded)."""
+
+heartbeat_interval = 5
+"""The number of seconds between worker heartbeats."""
+
+worker_timeout = 60
+"""The number of seconds without a call from a worker after which it is
+considered lost, and its work items reissued."""
+
+poll_interval = 0.2
+"""The number of seconds between checks of the work queue (coordinator),
+or between requests for work while there is none (workers)."""
+
+connect_timeout = 60
+"""The number of seconds a worker keeps trying to connect to the
+coordinator."""
+
+default_shard_depth = 2
+"""The default depth of the search tree at which `solve_shard` splits it
+into subtrees."""
+
+
+class WorkItem(object):
+
+    """
+    A list of subtree prefixes of a puzzle component, searched in order by
+    one worker.
+    """
+
+    def __init__(self, key, component, prefixes, searches=0):
+        self.key = key
+        """The sort key: a tuple of the component index and the item's
+        position in the search order."""
+
+        self.component = component
+        """The index of the puzzle component."""
+
+        self.prefixes = prefixes
+        """A list of partial solutions (lists of row indices)."""
+
+        self.searches = searches
+        """The number of searches already counted for this item (the
+        expansion of the search tree above its prefixes)."""
+
+        self.result = None
+        """A 3-tuple (solutions, searches, pruned) once the item is searched:
+        a list of solutions (lists of row indices), the number of searches
+        (including `self.searches`), and the number of states pruned."""
+
+        self.splits = 0
+        """The number of new items split off this one."""
+
+        self.id = None
+        self.worker = None
+        self.split_requested = False
+
+    def __getstate__(self):
+        # copy the dict since we change it:
+        odict = self.__dict__.copy()
+        # the worker assignment is runtime state; reissued on restore:
+        odict['worker'] = None
+        odict['split_requested'] = False
+        return odict
+
+
+class Coordinator(object):
+
+    """
+    The work queue of a coordinated search: `WorkItem` objects, handed out
+    to workers on request.  The `remote_methods` are called by the workers
+    (see `CoordinatorClient`), from server threads; the others by
+    `solve_coordinator`.
+    """
+
+    remote_methods = ('describe', 'request_work', 'heartbeat', 'split',
+                      'submit')
+
+    def __init__(self, description, items):
+        self.description = description
+        """A dictionary describing the search, for the workers to check."""
+
+        self.items = {}
+        """Work items not yet reported, by ID."""
+
+        self.next_id = 0
+        self.last_seen = {}
+        self.done = False
+        self.changed = False
+        self.lock = threading.Lock()
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        item.id = self.next_id
+        self.next_id += 1
+        self.items[item.id] = item
+
+    def describe(self, worker):
+        self.lock.acquire()
+        try:
+            self.last_seen[worker] = time.time()
+            return self.description
+        finally:
+            self.lock.release()
+
+    def request_work(self, worker):
+        """
+        Return a work item for `worker` as a 3-tuple (item ID, component
+        index, prefixes), 'wait' if there is none to hand out now, or None
+        if the search is over.
+        """
+        self.lock.acquire()
+        try:
+            self.last_seen[worker] = time.time()
+            if self.done:
+                return None
+            waiting = [item for item in self.items.itervalues()
+                       if item.result is None and item.worker is None]
+            if waiting:
+                item = min(waiting, key=lambda item: item.key)
+                item.worker = worker
+                return item.id, item.component, item.prefixes
+            # no work left to hand out; steal some:
+            for item in self.items.itervalues():
+                if item.worker is not None:
+                    item.split_requested = True
+            return 'wait'
+        finally:
+            self.lock.release()
+
+    def heartbeat(self, worker, item_id):
+        """
+        Return True if `worker` should split work item `item_id`, False if
+        not, or None if the item is no longer assigned to `worker`.
+        """
+        self.lock.acquire()
+        try:
+            self.last_seen[worker] = time.time()
+            item = self.items.get(item_id)
+            if item is None or item.worker != worker:
+                return None
+            return item.split_requested
+        finally:
+            self.lock.release()
+
+    def split(self, worker, item_id, kept, given, searches):
+        """
+        Work item `item_id` is reduced to the `kept` prefixes by `worker`,
+        the `given` prefixes forming a new work item, and the `searches`
+        expanding it are counted.  Return False if the item is no longer
+        assigned to `worker`.
+        """
+        self.lock.acquire()
+        try:
+            self.last_seen[worker] = time.time()
+            item = self.items.get(item_id)
+            if item is None or item.worker != worker:
+                return False
+            item.split_requested = False
+            item.prefixes = kept
+            item.searches += searches
+            if given:
+                item.splits += 1
+                # after this item, before items split off earlier:
+                self.add(WorkItem(item.key + (-item.splits,), item.component,
+                                  given))
+            self.changed = True
+            return True
+        finally:
+            self.lock.release()
+
+    def submit(self, worker, item_id, solutions, searches, pruned):
+        """
+        Record the result of work item `item_id` searched by `worker`.
+        Return False if the item is no longer assigned to `worker` (the
+        result is ignored).
+        """
+        self.lock.acquire()
+        try:
+            self.last_seen[worker] = time.time()
+            item = self.items.get(item_id)
+            if item is None or item.worker != worker:
+                return False
+            item.result = (solutions, item.searches + searches, pruned)
+            item.worker = None
+            self.changed = True
+            return True
+        finally:
+            self.lock.release()
+
+    def reissue_lost(self, now=None):
+        """
+        Reissue the work items of workers not heard from for
+        `worker_timeout` seconds.  Return the lost workers.
+        """
+        if now is None:
+            now = time.time()
+        self.lock.acquire()
+        try:
+            lost = set(worker for worker, seen in self.last_seen.iteritems()
+                       if now - seen > worker_timeout)
+            for item in self.items.itervalues():
+                if item.worker in lost:
+                    item.worker = None
+                    item.split_requested = False
+            for worker in lost:
+                del self.last_seen[worker]
+            return lost
+        finally:
+            self.lock.release()
+
+    def pop_results(self, component):
+        """
+        Remove the searched work items of puzzle `component` at the front of
+        the queue (in search order), and return them.
+        """
+        self.lock.acquire()
+        try:
+            results = []
+            for item in sorted(self.items.itervalues(),
+                               key=lambda item: item.key):
+                if item.result is None or item.component != component:
+                    break
+                del self.items[item.id]
+                results.append(item)
+            return results
+        finally:
+            self.lock.release()
+
+    def pending(self, component=None):
+        """
+        Return True if there are work items left (for puzzle `component`, if
+        given).
+        """
+        self.lock.acquire()
+        try:
+            return any(component is None or item.component == component
+                       for item in self.items.itervalues())
+        finally:
+            self.lock.release()
+
+    def work_items(self):
+        """Return a list of the work items, to save."""
+        self.lock.acquire()
+        try:
+            self.changed = False
+            return sorted(self.items.values(), key=lambda item: item.key)
+        finally:
+            self.lock.release()
+
+
+class CoordinatorServer(object):
+
+    """Serves a `Coordinator` to remote workers, from daemon threads."""
+
+    def __init__(self, coordinator, address, authkey):
+        self.coordinator = coordinator
+        self.authkey = authkey
+        # connections are authenticated by their own threads (see `handle`),
+        # so a client failing to answer doesn't hold up the others:
+        self.listener = Listener(address)
+        self.address = self.listener.address
+        self.closed = False
+        thread = threading.Thread(target=self.serve)
+        thread.setDaemon(True)
+        thread.start()
+
+    def serve(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except (EOFError, IOError, socket.error):
+                # closed listener
+                continue
+            thread = threading.Thread(target=self.handle,
+                                      args=(connection,))
+            thread.setDaemon(True)
+            thread.start()
+
+    def handle(self, connection):
+        try:
+            try:
+                # as Listener(authkey=...) does; the client checks us too:
+                deliver_challenge(connection, self.authkey)
+                answer_challenge(connection, self.authkey)
+                while not self.closed:
+                    name, args = connection.recv()
+                    if name not in self.coordinator.remote_methods:
+                        connection.send(None)
+                        continue
+                    connection.send(getattr(self.coordinator, name)(*args))
+            except (EOFError, IOError, socket.error, AuthenticationError):
+                pass
+        finally:
+            connection.close()
+
+    def close(self):
+        self.closed = True
+        try:
+            # wake up the listener:
+            Client(self.address).close()
+        except (EOFError, IOError, socket.error):
+            pass
+        self.listener.close()
+
+
+class CoordinatorClient(object):
+
+    """
+    A worker's connection to a `Coordinator`: remote methods are called as
+    attributes.  Thread-safe.
+    """
+
+    def __init__(self, address, authkey, timeout=None):
+        if timeout is None:
+            timeout = connect_timeout
+        deadline = time.time() + timeout
+        while True:
+            try:
+                self.connection = Client(address, authkey=authkey)
+                break
+            except socket.error:
+                if time.time() > deadline:
+                    raise
+                time.sleep(poll_interval)
+        self.lock = threading.Lock()
+
+    def call(self, name, *args):
+        self.lock.acquire()
+        try:
+            self.connection.send((name, args))
+            return self.connection.recv()
+        finally:
+            self.lock.release()
+
+    def __getattr__(self, name):
+        if name not in Coordinator.remote_methods:
+            raise AttributeError(name)
+        return lambda *args: self.call(name, *args)
+
+    def close(self):
+        self.connection.close()
+
+
+def parse_address(value):
+    """
+    Return a (host, port) tuple from a "HOST:PORT" string (an empty host
+    means all interfaces).
+    """
+    host, sep, port = value.rpartition(':')
+    try:
+        return host, int(port)
+    except ValueError:
+        raise puzzler.ApplicationError(
+            'Invalid address "%s"; use HOST:PORT.' % value)
+
+def matrix_digest(matrix):
+    """Return a digest of exact cover `matrix`, to compare with workers'."""
+    return hashlib.sha1(repr(matrix)).hexdigest()
+
+def search_matrices(puzzle_class, settings, algorithm, output_stream=None):
+    """
+    Return a 2-tuple: a list of the components of `puzzle_class` (puzzle
+    instances for `algorithm`), and a list of their exact cover matrices
+    (preprocessed if requested in `settings`).
+    """
+    module = puzzler.exact_cover_modules[algorithm]
+    options = dict(colored_columns=puzzler.matrix_options(module.ExactCover)[
+        'colored_columns'])
+    puzzles = [component(**options)
+               for component in puzzle_class.components()]
+    matrices = [puzzler.preprocessed_matrix(puzzle, settings, output_stream)
+                or puzzle.matrix for puzzle in puzzles]
+    return puzzles, matrices
+
+def check_settings(puzzle_class, settings, options='--coordinator/--worker'):
+    """
+    Exit if `settings` request features that searches split into subtrees
+    (with `options`) lack.
+    """
+    if getattr(settings, 'decompose', False):
+        print >>sys.stderr, '%s: --decompose is not supported.' % options
+        sys.exit(1)
+    if puzzler.requires_multiplicities(puzzle_class):
+        print >>sys.stderr, (
+            '%s: column multiplicities (required by %s) are not supported.'
+            % (options, puzzle_class.__name__))
+        sys.exit(1)
+
+def initial_items(puzzles, matrices, strategy, completed):
+    """
+    Return a list of work items for the `puzzles` (components) not in
+    `completed` (a set of class names): the first levels of their search
+    trees expanded, with the expansion searches counted in the first item
+    of each component.  A component without prefixes gets a searched, empty
+    item, so that every component is reported.
+    """
+    items = []
+    for c, puzzle in enumerate(puzzles):
+        if puzzle.__class__.__name__ in completed:
+            continue
+        splitter = exact_cover_bits.ExactCover(
+            matrices[c], puzzle.secondary_columns, strategy=strategy)
+        prefixes = splitter.subtree_prefixes(initial_work_items)
+        if not prefixes:
+            item = WorkItem((c, 0), c, [])
+            item.result = ([], splitter.num_searches, 0)
+            items.append(item)
+            continue
+        component_items = [WorkItem((c, i), c, [prefix])
+                           for i, prefix in enumerate(prefixes)]
+        component_items[0].searches = splitter.num_searches
+        items.extend(component_items)
+    return items
+
+def solve_coordinator(puzzle_class, output_stream, settings):
+    """
+    Coordinate the search for all solutions to a puzzle by remote workers
+    (see the module docstring), and record them.  Report on
+    `output_stream`.
+    """
+    start = datetime.now()
+    check_settings(puzzle_class, settings)
+    # the workers use the coordinator's algorithm:
+    puzzler.check_subtrees(settings, '--coordinator')
+    prune = getattr(settings, 'prune', False)
+    try:
+        address = parse_address(settings.coordinator)
+    except puzzler.ApplicationError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    try:
+        state = puzzler.SessionState.restore(settings.search_state_file)
+    except IOError, error:
+        print >>sys.stderr, 'Unable to initialize the search state file:'
+        print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
+        sys.exit(1)
+    strategy = (getattr(settings, 'strategy', None)
+                or puzzle_class.column_strategy or strategies.default)
+    if state.num_searches and state.strategy != strategy:
+        print >>sys.stderr, (
+            'The search state file was saved with the "%s" column selection '
+            'strategy, not "%s".  Use "--strategy=%s", or remove the file.'
+            % (state.strategy, strategy, state.strategy))
+        sys.exit(1)
+    puzzler.check_preprocess(state, settings)
+    if state.solution or state.subtrees or state.shard is not None:
+        print >>sys.stderr, (
+            'The search state file was not saved by a --coordinator search.  '
+            'Resume without --coordinator, or remove the file.')
+        sys.exit(1)
+    state.strategy = strategy
+    module = puzzler.exact_cover_modules[settings.algorithm]
+    try:
+        # formats the solutions, and keeps the totals:
+        solver = module.ExactCover(strategy=strategy)
+    except strategies.StrategyError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    if prune and not getattr(solver, 'pruning', False):
+        print >>sys.stderr, (
+            'The "%s" algorithm does not support --prune.'
+            % settings.algorithm)
+        sys.exit(1)
+    solver.num_solutions = state.num_solutions
+    solver.num_searches = state.num_searches
+    if state.num_searches:
+        print >>output_stream, (
+            '\nResuming session (%s solution%s, %s searches).\n'
+            % (thousands(state.num_solutions),
+               plural_s(state.num_solutions),
+               thousands(state.num_searches)))
+        output_stream.flush()
+    starting_solutions = state.num_solutions
+    puzzles, matrices = search_matrices(
+        puzzle_class, settings, settings.algorithm, output_stream)
+    for puzzle in puzzles:
+        puzzler.check_matrix_for_duplicate_rows(puzzle)
+    if settings.dry_run:
+        return
+    description = dict(
+        puzzle=puzzle_class.__name__, algorithm=settings.algorithm,
+        strategy=strategy, prune=prune,
+        preprocess=getattr(settings, 'preprocess', False),
+        digests=[matrix_digest(matrix) for matrix in matrices])
+    if state.work_items is None:
+        state.work_items = initial_items(
+            puzzles, matrices, strategy, state.completed_components)
+    coordinator = Coordinator(description, state.work_items)
+    authkey = getattr(settings, 'authkey', None)
+    if not authkey:
+        authkey = binascii.hexlify(os.urandom(16))
+        print >>output_stream, 'workers: --authkey %s' % authkey
+    try:
+        server = CoordinatorServer(coordinator, address, authkey)
+    except socket.error, error:
+        print >>sys.stderr, 'Unable to listen on %s:%s:' % address
+        print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
+        sys.exit(1)
+    print >>output_stream, (
+        'coordinating %s work item%s on %s:%s\n'
+        % (thousands(len(state.work_items)), plural_s(len(state.work_items)),
+           server.address[0], server.address[1]))
+    output_stream.flush()
+    num_pruned = 0
+    stats = []
+    components = [c for c, puzzle in enumerate(puzzles)
+                  if puzzle.__class__.__name__
+                  not in state.completed_components]
+    recording = None
+    try:
+        try:
+            stop = False
+            for c in components:
+                puzzle = puzzles[c]
+                print >>output_stream, ('solving %s:\n'
+                                        % puzzle.__class__.__name__)
+                output_stream.flush()
+                last_solutions = solver.num_solutions
+                last_searches = solver.num_searches
+                solver.load_matrix(matrices[c], puzzle.secondary_columns)
+                while coordinator.pending(c) and not stop:
+                    for worker in coordinator.reissue_lost():
+                        print >>output_stream, (
+                            'worker %s lost; reissuing its work' % worker)
+                        output_stream.flush()
+                    results = coordinator.pop_results(c)
+                    for item in results:
+                        # the totals before the item is recorded:
+                        saved = (solver.num_solutions, solver.num_searches)
+                        recording = item
+                        solutions, searches, pruned = item.result
+                        solver.num_searches += searches
+                        num_pruned += pruned
+                        stop = puzzler.record_parallel_solutions(
+                            puzzle, solver, solutions, settings,
+                            output_stream, starting_solutions)
+                        recording = None
+                        if stop:
+                            break
+                    if results or coordinator.changed:
+                        state.work_items = coordinator.work_items()
+                        state.save(solver, final=True)
+                    if not results:
+                        time.sleep(poll_interval)
+                stats.append((solver.num_solutions - last_solutions,
+                              solver.num_searches - last_searches))
+                if stop:
+                    print >>output_stream, (
+                        'User-requested solution limit reached.')
+                    break
+                state.completed_components.add(puzzle.__class__.__name__)
+                state.work_items = coordinator.work_items()
+                state.save(solver, final=True)
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            if recording is not None:
+                # record the item again on resume:
+                solver.num_solutions, solver.num_searches = saved
+                coordinator.add(recording)
+            state.work_items = coordinator.work_items()
+            state.save(solver, final=True)
+            state.close()
+            sys.exit(1)
+    finally:
+        coordinator.done = True
+        server.close()
+        end = datetime.now()
+        duration = end - start
+        print >>output_stream, (
+            '%s solution%s, %s searches%s, duration %s'
+            % (thousands(solver.num_solutions),
+               plural_s(solver.num_solutions),
+               thousands(solver.num_searches),
+               puzzler.pruned_report(num_pruned, prune),
+               duration))
+        if len(stats) > 1:
+            for i, (solutions, searches) in enumerate(stats):
+                print >>output_stream, (
+                    '(%s: %s solution%s, %s searches)'
+                    % (puzzles[components[i]].__class__.__name__,
+                       thousands(solutions),
+                       plural_s(solutions),
+                       thousands(searches)))
+        output_stream.flush()
+        state.cleanup()
+    return solver.num_solutions
+
+def expand_prefix(matrix, secondary, prefix, strategy):
+    """
+    Return a 2-tuple: a list of the prefixes of the subtrees below partial
+    solution `prefix` of exact cover `matrix` (with `secondary` secondary
+    columns), in search order, and the number of searches (1).  If `prefix`
+    is a solution, return (None, 0).
+    """
+    reduced, row_indices = puzzler.prefix_matrix(matrix, secondary, prefix)
+    if len(reduced[0]) == secondary:
+        return None, 0
+    splitter = exact_cover_bits.ExactCover(reduced, secondary,
+                                           strategy=strategy)
+    children = splitter.subtree_prefixes(2, max_depth=1)
+    return ([prefix + [row_indices[r] for r in child] for child in children],
+            splitter.num_searches)
+
+def work(puzzle_class, output_stream, settings, worker=None):
+    """
+    Search work items of a coordinated search (see the module docstring)
+    for the coordinator at `settings.worker` ("HOST:PORT") until the search
+    is over.  Report on `output_stream`.  Return the number of work items
+    searched.
+    """
+    check_settings(puzzle_class, settings)
+    try:
+        address = parse_address(settings.worker)
+    except puzzler.ApplicationError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    authkey = getattr(settings, 'authkey', None)
+    if not authkey:
+        print >>sys.stderr, (
+            '--worker requires --authkey (the key reported by the '
+            'coordinator, or given to it).')
+        sys.exit(1)
+    if worker is None:
+        worker = '%s:%s' % (socket.gethostname(), os.getpid())
+    try:
+        coordinator = CoordinatorClient(address, authkey)
+        description = coordinator.describe(worker)
+    except (EOFError, IOError, socket.error, AuthenticationError), error:
+        print >>sys.stderr, (
+            'Unable to connect to the coordinator at %s:' % settings.worker)
+        print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
+        sys.exit(1)
+    if description['puzzle'] != puzzle_class.__name__:
+        print >>sys.stderr, (
+            'The coordinator is solving %s, not %s.'
+            % (description['puzzle'], puzzle_class.__name__))
+        sys.exit(1)
+    algorithm = description['algorithm']
+    strategy = description['strategy']
+    settings.preprocess = description['preprocess']
+    puzzles, matrices = search_matrices(puzzle_class, settings, algorithm)
+    if description['digests'] != [matrix_digest(matrix)
+                                  for matrix in matrices]:
+        print >>sys.stderr, (
+            'The puzzle matrices differ from the coordinator\'s (different '
+            'versions of the puzzle or of Polyform Puzzler?).')
+        sys.exit(1)
+    if description['prune']:
+        pruning_checks = [puzzle.pruning_check() for puzzle in puzzles]
+    else:
+        pruning_checks = [None] * len(puzzles)
+    print >>output_stream, ('worker %s: searching %s for %s\n'
+                            % (worker, puzzle_class.__name__,
+                               settings.worker))
+    output_stream.flush()
+    current = [None]                    # the item being searched
+    split_event = threading.Event()
+    abandon_event = threading.Event()
+
+    def send_heartbeats():
+        while True:
+            time.sleep(heartbeat_interval)
+            try:
+                reply = coordinator.heartbeat(worker, current[0])
+            except (EOFError, IOError, socket.error):
+                return
+            if reply is None and current[0] is not None:
+                abandon_event.set()
+            elif reply:
+                split_event.set()
+
+    thread = threading.Thread(target=send_heartbeats)
+    thread.setDaemon(True)
+    thread.start()
+    num_items = 0
+    try:
+        while True:
+            reply = coordinator.request_work(worker)
+            if reply is None:
+                break
+            if reply == 'wait':
+                time.sleep(poll_interval)
+                continue
+            item_id, c, prefixes = reply
+            current[0] = item_id
+            split_event.clear()
+            abandon_event.clear()
+            matrix = matrices[c]
+            secondary = puzzles[c].secondary_columns
+            solutions = []
+            searches = pruned = expansion = 0
+            if len(prefixes) == 1:
+                children, expansion = expand_prefix(
+                    matrix, secondary, prefixes[0], strategy)
+                if children is None:
+                    solutions.append(prefixes[0])
+                    children = []
+                prefixes = children
+            i = 0
+            while i < len(prefixes) and not abandon_event.isSet():
+                if split_event.isSet():
+                    split_event.clear()
+                    num_given = (len(prefixes) - i) // 2
+                    kept = prefixes[:len(prefixes) - num_given]
+                    given = prefixes[len(kept):]
+                    if not coordinator.split(worker, item_id, kept, given,
+                                             expansion):
+                        break
+                    prefixes = kept
+                    expansion = 0
+                prefix_solutions, prefix_searches, prefix_pruned = (
+                    puzzler.search_prefix(
+                        matrix, secondary, prefixes[i], algorithm, strategy,
+                        pruning_checks[c]))
+                solutions.extend(prefix_solutions)
+                searches += prefix_searches
+                pruned += prefix_pruned
+                i += 1
+            else:
+                if not abandon_event.isSet():
+                    coordinator.submit(worker, item_id, solutions,
+                                       searches + expansion, pruned)
+                    num_items += 1
+            current[0] = None
+    except (EOFError, IOError, socket.error):
+        # the coordinator is gone
+        pass
+    print >>output_stream, ('worker %s: %s work item%s searched'
+                            % (worker, thousands(num_items),
+                               plural_s(num_items)))
+    output_stream.flush()
+    return num_items
+
+def parse_shard(value):
+    """
+    Return a (shard, number of shards) tuple from an "I/N" string, with
+    1 <= I <= N.
+    """
+    try:
+        shard, num_shards = [int(part) for part in value.split('/')]
+    except ValueError:
+        raise puzzler.ApplicationError(
+            'Invalid shard "%s"; use I/N.' % value)
+    if not 1 <= shard <= num_shards:
+        raise puzzler.ApplicationError(
+            'Invalid shard "%s"; I must be from 1 to N.' % value)
+    return shard, num_shards
+
+def shard_file_default(shard, num_shards, extension):
+    """Return the default name for a shard's file of type `extension`."""
+    prefix = puzzler.search_state_default()[:-len('.state')]
+    return '%s-shard-%s-of-%s.%s' % (prefix, shard, num_shards, extension)
+
+def shard_subtrees(puzzles, matrices, strategy, depth):
+    """
+    Return a list of the subtrees of the search trees of the `puzzles`
+    (components) at `depth`, in search order: 3-tuples of the component
+    index, the prefix (a list of row indices), and the number of searches
+    above the subtree to count with it (the expansion searches of each
+    component are counted with its first subtree).  A component without
+    subtrees has one, with a prefix of None, so that it is reported.
+    """
+    subtrees = []
+    for c, puzzle in enumerate(puzzles):
+        splitter = exact_cover_bits.ExactCover(
+            matrices[c], puzzle.secondary_columns, strategy=strategy)
+        prefixes = splitter.subtree_prefixes(sys.maxint, max_depth=depth)
+        if not prefixes:
+            prefixes = [None]
+        for i, prefix in enumerate(prefixes):
+            subtrees.append(
+                (c, prefix, (i == 0 and splitter.num_searches) or 0))
+    return subtrees
+
+def solve_shard(puzzle_class, output_stream, settings):
+    """
+    Search one shard (`settings.shard`, "I/N") of the subtrees of a puzzle
+    at `settings.shard_depth`: every Nth subtree, starting with the Ith.
+    Write the results of each subtree to the shard log
+    (`settings.shard_log`), for `merge_shards`, and report the shard's
+    solutions on `output_stream`.
+    """
+    start = datetime.now()
+    check_settings(puzzle_class, settings, '--shard')
+    puzzler.check_subtrees(settings, '--shard')
+    prune = getattr(settings, 'prune', False)
+    if settings.stop_after:
+        print >>sys.stderr, (
+            '--shard: -n/--stop-after is not supported (the shards are '
+            'searched completely, to be merged).')
+        sys.exit(1)
+    try:
+        shard, num_shards = parse_shard(settings.shard)
+    except puzzler.ApplicationError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    depth = getattr(settings, 'shard_depth', None) or default_shard_depth
+    state_path = settings.search_state_file
+    if state_path and state_path == puzzler.search_state_default():
+        state_path = shard_file_default(shard, num_shards, 'state')
+    log_path = (getattr(settings, 'shard_log', None)
+                or shard_file_default(shard, num_shards, 'log'))
+    try:
+        state = puzzler.SessionState.restore(state_path)
+    except IOError, error:
+        print >>sys.stderr, 'Unable to initialize the search state file:'
+        print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
+        sys.exit(1)
+    strategy = (getattr(settings, 'strategy', None)
+                or puzzle_class.column_strategy or strategies.default)
+    if state.num_searches and state.strategy != strategy:
+        print >>sys.stderr, (
+            'The search state file was saved with the "%s" column selection '
+            'strategy, not "%s".  Use "--strategy=%s", or remove the file.'
+            % (state.strategy, strategy, state.strategy))
+        sys.exit(1)
+    puzzler.check_preprocess(state, settings)
+    if ( state.solution or state.subtrees or state.work_items is not None
+         or (state.num_searches
+             and state.shard != (shard, num_shards, depth))):
+        print >>sys.stderr, (
+            'The search state file "%s" was not saved by this shard '
+            '(--shard %s/%s --shard-depth %s).  Remove the file.'
+            % (state_path, shard, num_shards, depth))
+        sys.exit(1)
+    state.strategy = strategy
+    state.shard = (shard, num_shards, depth)
+    module = puzzler.exact_cover_modules[settings.algorithm]
+    try:
+        # formats the solutions, and keeps the totals:
+        solver = module.ExactCover(strategy=strategy)
+    except strategies.StrategyError, error:
+        print >>sys.stderr, error
+        sys.exit(1)
+    if prune and not getattr(solver, 'pruning', False):
+        print >>sys.stderr, (
+            'The "%s" algorithm does not support --prune.'
+            % settings.algorithm)
+        sys.exit(1)
+    solver.num_solutions = state.num_solutions
+    solver.num_searches = state.num_searches
+    if state.num_searches:
+        print >>output_stream, (
+            '\nResuming session (%s solution%s, %s searches).\n'
+            % (thousands(state.num_solutions),
+               plural_s(state.num_solutions),
+               thousands(state.num_searches)))
+        output_stream.flush()
+    puzzles, matrices = search_matrices(
+        puzzle_class, settings, settings.algorithm, output_stream)
+    for puzzle in puzzles:
+        puzzler.check_matrix_for_duplicate_rows(puzzle)
+    subtrees = shard_subtrees(puzzles, matrices, strategy, depth)
+    indices = range(shard - 1, len(subtrees), num_shards)
+    print >>output_stream, (
+        'shard %s of %s: %s of %s subtree%s (depth %s)\n'
+        % (shard, num_shards, thousands(len(indices)),
+           thousands(len(subtrees)), plural_s(len(subtrees)), depth))
+    output_stream.flush()
+    if settings.dry_run:
+        return
+    if prune:
+        pruning_checks = [puzzle.pruning_check() for puzzle in puzzles]
+    else:
+        pruning_checks = [None] * len(puzzles)
+    if state.num_searches and os.path.exists(log_path):
+        log = open(log_path, 'r+b')
+        # drop any results written after the last checkpoint:
+        log.truncate(state.shard_log_size)
+        log.seek(0, 2)
+    else:
+        log = open(log_path, 'wb')
+        pickle.dump(dict(
+            puzzle=puzzle_class.__name__, algorithm=settings.algorithm,
+            strategy=strategy, prune=prune,
+            preprocess=getattr(settings, 'preprocess', False),
+            digests=[matrix_digest(matrix) for matrix in matrices],
+            shard=shard, shards=num_shards, depth=depth,
+            subtrees=len(subtrees)), log, 2)
+        log.flush()
+        state.shard_log_size = log.tell()
+    num_pruned = 0
+    current = None
+    # the totals as of the last completed subtree:
+    saved = (solver.num_solutions, solver.num_searches)
+    try:
+        try:
+            for k in indices[state.subtree_index:]:
+                c, prefix, expansion = subtrees[k]
+                puzzle = puzzles[c]
+                if c != current:
+                    print >>output_stream, ('solving %s:\n'
+                                            % puzzle.__class__.__name__)
+                    output_stream.flush()
+                    solver.load_matrix(matrices[c], puzzle.secondary_columns)
+                    current = c
+                subtree_start = time.time()
+                if prefix is None:
+                    solutions, searches, pruned = [], 0, 0
+                else:
+                    solutions, searches, pruned = puzzler.search_prefix(
+                        matrices[c], puzzle.secondary_columns, prefix,
+                        settings.algorithm, strategy, pruning_checks[c])
+                searches += expansion
+                pickle.dump((k, solutions, searches, pruned,
+                             time.time() - subtree_start), log, 2)
+                log.flush()
+                solver.num_searches += searches
+                num_pruned += pruned
+                puzzler.record_parallel_solutions(
+                    puzzle, solver, solutions, settings, output_stream,
+                    state.num_solutions)
+                state.subtree_index += 1
+                state.shard_log_size = log.tell()
+                state.save(solver, final=True)
+                saved = (solver.num_solutions, solver.num_searches)
+        except KeyboardInterrupt:
+            print >>output_stream, 'Session interrupted by user.'
+            # the current subtree will be searched again on resume:
+            solver.num_solutions, solver.num_searches = saved
+            state.save(solver, final=True)
+            state.close()
+            sys.exit(1)
+    finally:
+        log.close()
+        end = datetime.now()
+        duration = end - start
+        print >>output_stream, (
+            'shard %s of %s: %s solution%s, %s searches%s, duration %s'
+            % (shard, num_shards,
+               thousands(solver.num_solutions),
+               plural_s(solver.num_solutions),
+               thousands(solver.num_searches),
+               puzzler.pruned_report(num_pruned, prune),
+               duration))
+        output_stream.flush()
+        state.cleanup()
+    return solver.num_solutions
+
+def read_shard_log(path):
+    """
+    Return a 2-tuple from the shard log at `path` (see `solve_shard`): the
+    header (a dictionary), and a list of the subtree results, 5-tuples: the
+    subtree index, a list of the solutions (lists of row indices), the
+    number of searches, the number of states pruned, and the number of
+    seconds spent.  A truncated last result (an interrupted shard) is left
+    out.
+    """
+    log = open(path, 'rb')
+    try:
+        header = pickle.load(log)
+        results = []
+        while True:
+            try:
+                results.append(pickle.load(log))
+            except (EOFError, pickle.UnpicklingError):
+                break
+        return header, results
+    finally:
+        log.close()
+
+def merge_shards(puzzle_class, output_stream, settings):
+    """
+    Combine the shard logs `settings.shard_logs` (see `solve_shard`) into
+    the report of a single-process search, on `output_stream`: the
+    solutions (renumbered, duplicates eliminated), and the counts.  The
+    duration reported is the total time spent by the shards in their
+    searches.
+    """
+    headers = []
+    results = {}
+    if not settings.shard_logs:
+        print >>sys.stderr, '--merge-shards: no shard log files given.'
+        sys.exit(1)
+    for path in settings.shard_logs:
+        try:
+            header, shard_results = read_shard_log(path)
+        except (IOError, EOFError, pickle.UnpicklingError), error:
+            print >>sys.stderr, 'Unable to read the shard log "%s":' % path
+            print >>sys.stderr, '%s: %s' % (error.__class__.__name__, error)
+            sys.exit(1)
+        headers.append(header)
+        for result in shard_results:
+            if result[0] in results:
+                print >>sys.stderr, (
+                    'Subtree %s is in more than one shard log (shard %s).'
+                    % (result[0], header['shard']))
+                sys.exit(1)
+            results[result[0]] = result
+    header = dict(headers[0])
+    del header['shard']
+    for other in headers[1:]:
+        other = dict(other)
+        del other['shard']
+        if other != header:
+            print >>sys.stderr, (
+                'The shard logs are not from the same search (puzzle, '
+                'settings, --shard N & --shard-depth).')
+            sys.exit(1)
+    if header['puzzle'] != puzzle_class.__name__:
+        print >>sys.stderr, (
+            'The shard logs are from %s, not %s.'
+            % (header['puzzle'], puzzle_class.__name__))
+        sys.exit(1)
+    missing = sorted(set(range(header['subtrees'])) - set(results))
+    if missing:
+        print >>sys.stderr, (
+            'The shard logs are incomplete: %s subtree%s missing, from '
+            'shard%s %s (unfinished, or not given).'
+            % (thousands(len(missing)), plural_s(len(missing)),
+               plural_s(len(set(k % header['shards'] for k in missing))),
+               ', '.join(str(shard) for shard in sorted(
+                   set(k % header['shards'] + 1 for k in missing)))))
+        sys.exit(1)
+    algorithm = header['algorithm']
+    settings.preprocess = header['preprocess']
+    puzzles, matrices = search_matrices(puzzle_class, settings, algorithm)
+    if header['digests'] != [matrix_digest(matrix) for matrix in matrices]:
+        print >>sys.stderr, (
+            'The puzzle matrices differ from the shards\' (different '
+            'versions of the puzzle or of Polyform Puzzler?).')
+        sys.exit(1)
+    subtrees = shard_subtrees(
+        puzzles, matrices, header['strategy'], header['depth'])
+    solver = puzzler.exact_cover_modules[algorithm].ExactCover(
+        strategy=header['strategy'])
+    num_pruned = 0
+    seconds = 0
+    stats = []
+    k = 0
+    for c, puzzle in enumerate(puzzles):
+        print >>output_stream, 'solving %s:\n' % puzzle.__class__.__name__
+        output_stream.flush()
+        if settings.preprocess:
+            puzzler.report_preprocessing(puzzle, matrices[c], output_stream)
+        last_solutions = solver.num_solutions
+        last_searches = solver.num_searches
+        solver.load_matrix(matrices[c], puzzle.secondary_columns)
+        stop = False
+        while k < len(subtrees) and subtrees[k][0] == c:
+            index, solutions, searches, pruned, subtree_seconds = results[k]
+            solver.num_searches += searches
+            num_pruned += pruned
+            seconds += subtree_seconds
+            stop = puzzler.record_parallel_solutions(
+                puzzle, solver, solutions, settings, output_stream, 0)
+            k += 1
+            if stop:
+                break
+        stats.append((solver.num_solutions - last_solutions,
+                      solver.num_searches - last_searches))
+        if stop:
+            print >>output_stream, 'User-requested solution limit reached.'
+            break
+    print >>output_stream, (
+        '%s solution%s, %s searches%s, duration %s'
+        % (thousands(solver.num_solutions),
+           plural_s(solver.num_solutions),
+           thousands(solver.num_searches),
+           puzzler.pruned_report(num_pruned, header['prune']),
+           timedelta(seconds=seconds)))
+    if len(stats) > 1:
+        for i, (solutions, searches) in enumerate(stats):
+            print >>output_stream, (
+                '(%s: %s solution%s, %s searches)'
+                % (puzzles[i].__class__.__name__,
+                   thousands(solutions),
+                   plural_s(solutions),
+                   thousands(searches)))
+    output_stream.flush()
+    return solver.num_solutions
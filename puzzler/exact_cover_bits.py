@@ -0,0 +1,897 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+An implementation of Donald E. Knuth's 'Algorithm X' [1]_ for the generalized
+exact cover problem [2]_ using bitsets: Python (long) integers used as bit
+masks over the rows and columns of the matrix.
+
+.. [1] http://en.wikipedia.org/wiki/Knuth%27s_Algorithm_X
+.. [2] http://en.wikipedia.org/wiki/Exact_cover
+"""
+
+import itertools
+from pprint import pprint
+
+from puzzler import strategies
+
+
+class ExactCover(object):
+
+    """
+    Given a sparse matrix of 0s and 1s, find every set of rows containing
+    exactly one 1 in each primary column (and at most one 1 in each secondary
+    column).  See `load_matrix` for a description of the data structure.
+    Uses bitsets to implement Knuth's Algorithm X, extended with colored
+    secondary columns (Knuth's Algorithm C) and column multiplicities
+    (Knuth's Algorithm M).
+    """
+
+    colored_columns = True
+    """This engine supports colored secondary columns (see `load_matrix`)."""
+
+    multiplicities = True
+    """This engine supports column multiplicities (see `load_matrix`)."""
+
+    decomposition = True
+    """This engine supports splitting the search into independent groups
+    (see `self.decompose`)."""
+
+    pruning = True
+    """This engine supports pruning checks (see `self.pruning_check`)."""
+
+    subtrees = True
+    """This engine's search can be split into the subtrees of
+    `self.subtree_prefixes` (it searches in the same order)."""
+
+    count_cache_size = 2 ** 18
+    """The default maximum number of entries in the `count_solutions`
+    cache."""
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
+        """
+        Parameters:
+
+        * `matrix` & `secondary`: see `self.load_matrix`.
+
+        * `state`: a `puzzler.SessionState` object which stores the runtime
+          state of this puzzle (we're resuming a previously interrupted
+          puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: the name of a column selection strategy (see
+          `puzzler.strategies`), or None for the default.
+        """
+        self.columns = None
+        """A list of row bitsets, indexed by column ID: bit `r` is set if row
+        `r` contains a 1/True for that column."""
+
+        self.rows = None
+        """A list of lists of column IDs.  Each list represents one row of
+        the exact cover matrix: all the columns containing a 1/True."""
+
+        self.row_bits = None
+        """A list of column bitsets, one per row: the primary columns covered
+        by each row."""
+
+        self.column_bits = None
+        """A list of column bitsets, one per row: all the columns of each
+        row."""
+
+        self.conflicts = None
+        """A list of lists of row bitsets, one list per row: the rows which
+        conflict with it, column by column (the column's rows, less those
+        giving a colored column the same color)."""
+
+        self.colored = False
+        """True if any row gives a secondary column a color."""
+
+        self.primary = 0
+        """A column bitset of all primary columns."""
+
+        self.bounds = None
+        """For column multiplicities: a list of (minimum, maximum) 2-tuples,
+        indexed by column ID; None if every primary column is to be covered
+        exactly once."""
+
+        self.ranged = None
+        """For column multiplicities: a list of lists of column IDs, one per
+        row: the columns with multiplicities (which are not in
+        `self.row_bits` or `self.conflicts`)."""
+
+        self.slack = 0
+        """For column multiplicities: a row bitset of the rows of the columns
+        whose maximum exceeds their minimum."""
+
+        self.names = None
+        """A list of column names, indexed by column ID."""
+
+        self.decompose = False
+        """If set, `self.solve` & `self.count_solutions` split the search
+        into independent groups of columns wherever possible (see
+        `self.split`).  Ignored with column multiplicities."""
+
+        self.pruning_check = None
+        """A pruning check supplied by the puzzle (see `puzzler.pruning`),
+        bound to each matrix loaded; ignored with column multiplicities."""
+
+        self.dead_end = None
+        """The bound pruning check: a function of the uncovered columns (a
+        column bitset) returning True if the state can have no solution; or
+        None, for no pruning."""
+
+        self.num_pruned = 0
+        """The number of search states cut off by `self.dead_end` (not
+        included in `self.num_searches`)."""
+
+        self.strategy = strategy
+        """The column selection strategy name (None for the default)."""
+
+        self.keys = None
+        """A list of static column selection keys, indexed by column ID
+        (see `puzzler.strategies`); None for the default strategy."""
+
+        self.weight = None
+        """Column size weight for the column selection keys."""
+
+        self.solution = []
+        self.num_solutions = 0
+        self.num_searches = 0
+        self.max_searches = None
+        """If set, `self.solve` stops when `self.num_searches` reaches this
+        number (a limit on the total searches, including those of earlier
+        calls)."""
+
+        if state:
+            self.solution = state.solution
+            self.num_solutions = state.num_solutions
+            self.num_searches = state.num_searches
+        if matrix:
+            self.load_matrix(matrix, secondary)
+
+    def load_matrix(self, matrix, secondary=0, multiplicities=None):
+        """
+        Convert and store the input `matrix` into `self.columns`,
+        `self.rows`, `self.row_bits`, `self.conflicts`, and `self.primary`
+        (and `self.bounds`, `self.ranged`, and `self.slack`).
+
+        The input `matrix` is a two-dimensional list of tuples:
+
+        * Each row is a tuple of equal length.
+
+        * The first row contains the column names: first the puzzle piece
+          names, then the solution space coordinates.  For example::
+
+              ('A', 'B', 'C', '0,0', '1,0', '0,1', '1,1')
+
+        * The subsequent rows consist of 1 & 0 (True & False) values.  Each
+          row contains a 1/True value in the column identifying the piece, and
+          1/True values in each column identifying the position.  There must
+          be one row for each possible position of each puzzle piece.
+
+        The `secondary` parameter is the number of secondary (rightmost)
+        columns: columns which may, but need not, participate in the solution.
+
+        A secondary column value may be a color: a 2-tuple, (column name,
+        color).  Rows giving a column the same color (any hashable value) are
+        compatible: they may all be part of a solution.  Rows giving it a
+        different color, or no color, conflict.
+
+        `multiplicities` is an optional mapping of primary column names to
+        (minimum, maximum) 2-tuples: the number of rows of a solution which
+        may contain a 1 in that column (by default, exactly one).  For
+        example, a piece column with (2, 2) stands for two identical pieces,
+        and one with (0, 1) for an optional piece.
+
+        Columns are identified by integer IDs, assigned in column name order
+        (as in `puzzler.exact_cover_x2`, so both engines choose the same
+        columns and produce solutions in the same order).
+        """
+        matrix_iter = iter(matrix)
+        column_names = matrix_iter.next()
+        num_columns = len(column_names)
+        order = sorted(range(num_columns), key=column_names.__getitem__)
+        column_ids = [None] * num_columns
+        for c, j in enumerate(order):
+            column_ids[j] = c
+        self.names = [column_names[j] for j in order]
+        self.primary = 0
+        for j in range(num_columns - secondary):
+            self.primary |= 1 << column_ids[j]
+        self.bounds = None
+        ranged = 0
+        if multiplicities:
+            self.bounds = [(1, 1)] * num_columns
+            for j in range(num_columns - secondary, num_columns):
+                self.bounds[column_ids[j]] = (0, 1)
+            for j, name in enumerate(column_names):
+                bounds = multiplicities.get(name)
+                if bounds and tuple(bounds) != (1, 1):
+                    if j >= num_columns - secondary:
+                        raise ValueError(
+                            'Secondary column %r cannot have a multiplicity.'
+                            % name)
+                    self.bounds[column_ids[j]] = tuple(bounds)
+                    ranged |= 1 << column_ids[j]
+        self.rows = []
+        row_colors = []
+        secondary_range = range(num_columns - secondary, num_columns)
+        for row in matrix_iter:
+            self.rows.append(
+                [column_ids[j] for j in range(num_columns) if row[j]])
+            row_colors.append(
+                dict((column_ids[j], row[j][1]) for j in secondary_range
+                     if isinstance(row[j], tuple)))
+        # Build the column bitsets from lists of row indices; or-ing bits
+        # into a long integer one at a time would be quadratic:
+        column_rows = [[] for c in range(num_columns)]
+        color_rows = {}
+        self.row_bits = row_bits = []
+        self.column_bits = column_bits = []
+        for r, row in enumerate(self.rows):
+            bits = 0
+            for c in row:
+                column_rows[c].append(r)
+                bits |= 1 << c
+            row_bits.append(bits & self.primary & ~ranged)
+            column_bits.append(bits)
+            for c_color in row_colors[r].items():
+                color_rows.setdefault(c_color, []).append(r)
+        self.columns = [bitset(rows) for rows in column_rows]
+        # rows of a colored column conflict unless they have the same color:
+        color_conflicts = dict(
+            (c_color, self.columns[c_color[0]] & ~bitset(rows))
+            for (c_color, rows) in color_rows.iteritems())
+        self.colored = bool(color_rows)
+        self.conflicts = [
+            [color_conflicts[c, colors[c]] if c in colors else self.columns[c]
+             for c in row if not (ranged >> c) & 1]
+            for row, colors in zip(self.rows, row_colors)]
+        self.ranged = None
+        self.slack = 0
+        if self.bounds:
+            self.ranged = [[c for c in row if (ranged >> c) & 1]
+                           for row in self.rows]
+            for c, (minimum, maximum) in enumerate(self.bounds):
+                if (ranged >> c) & 1:
+                    if not minimum:
+                        self.primary &= ~(1 << c)
+                    if maximum > minimum:
+                        self.slack |= self.columns[c]
+        if not strategies.is_native(self.strategy):
+            self.keys, self.weight = strategies.column_keys(
+                self.strategy, self.names, len(self.rows))
+        self.dead_end = None
+        if self.pruning_check is not None and not self.bounds:
+            self.dead_end = self.pruning_check.bind(
+                self.names, self.rows, self.primary)
+
+    def solve(self):
+        """
+        A generator that produces all solutions: Algorithm X.
+
+        The search state is a pair of bitsets: the active rows (rows which
+        don't conflict with any row in the partial solution) and the
+        uncovered primary columns.  Covering a row clears its conflicting
+        rows from the active set; uncovering just restores the
+        previous bitsets.  `stack` holds one frame per search level: the
+        bitsets, the untried candidate rows (a row bitset), and the current
+        row.  A non-empty `self.solution` at the start is a resume prefix.
+        States failing the pruning check (`self.dead_end`) are not searched.
+        """
+        if self.bounds:
+            for solution in self.solve_multiplicities():
+                yield solution
+            return
+        if self.decompose:
+            for solution in self.solve_decomposed():
+                yield solution
+            return
+        conflicts = self.conflicts
+        rows = self.rows
+        row_bits = self.row_bits
+        if self.keys is None:
+            choose_rows = self.choose_rows
+        else:
+            choose_rows = self.choose_keyed_rows
+        dead_end = self.dead_end
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        active = (1 << len(rows)) - 1
+        uncovered = self.primary
+        while True:
+            if not uncovered:
+                yield self.full_solution()
+            elif dead_end is not None and dead_end(uncovered):
+                self.num_pruned += 1
+                # drop any resume prefix below this state:
+                del solution[len(stack):]
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                candidates = choose_rows(active, uncovered)
+                level = len(stack)
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    resume_row = solution[level]
+                    if (candidates >> resume_row) & 1:
+                        candidates &= ~((1 << resume_row) - 1)
+                    else:
+                        candidates = 0
+                        del solution[level:]
+                stack.append([active, uncovered, candidates, None])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                active, uncovered, candidates, r = frame
+                level = len(stack) - 1
+                if r is not None:
+                    solution.pop()
+                if candidates:
+                    low_bit = candidates & -candidates
+                    frame[2] = candidates ^ low_bit
+                    frame[3] = r = low_bit.bit_length() - 1
+                    if len(solution) == level:
+                        solution.append(r)
+                    for row_conflicts in conflicts[r]:
+                        active &= ~row_conflicts
+                    uncovered &= ~row_bits[r]
+                    break
+                stack.pop()
+            else:
+                return
+
+    def solve_multiplicities(self):
+        """
+        A generator that produces all solutions, for column multiplicities:
+        Algorithm X, generalized as in Knuth's Algorithm M.
+
+        `used` counts the solution rows in each column with a multiplicity.
+        A column stays uncovered until its minimum is reached, and its rows
+        become inactive once its maximum is reached.  To produce each
+        solution only once, whatever the order of its rows, taking a
+        candidate row also deactivates the node's candidates tried before
+        it: they are explored in their own branches.  Similarly, when every
+        column has reached its minimum, the partial solution is a solution,
+        and the search goes on with the remaining rows of the columns whose
+        maximum has not been reached (`self.slack`).  Each frame of `stack`
+        also holds the node's candidate rows to deactivate this way (all of
+        them, or none for a column without a multiplicity, whose rows
+        conflict with each other anyway).
+        """
+        conflicts = self.conflicts
+        rows = self.rows
+        row_bits = self.row_bits
+        ranged = self.ranged
+        columns = self.columns
+        bounds = self.bounds
+        slack = self.slack
+        used = [0] * len(bounds)
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        active = (1 << len(rows)) - 1
+        uncovered = self.primary
+        while True:
+            if not uncovered:
+                yield self.full_solution()
+                candidates = tried = active & slack
+            else:
+                candidates, c = self.choose_ranged_rows(
+                    active, uncovered, used)
+                if bounds[c] == (1, 1):
+                    # the candidates conflict with each other anyway
+                    tried = 0
+                else:
+                    tried = candidates
+            if uncovered or candidates:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                level = len(stack)
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    resume_row = solution[level]
+                    if (candidates >> resume_row) & 1:
+                        candidates &= ~((1 << resume_row) - 1)
+                    else:
+                        candidates = 0
+                        del solution[level:]
+                stack.append([active, uncovered, candidates, None, tried])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                active, uncovered, candidates, r, tried = frame
+                level = len(stack) - 1
+                if r is not None:
+                    solution.pop()
+                    for c in ranged[r]:
+                        used[c] -= 1
+                if candidates:
+                    low_bit = candidates & -candidates
+                    frame[2] = candidates ^ low_bit
+                    frame[3] = r = low_bit.bit_length() - 1
+                    if len(solution) == level:
+                        solution.append(r)
+                    # this row and the candidates tried before it:
+                    if tried:
+                        active &= ~(tried & ((low_bit << 1) - 1))
+                    for row_conflicts in conflicts[r]:
+                        active &= ~row_conflicts
+                    uncovered &= ~row_bits[r]
+                    for c in ranged[r]:
+                        used[c] += 1
+                        minimum, maximum = bounds[c]
+                        if used[c] == minimum:
+                            uncovered &= ~(1 << c)
+                        if used[c] == maximum:
+                            active &= ~columns[c]
+                    break
+                stack.pop()
+            else:
+                return
+
+    def count_solutions(self, cache_size=None):
+        """
+        Return the number of solutions, without producing them, or None if
+        `self.max_searches` was reached first.
+
+        The count below a search state is the same wherever the state
+        recurs (e.g. the same part of the board left over by different
+        placements of the same pieces), so counts are cached by state and
+        each state is only searched once while it stays in the cache.  The
+        state is identified by the set of columns used by the partial
+        solution (which determines the active rows & the uncovered
+        columns); with colored columns or `self.decompose`, by the active
+        rows & the uncovered columns themselves.
+
+        The cache holds at most `cache_size` entries (default:
+        `self.count_cache_size`), in two generations: new entries go into
+        `recent`, entries found in `old` are moved back into `recent`, and
+        when `recent` is full, it replaces `old` (whose entries, unused for
+        a whole generation, are dropped).
+
+        If `self.decompose` is set, a state which splits into independent
+        groups (see `self.split`) counts the product of their counts.  A
+        state failing the pruning check (`self.dead_end`) counts 0.
+
+        The search is iterative, like `self.solve`.  Each frame of `stack`
+        is either a search frame, holding the state's cache key, the active
+        rows, the uncovered columns, the columns used, the untried
+        candidate rows, and the number of solutions so far; or a product
+        frame (with 3 items), holding the cache key, the groups not counted
+        yet, and the product so far.  Column multiplicities are not
+        supported by the cache (or by decomposition): their solutions are
+        simply counted.
+        """
+        if self.bounds:
+            count = 0
+            for solution in self.solve_multiplicities():
+                count += 1
+            if self.num_searches == self.max_searches:
+                return None
+            return count
+        if cache_size is None:
+            cache_size = self.count_cache_size
+        generation_size = max(cache_size // 2, 1)
+        conflicts = self.conflicts
+        row_bits = self.row_bits
+        column_bits = self.column_bits
+        decompose = self.decompose
+        dead_end = self.dead_end
+        key_columns = not (self.colored or decompose)
+        if self.keys is None:
+            choose_rows = self.choose_rows
+        else:
+            choose_rows = self.choose_keyed_rows
+        max_searches = self.max_searches
+        recent = {}
+        old = {}
+        stack = []
+        active = (1 << len(self.rows)) - 1
+        uncovered = self.primary
+        used = 0
+        whole = True
+        while True:
+            if not uncovered:
+                result = 1
+            else:
+                if key_columns:
+                    key = used
+                else:
+                    key = (active, uncovered)
+                result = recent.get(key)
+                if result is None:
+                    result = old.get(key)
+                    if result is not None:
+                        recent[key] = result
+                if result is None and dead_end is not None and dead_end(
+                        uncovered):
+                    self.num_pruned += 1
+                    result = 0
+                if result is None:
+                    candidates = choose_rows(active, uncovered)
+                    if candidates and decompose and whole:
+                        groups = self.split(active, uncovered)
+                        if len(groups) > 1:
+                            # count the groups one by one, smallest first
+                            # (`groups.pop()`), as they are:
+                            groups.reverse()
+                            stack.append([key, groups, 1])
+                            active, uncovered = groups.pop()
+                            whole = False
+                            continue
+                    self.num_searches += 1
+                    if self.num_searches == max_searches:
+                        return None
+                    stack.append(
+                        [key, active, uncovered, used, candidates, 0])
+                    result = 0
+            whole = True
+            # return to the next untried row or uncounted group, finishing
+            # frames on the way:
+            while stack:
+                frame = stack[-1]
+                if len(frame) == 3:
+                    frame[2] *= result
+                    if frame[2] and frame[1]:
+                        active, uncovered = frame[1].pop()
+                        whole = False
+                        break
+                    result = frame[2]
+                else:
+                    frame[5] += result
+                    key, active, uncovered, used, candidates, result = frame
+                    if candidates:
+                        low_bit = candidates & -candidates
+                        frame[4] = candidates ^ low_bit
+                        r = low_bit.bit_length() - 1
+                        for row_conflicts in conflicts[r]:
+                            active &= ~row_conflicts
+                        uncovered &= ~row_bits[r]
+                        used |= column_bits[r]
+                        break
+                if len(recent) >= generation_size:
+                    old = recent
+                    recent = {}
+                recent[frame[0]] = result
+                stack.pop()
+            else:
+                return result
+
+    def solve_decomposed(self):
+        """
+        A generator that produces all solutions, splitting the search into
+        independent groups wherever possible (see `self.split` and
+        `self.partial_solutions`).  The solutions come in a different order
+        than from `self.solve`, and resume prefixes are not supported
+        (`self.solution` is overwritten).
+        """
+        solution = self.solution
+        for rows in self.partial_solutions(
+                (1 << len(self.rows)) - 1, self.primary):
+            solution[:] = rows
+            yield self.full_solution()
+        del solution[:]
+
+    def subtree_prefixes(self, min_subtrees, max_depth=2):
+        """
+        Return a list of partial solutions (lists of row indices), the roots
+        of independent subtrees of the search: the first levels of the
+        search tree (up to `max_depth`) are expanded, in search order, until
+        there are at least `min_subtrees` of them.  Searched in this order,
+        the subtrees produce the solutions of `self.solve`; a subtree whose
+        prefix is a complete solution produces just that.  Dead ends are
+        dropped.  The expanded levels are counted in `self.num_searches`
+        (the subtree roots are not).
+
+        Column multiplicities, decomposition, and pruning checks are not
+        taken into account.
+        """
+        conflicts = self.conflicts
+        row_bits = self.row_bits
+        if self.keys is None:
+            choose_rows = self.choose_rows
+        else:
+            choose_rows = self.choose_keyed_rows
+        frontier = [([], (1 << len(self.rows)) - 1, self.primary)]
+        for depth in range(max_depth):
+            if len(frontier) >= min_subtrees:
+                break
+            expanded = []
+            for prefix, active, uncovered in frontier:
+                if not uncovered:
+                    expanded.append((prefix, active, uncovered))
+                    continue
+                self.num_searches += 1
+                candidates = choose_rows(active, uncovered)
+                while candidates:
+                    low_bit = candidates & -candidates
+                    candidates ^= low_bit
+                    r = low_bit.bit_length() - 1
+                    row_active = active
+                    for row_conflicts in conflicts[r]:
+                        row_active &= ~row_conflicts
+                    expanded.append(
+                        (prefix + [r], row_active, uncovered & ~row_bits[r]))
+            frontier = expanded
+        return [prefix for (prefix, active, uncovered) in frontier]
+
+    def partial_solutions(self, active, uncovered, whole=True):
+        """
+        A generator that produces the solutions (lists of row indices) of
+        the subproblem with `active` rows & `uncovered` columns, for
+        `self.solve_decomposed`.
+
+        If the subproblem splits into independent groups (unless it is known
+        to be one group, `whole` being false), the solutions of each group
+        are listed, then combined lazily: the cross product of the groups is
+        never stored, or searched.  A group without solutions ends the
+        search (the smallest groups come first, so dead ones are found
+        early).  A dead end (a column without active rows, or a state
+        failing the pruning check) isn't split.
+        """
+        if not uncovered:
+            yield []
+            return
+        if self.dead_end is not None and self.dead_end(uncovered):
+            self.num_pruned += 1
+            return
+        if self.keys is None:
+            candidates = self.choose_rows(active, uncovered)
+        else:
+            candidates = self.choose_keyed_rows(active, uncovered)
+        if candidates and whole:
+            groups = self.split(active, uncovered)
+            if len(groups) > 1:
+                results = []
+                for group_active, group_uncovered in groups:
+                    rows = list(self.partial_solutions(
+                        group_active, group_uncovered, False))
+                    if not rows or self.num_searches == self.max_searches:
+                        return
+                    results.append(rows)
+                for combination in itertools.product(*results):
+                    yield list(itertools.chain(*combination))
+                return
+        self.num_searches += 1
+        if self.num_searches == self.max_searches:
+            return
+        while candidates:
+            low_bit = candidates & -candidates
+            candidates ^= low_bit
+            r = low_bit.bit_length() - 1
+            row_active = active
+            for row_conflicts in self.conflicts[r]:
+                row_active &= ~row_conflicts
+            for rows in self.partial_solutions(
+                    row_active, uncovered & ~self.row_bits[r]):
+                yield [r] + rows
+            if self.num_searches == self.max_searches:
+                return
+
+    def split(self, active, uncovered):
+        """
+        Return the independent groups of the subproblem with `active` rows
+        & `uncovered` columns, as a list of (active rows, uncovered columns)
+        bitset pairs, in order of size (number of uncovered columns).  Rows
+        sharing any column (primary or secondary) are in the same group, so
+        the rows of different groups never conflict and each group can be
+        solved on its own.  Active rows containing no
+        uncovered column are left out: they can't be part of a solution.
+
+        Each group is grown from one uncovered column by alternately adding
+        the active rows of its columns and the columns of those rows.
+        """
+        columns = self.columns
+        column_bits = self.column_bits
+        groups = []
+        rest = uncovered
+        while rest:
+            group_columns = frontier = rest & -rest
+            group_rows = 0
+            while frontier:
+                rows = 0
+                while frontier:
+                    low_bit = frontier & -frontier
+                    frontier ^= low_bit
+                    rows |= columns[low_bit.bit_length() - 1]
+                rows &= active & ~group_rows
+                group_rows |= rows
+                while rows:
+                    low_bit = rows & -rows
+                    rows ^= low_bit
+                    frontier |= column_bits[low_bit.bit_length() - 1]
+                frontier &= ~group_columns
+                group_columns |= frontier
+            groups.append((group_rows, uncovered & group_columns))
+            rest &= ~group_columns
+        if len(groups) > 1:
+            groups.sort(key=lambda (rows, columns): bin(columns).count('1'))
+        return groups
+
+    def choose_ranged_rows(self, active, uncovered, used):
+        """
+        Return the candidate rows (a row bitset) and the column ID of the
+        uncovered column with the fewest choices, for column multiplicities.
+        A column still needing `k` rows (its minimum less its `used` count)
+        has ``size - k + 1`` choices for its lowest solution row, "size"
+        being its number of active rows: the last `k - 1` active rows can't
+        come first.  These are left out of the candidates.  Returns no
+        candidates (0) if a column can't reach its minimum.  Column selection
+        strategy keys (see `puzzler.strategies`) apply to the number of
+        choices as they do to the size in `self.choose_keyed_rows`; as there,
+        bits are only counted as far as needed to beat the best column so
+        far.
+        """
+        columns = self.columns
+        bounds = self.bounds
+        keys = self.keys
+        if keys is None:
+            weight = 1
+        else:
+            weight = self.weight
+        best_rows = None
+        best_key = None
+        best_column = None
+        while uncovered:
+            low_bit = uncovered & -uncovered
+            uncovered ^= low_bit
+            c = low_bit.bit_length() - 1
+            if keys is None:
+                key = 0
+            else:
+                key = keys[c]
+                if best_key is not None and key >= best_key:
+                    continue
+            need = bounds[c][0] - used[c]
+            column_rows = rest = columns[c] & active
+            if not weight:
+                limit = need
+            elif best_key is None:
+                limit = len(self.rows) + 1
+            else:
+                # smallest count that fails to beat `best_key`:
+                limit = -((key - best_key) // weight) + need - 1
+            count = 0
+            while rest and count < limit:
+                rest &= rest - 1
+                count += 1
+            if count < need:
+                return 0, c
+            if weight:
+                if count == limit:
+                    continue
+                key += weight * (count - need + 1)
+            best_rows = column_rows
+            best_key = key
+            best_column = c
+        need = bounds[best_column][0] - used[best_column]
+        for i in range(need - 1):
+            best_rows ^= 1 << (best_rows.bit_length() - 1)
+        return best_rows, best_column
+
+    def choose_rows(self, active, uncovered):
+        """
+        Return the active rows (a row bitset) of the uncovered column with the
+        fewest active rows (lowest column ID on ties).
+
+        Bits are counted by clearing them one at a time, stopping as soon as
+        the count reaches the best so far.  A full population count (e.g.
+        ``bin(rows).count('1')``) costs time proportional to the number of
+        rows in the matrix, for every column at every search node.
+        """
+        columns = self.columns
+        best_rows = None
+        best_count = len(self.rows) + 1
+        while uncovered:
+            low_bit = uncovered & -uncovered
+            uncovered ^= low_bit
+            column_rows = rest = columns[low_bit.bit_length() - 1] & active
+            count = 0
+            while rest and count < best_count:
+                rest &= rest - 1
+                count += 1
+            if count < best_count:
+                if not count:
+                    return 0
+                best_rows = column_rows
+                best_count = count
+        return best_rows
+
+    def choose_keyed_rows(self, active, uncovered):
+        """
+        Return the active rows (a row bitset) of the uncovered column with the
+        lowest ``key + weight * size``, for a column selection strategy (see
+        `puzzler.strategies`).  As in `self.choose_rows`, bits are only
+        counted as far as needed to beat the best column so far.
+        """
+        columns = self.columns
+        keys = self.keys
+        weight = self.weight
+        best_rows = None
+        best_key = None
+        while uncovered:
+            low_bit = uncovered & -uncovered
+            uncovered ^= low_bit
+            c = low_bit.bit_length() - 1
+            key = keys[c]
+            if best_key is not None and key >= best_key:
+                continue
+            column_rows = rest = columns[c] & active
+            if weight:
+                if best_key is None:
+                    limit = len(self.rows) + 1
+                else:
+                    # smallest count that fails to beat `best_key`:
+                    limit = -((key - best_key) // weight)
+                count = 0
+                while rest and count < limit:
+                    rest &= rest - 1
+                    count += 1
+                if count == limit:
+                    continue
+                key += weight * count
+            best_rows = column_rows
+            best_key = key
+        return best_rows
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (row indices).
+        """
+        names = self.names
+        return [[names[c] for c in sorted(self.rows[r])]
+                for r in self.solution]
+
+    def format_solution(self):
+        """Return a simple formatted string representation of the solution."""
+        self.num_solutions += 1
+        solution = self.full_solution()
+        parts = ['solution %i:' % self.num_solutions]
+        for row in solution:
+            parts.append(
+                ' '.join(cell for cell in row
+                         # omit secondary columns (intersections):
+                         if not ((',' in cell) and (cell.endswith('i')))))
+        return '\n'.join(parts)
+
+
+def bitset(indices):
+    """Return an integer with the bits at the sorted `indices` set."""
+    if not indices:
+        return 0
+    # Build a string of binary digits, highest bit first; int() converts it
+    # in linear time:
+    top = indices[-1]
+    digits = ['0'] * (top + 1)
+    for i in indices:
+        digits[top - i] = '1'
+    return int(''.join(digits), 2)
+
+
+if __name__ == '__main__':
+    print 'testing exact_cover_bits.py:\n'
+    matrix = [
+        'A  B  C  D  E  F  G'.split(),
+        [0, 0, 1, 0, 1, 1, 0],
+        [1, 0, 0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0, 1, 0],
+        [1, 0, 0, 1, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 1, 0, 1]]
+    puzzle = ExactCover(matrix)
+    print 'columns ='
+    pprint([bin(column) for column in puzzle.columns])
+    print '\nrows ='
+    pprint(puzzle.rows)
+    for solution in puzzle.solve():
+        print '\n', puzzle.format_solution(), '\n'
+        print 'unformatted:\n', solution, '\n'
+    print puzzle.num_searches, 'searches'
@@ -18,6 +18,7 @@ technique [3]_ ('DLX').
 """
 
 import exactcover
+from puzzler import strategies
 from puzzler.utils import thousands
 
 
@@ -31,7 +32,11 @@ class ExactCover(object):
     approach to Knuth's Algorithm X.
     """
 
-    def __init__(self, matrix=None, secondary=0, state=None):
+    restarts = False
+    """Randomized restarts (`puzzler.solve_first`) are not supported: the C
+    extension has neither random column selection nor search limits."""
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
         """
         Parameters:
 
@@ -40,11 +45,22 @@ class ExactCover(object):
         * `state`: a `puzzler.SessionState` object which stores the runtime
           state of this puzzle (we're resuming a previously interrupted
           puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: must be None or the default column selection strategy;
+          the C extension has its own, built in.
         """
+        if not strategies.is_native(strategy):
+            raise strategies.StrategyError(
+                'The "c" algorithm only supports the default column '
+                'selection strategy ("%s").' % strategies.default)
+
         self.solver = None
         """An `exactcover.Coverings` iterator object, set in
         `self.load_matrix()`."""
 
+        self.names = None
+        """A list of column names, indexed by column number."""
+
         self.solution = []
         self.num_solutions = 0
 
@@ -85,13 +101,17 @@ class ExactCover(object):
         columns: columns which may, but need not, participate in the solution.
 
         The converted data structure consists of a list of lists of column
-        names.
+        numbers (indices into the first row).  Column names are only used to
+        format solutions.
         """
         if self.solver:
             self._num_previous_searches += self.solver.num_searches
-        rows = [sorted(item for item in row if item) for row in matrix[1:]]
+        self.names = matrix[0]
+        num_columns = len(self.names)
+        rows = [[j for j in range(num_columns) if row[j]]
+                for row in matrix[1:]]
         self.solver = exactcover.Coverings(
-            rows, headers=matrix[0], secondary=secondary)
+            rows, headers=range(num_columns), secondary=secondary)
 
     def solve(self, level=0):
         """
@@ -100,7 +120,15 @@ class ExactCover(object):
         """
         for solution in self.solver:
             self.solution = solution
-            yield solution
+            yield self.full_solution()
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (column numbers).
+        """
+        names = self.names
+        return [sorted(names[j] for j in row) for row in self.solution]
 
     def format_solution(self):
         """Return a simple formatted string representation of the solution."""
@@ -108,7 +136,7 @@ class ExactCover(object):
         parts = [
             'solution %i (%s searches):'
             % (self.num_solutions, thousands(self.num_searches))]
-        for row in self.solution:
+        for row in self.full_solution():
             parts.append(
                 ' '.join(cell for cell in row
                          # omit secondary columns (intersections):
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+An implementation of Donald E. Knuth's 'Algorithm X' [1]_ for the generalized
+exact cover problem [2]_ using the 'Dancing Cells' technique [3]_: sparse
+sets instead of doubly linked lists.
+
+Each column's active rows, and the active primary columns, are kept at the
+front of permutation arrays, with an index of each element's position.
+Removing an element swaps it with the last active one and shrinks the set;
+the removed elements stay in place, so restoring them (in the reverse order)
+only has to grow the set again.  Backtracking touches no links at all.
+
+.. [1] http://en.wikipedia.org/wiki/Knuth%27s_Algorithm_X
+.. [2] http://en.wikipedia.org/wiki/Exact_cover
+.. [3] Donald E. Knuth, "The Art of Computer Programming", Volume 4,
+   Pre-fascicle 7A (2019), "Dancing Cells"; see also
+   http://www-cs-faculty.stanford.edu/~knuth/programs/ssxcc.w
+"""
+
+from puzzler import strategies
+
+
+class ExactCover(object):
+
+    """
+    Given a sparse matrix of 0s and 1s, find every set of rows containing
+    exactly one 1 in each primary column (and at most one 1 in each secondary
+    column).  See `load_matrix` for a description of the data structure.
+    Uses sparse sets ('Dancing Cells') to implement Knuth's Algorithm X.
+    """
+
+    __slots__ = ('cells', 'start', 'end', 'node_column', 'node_row',
+                 'node_location', 'row_start', 'items', 'item_location',
+                 'num_items', 'num_primary', 'names', 'strategy', 'key',
+                 'weight', 'solution', 'num_solutions', 'num_searches',
+                 'max_searches')
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
+        """
+        Parameters:
+
+        * `matrix` & `secondary`: see `self.load_matrix`.
+
+        * `state`: a `puzzler.SessionState` object which stores the runtime
+          state of this puzzle (we're resuming a previously interrupted
+          puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: the name of a column selection strategy (see
+          `puzzler.strategies`), or None for the default.
+        """
+        self.cells = None
+        """Array of nodes: the column sets, one segment per column.  Column
+        `c`'s active rows are the nodes from ``self.start[c]`` up to
+        ``self.end[c]``."""
+
+        self.start = None
+        """Array of `self.cells` segment start indices, indexed by column."""
+
+        self.end = None
+        """Array of `self.cells` active set end indices, indexed by column
+        (the column's size is ``self.end[c] - self.start[c]``)."""
+
+        self.node_column = None
+        """Array mapping each node (a 1 in the matrix) to its column."""
+
+        self.node_row = None
+        """Array mapping each node to its matrix row index."""
+
+        self.node_location = None
+        """Array mapping each node to its current index in `self.cells`."""
+
+        self.row_start = None
+        """Array mapping each matrix row index to its first node; the nodes
+        of row `r` are ``self.row_start[r]`` up to ``self.row_start[r +
+        1]``."""
+
+        self.items = None
+        """Array of primary columns; the first `self.num_items` are
+        active."""
+
+        self.item_location = None
+        """Array mapping each primary column to its index in `self.items`."""
+
+        self.num_items = 0
+        """The number of active primary columns."""
+
+        self.num_primary = 0
+        """The number of primary columns."""
+
+        self.names = None
+        """List of column names, indexed by column."""
+
+        self.strategy = strategy
+        """The column selection strategy name (None for the default)."""
+
+        self.key = None
+        """Array of static column selection keys, indexed by column (see
+        `puzzler.strategies`)."""
+
+        self.weight = None
+        """Column size weight for `self.choose_keyed_column`."""
+
+        self.solution = []
+        self.num_solutions = 0
+        self.num_searches = 0
+        self.max_searches = None
+        """If set, `self.solve` stops when `self.num_searches` reaches this
+        number (a limit on the total searches, including those of earlier
+        calls)."""
+
+        if state:
+            self.solution = state.solution
+            self.num_solutions = state.num_solutions
+            self.num_searches = state.num_searches
+        if matrix:
+            self.load_matrix(matrix, secondary)
+
+    def load_matrix(self, matrix, secondary=0):
+        """
+        Convert and store the input `matrix` as sparse sets held in integer
+        arrays.
+
+        The input `matrix` is a two-dimensional list of tuples:
+
+        * Each row is a tuple of equal length.
+
+        * The first row contains the column names: first the puzzle piece
+          names, then the solution space coordinates.  For example::
+
+              ('A', 'B', 'C', '0,0', '1,0', '0,1', '1,1')
+
+        * The subsequent rows consist of 1 & 0 (True & False) values.  Each
+          row contains a 1/True value in the column identifying the piece, and
+          1/True values in each column identifying the position.  There must
+          be one row for each possible position of each puzzle piece.
+
+        The `secondary` parameter is the number of secondary (rightmost)
+        columns: columns which may, but need not, participate in the solution.
+
+        Columns are identified by their matrix index, and nodes are numbered
+        row by row, as in `puzzler.exact_cover_dlxa` (so both engines choose
+        the same columns and produce solutions in the same order).
+        """
+        names = matrix[0]
+        num_columns = len(names)
+        self.names = list(names)
+        self.num_primary = num_columns - secondary
+        self.row_start = row_start = [0]
+        self.node_column = node_column = []
+        self.node_row = node_row = []
+        column_nodes = [[] for c in range(num_columns)]
+        for r, row in enumerate(matrix[1:]):
+            for c in range(num_columns):
+                if row[c]:
+                    column_nodes[c].append(len(node_column))
+                    node_column.append(c)
+                    node_row.append(r)
+            row_start.append(len(node_column))
+        self.cells = cells = []
+        self.start = start = []
+        self.end = end = []
+        self.node_location = node_location = [None] * len(node_column)
+        for nodes in column_nodes:
+            start.append(len(cells))
+            for node in nodes:
+                node_location[node] = len(cells)
+                cells.append(node)
+            end.append(len(cells))
+        self.items = range(self.num_primary)
+        self.item_location = range(self.num_primary)
+        self.num_items = self.num_primary
+        if not strategies.is_native(self.strategy):
+            self.key, self.weight = strategies.column_keys(
+                self.strategy, names, len(row_start) - 1)
+
+    def solve(self):
+        """
+        A generator that produces all solutions: Algorithm X.
+
+        The search is iterative.  `stack` holds one frame per search level:
+        the covered column, its candidate rows (the active rows at the time
+        it was chosen, in row order, as in Dancing Links), the index of the
+        next candidate, and the current row.  A non-empty `self.solution` at
+        the start is a resume prefix: at each level, rows before the recorded
+        row are skipped (already explored).
+        """
+        cells = self.cells
+        start = self.start
+        end = self.end
+        node_column = self.node_column
+        node_row = self.node_row
+        row_start = self.row_start
+        cover = self.cover
+        uncover = self.uncover
+        if strategies.is_native(self.strategy):
+            choose_column = self.choose_column
+        else:
+            choose_column = self.choose_keyed_column
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        while True:
+            if not self.num_items:
+                yield self.full_solution()
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                c = choose_column()
+                candidates = sorted(
+                    node_row[node] for node in cells[start[c]:end[c]])
+                cover(c)
+                i = 0
+                level = len(stack)
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    try:
+                        i = candidates.index(solution[level])
+                    except ValueError:
+                        i = len(candidates)
+                        del solution[level:]
+                stack.append([c, candidates, i, None])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                c, candidates, i, r = frame
+                level = len(stack) - 1
+                if r is not None:
+                    solution.pop()
+                    for node in xrange(row_start[r + 1] - 1,
+                                       row_start[r] - 1, -1):
+                        if node_column[node] != c:
+                            uncover(node_column[node])
+                if i < len(candidates):
+                    frame[2] = i + 1
+                    frame[3] = r = candidates[i]
+                    if len(solution) == level:
+                        solution.append(r)
+                    for node in xrange(row_start[r], row_start[r + 1]):
+                        if node_column[node] != c:
+                            cover(node_column[node])
+                    break
+                uncover(c)
+                stack.pop()
+            else:
+                return
+
+    def choose_column(self):
+        """
+        Return the active primary column with the fewest active rows (lowest
+        column on ties).  The scan stops early at an empty column (a dead
+        end).
+        """
+        start = self.start
+        end = self.end
+        best = None
+        min_size = len(self.row_start)
+        for c in self.items[:self.num_items]:
+            s = end[c] - start[c]
+            if s < min_size or (s == min_size and c < best):
+                if not s:
+                    return c
+                best = c
+                min_size = s
+        return best
+
+    def choose_keyed_column(self):
+        """
+        Return the active primary column with the lowest ``key + weight *
+        size``, for a column selection strategy (see `puzzler.strategies`).
+        """
+        start = self.start
+        end = self.end
+        key = self.key
+        weight = self.weight
+        best = None
+        min_key = None
+        for c in self.items[:self.num_items]:
+            k = key[c] + weight * (end[c] - start[c])
+            if min_key is None or k < min_key:
+                best = c
+                min_key = k
+        return best
+
+    def cover(self, c):
+        """
+        Deactivate column `c` and hide its active rows from their other
+        columns.  Those columns are all active: a row of a covered column is
+        hidden from every other column.
+        """
+        cells = self.cells
+        end = self.end
+        node_column = self.node_column
+        node_row = self.node_row
+        node_location = self.node_location
+        row_start = self.row_start
+        if c < self.num_primary:
+            items = self.items
+            item_location = self.item_location
+            last = self.num_items - 1
+            location = item_location[c]
+            other = items[last]
+            items[location] = other
+            item_location[other] = location
+            items[last] = c
+            item_location[c] = last
+            self.num_items = last
+        for r in [node_row[node] for node in cells[self.start[c]:end[c]]]:
+            for node in xrange(row_start[r], row_start[r + 1]):
+                column = node_column[node]
+                if column != c:
+                    # swap `node` with the last active node of `column`:
+                    last = end[column] - 1
+                    location = node_location[node]
+                    other = cells[last]
+                    cells[location] = other
+                    node_location[other] = location
+                    cells[last] = node
+                    node_location[node] = last
+                    end[column] = last
+
+    def uncover(self, c):
+        """
+        Undo `self.cover(c)`.  The hidden rows are still in place, just past
+        the end of their columns' active sets: restoring them only grows the
+        sets, so the order of the rows doesn't matter (as long as covers are
+        undone in the reverse order).
+        """
+        end = self.end
+        node_column = self.node_column
+        node_row = self.node_row
+        row_start = self.row_start
+        last = end[c]
+        for node in self.cells[self.start[c]:last]:
+            r = node_row[node]
+            for column in node_column[row_start[r]:row_start[r + 1]]:
+                end[column] += 1
+        # each row was counted in column `c` too:
+        end[c] = last
+        if c < self.num_primary:
+            self.num_items += 1
+
+    def row_names(self, r):
+        """Return a sorted list of the column names of matrix row `r`."""
+        names = self.names
+        node_column = self.node_column
+        return sorted(
+            names[node_column[node]]
+            for node in xrange(self.row_start[r], self.row_start[r + 1]))
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (row indices).
+        """
+        return [self.row_names(r) for r in self.solution]
+
+    def format_solution(self):
+        """Return a simple formatted string representation of the solution."""
+        self.num_solutions += 1
+        parts = ['solution %i:' % self.num_solutions]
+        for row in self.full_solution():
+            parts.append(
+                ' '.join(cell for cell in row
+                         # omit secondary columns (intersections):
+                         if not ((',' in cell) and (cell.endswith('i')))))
+        return '\n'.join(parts)
+
+
+if __name__ == '__main__':
+    print 'testing exact_cover_cells.py:\n'
+    matrix = [
+        'A  B  C  D  E  F  G'.split(),
+        [0, 0, 1, 0, 1, 1, 0],
+        [1, 0, 0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0, 1, 0],
+        [1, 0, 0, 1, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 1, 0, 1]]
+    puzzle = ExactCover(matrix)
+    for solution in puzzle.solve():
+        print puzzle.format_solution(), '\n'
+        print 'unformatted:\n', solution, '\n'
+    print puzzle.num_searches, 'searches'
@@ -21,6 +21,8 @@ try:
 except ImportError:
     pass
 
+from puzzler import strategies
+
 
 class ExactCover(object):
 
@@ -31,9 +33,10 @@ class ExactCover(object):
     Uses the Dancing Links approach to Knuth's Algorithm X.
     """
 
-    __slots__ = ('root', 'solution', 'num_solutions', 'num_searches')
+    __slots__ = ('root', 'rows', 'strategy', 'solution', 'num_solutions',
+                 'num_searches', 'max_searches')
 
-    def __init__(self, matrix=None, secondary=0, state=None):
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
         """
         Parameters:
 
@@ -42,13 +45,27 @@ class ExactCover(object):
         * `state`: a `puzzler.SessionState` object which stores the runtime
           state of this puzzle (we're resuming a previously interrupted
           puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: the name of a column selection strategy (see
+          `puzzler.strategies`), or None for the default.
         """
         self.root = None
         """A `Root` object, set in `self.load_matrix()`."""
 
+        self.rows = None
+        """A list of the first `Datum` node of each matrix row, indexed by row
+        number.  Set in `self.load_matrix()`."""
+
+        self.strategy = strategy
+        """The column selection strategy name (None for the default)."""
+
         self.solution = []
         self.num_solutions = 0
         self.num_searches = 0
+        self.max_searches = None
+        """If set, `self.solve` stops when `self.num_searches` reaches this
+        number (a limit on the total searches, including those of earlier
+        calls)."""
 
         if state:
             self.solution = state.solution
@@ -97,8 +114,10 @@ class ExactCover(object):
 
         Except for the root node, each node contains four pointers: left,
         right, up, and down.  In addition, each datum node contains a pointer
-        to its column header, and each column header contains the column name
-        and a count of the number of active nodes in that column.
+        to its column header and the index of its matrix row, and each column
+        header contains the column name and a count of the number of active
+        nodes in that column.  Column names are only used to format
+        solutions; the search itself identifies rows by index.
         """
         self.root = root = Root()
         root.left = root.right = root
@@ -116,13 +135,15 @@ class ExactCover(object):
             root.left = column.left
             root.left.right = root
             column.left = column.right = column
-        for row in matrix[1:]:
+        self.rows = rows = []
+        for r, row in enumerate(matrix[1:]):
             first = None
             last = None
             for i, item in enumerate(row):
                 if item:
                     column = columns[i]
-                    datum = Datum(column=column, up=column.up, down=column)
+                    datum = Datum(column=column, up=column.up, down=column,
+                                  row=r)
                     if first is None:
                         first = datum
                         last = datum
@@ -134,36 +155,96 @@ class ExactCover(object):
                     first.left = datum
                     column.size += 1
                     last = datum
+            rows.append(first)
+        if not strategies.is_native(self.strategy):
+            keys, root.weight = strategies.column_keys(
+                self.strategy, matrix[0], len(rows))
+            for column, key in zip(columns, keys):
+                column.key = key
+        if self.solution and not isinstance(self.solution[0], int):
+            self.convert_legacy_solution()
+
+    def solve(self):
+        """
+        A generator that produces all solutions: Algorithm X.
 
-    def solve(self, level=0):
-        """A generator that produces all solutions: Algorithm X.."""
-        if self.root.right is self.root:
-            yield list(self.solution)
-            return
-        self.num_searches += 1
-        c = self.root.choose_column()
-        c.cover()
-        for r in c.down_siblings():
-            row = sorted(d.column.name for d in r.row_data())
-            if len(self.solution) > level:
-                if self.solution[level] != row:
-                    continue            # skip rows already fully explored
+        The search is iterative.  `stack` holds one frame per search level:
+        the covered column and its current row (the column itself before the
+        first row is tried).  A non-empty `self.solution` at the start is a
+        resume prefix: at each level, rows before the recorded row are
+        skipped (already explored).
+        """
+        root = self.root
+        if strategies.is_native(self.strategy):
+            choose_column = root.choose_column
+        else:
+            choose_column = root.choose_keyed_column
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        while True:
+            if root.right is root:
+                yield self.full_solution()
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                c = choose_column()
+                c.cover()
+                stack.append([c, c])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                c, r = frame
+                level = len(stack) - 1
+                if r is not c:
+                    solution.pop()
+                    for j in r.left_siblings():
+                        j.column.uncover()
+                r = r.down
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    while r is not c and r.row != solution[level]:
+                        r = r.down
+                    if r is c:
+                        del solution[level:]
+                if r is not c:
+                    if len(solution) == level:
+                        solution.append(r.row)
+                    for j in r.right_siblings():
+                        j.column.cover()
+                    frame[1] = r
+                    break
+                c.uncover()
+                stack.pop()
             else:
-                self.solution.append(row)
-            for j in r.right_siblings():
-                j.column.cover()
-            for solution in self.solve(level+1):
-                yield solution
-            self.solution.pop()
-            for j in r.left_siblings():
-                j.column.uncover()
-        c.uncover()
+                return
+
+    def row_names(self, r):
+        """Return a sorted list of the column names of matrix row `r`."""
+        return sorted(d.column.name for d in self.rows[r].row_data())
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (row indices).
+        """
+        return [self.row_names(r) for r in self.solution]
+
+    def convert_legacy_solution(self):
+        """
+        Convert a partial solution saved by an earlier version (lists of
+        column names) into row indices, in place.
+        """
+        indices = dict((tuple(self.row_names(r)), r)
+                       for r in range(len(self.rows)) if self.rows[r])
+        self.solution[:] = [indices[tuple(row)] for row in self.solution]
 
     def format_solution(self):
         """Return a simple formatted string representation of the solution."""
         self.num_solutions += 1
         parts = ['solution %i:' % self.num_solutions]
-        for row in self.solution:
+        for row in self.full_solution():
             parts.append(
                 ' '.join(cell for cell in row
                          # omit secondary columns (intersections):
@@ -177,14 +258,16 @@ class Datum(object):
     A four-way linked data node in the exact cover sparse matrix.
     """
 
-    __slots__ = ('up', 'down', 'left', 'right', 'column')
+    __slots__ = ('up', 'down', 'left', 'right', 'column', 'row')
 
-    def __init__(self, up=None, down=None, left=None, right=None, column=None):
+    def __init__(self, up=None, down=None, left=None, right=None, column=None,
+                 row=None):
         self.up = up
         self.down = down
         self.left = left
         self.right = right
         self.column = column
+        self.row = row
 
     # The following methods return lists for better performance:
 
@@ -235,13 +318,15 @@ class Column(Datum):
     A column header node in the exact cover sparse matrix.
     """
 
-    __slots__ = ('name', 'size')
+    __slots__ = ('name', 'size', 'key')
 
     def __init__(self, up=None, down=None, left=None, right=None, column=None,
                  name=None, size=0):
         Datum.__init__(self, up, down, left, right, column)
         self.name = name
         self.size = size
+        self.key = None
+        """Static column selection key (see `puzzler.strategies`)."""
 
     def cover(self):
         self.right.left = self.left
@@ -269,7 +354,7 @@ class Root(Datum):
     column header nodes.
     """
 
-    __slots__ = ('name',)
+    __slots__ = ('name', 'weight')
 
     name = 'root'
     up = None
@@ -279,6 +364,8 @@ class Root(Datum):
     def __init__(self, left=None, right=None):
         self.left = left
         self.right = right
+        self.weight = None
+        """Column size weight for `self.choose_keyed_column`."""
 
     def __str__(self):
         seen = set()
@@ -308,9 +395,41 @@ class Root(Datum):
         return '\n'.join(lines)
 
     def choose_column(self):
-        size, column = min((column.size, column)
-                           for column in self.right_siblings())
-        return column
+        """
+        Return the leftmost column with the fewest active rows.  (Ties used to
+        be broken by comparing `Column` objects, i.e. by memory address.)
+
+        This is a linear scan, stopping early at an empty column (a dead
+        end).  Keeping the columns in size buckets would make this constant
+        time, but the bucket updates in `Column.cover` & `Column.uncover`
+        cost far more than they save (the scan takes 1-2% of the run time).
+        """
+        column = best = self.right
+        min_size = column.size
+        column = column.right
+        while column is not self and min_size:
+            if column.size < min_size:
+                best = column
+                min_size = column.size
+            column = column.right
+        return best
+
+    def choose_keyed_column(self):
+        """
+        Return the column with the lowest ``key + weight * size``, for a
+        column selection strategy (see `puzzler.strategies`).
+        """
+        weight = self.weight
+        column = best = self.right
+        min_key = column.key + weight * column.size
+        column = column.right
+        while column is not self:
+            key = column.key + weight * column.size
+            if key < min_key:
+                best = column
+                min_key = key
+            column = column.right
+        return best
 
 
 if __name__ == '__main__':
@@ -0,0 +1,361 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+An implementation of Donald E. Knuth's 'Algorithm X' [1]_ for the generalized
+exact cover problem [2]_ using the 'Dancing Links' technique [3]_ ('DLX'),
+with all links stored in flat integer arrays instead of node objects.
+
+The arrays are plain Python lists of integers.  The `array` module would use
+a quarter of the memory, but every element access has to create a new integer
+object, which makes the search about twice as slow.
+
+.. [1] http://en.wikipedia.org/wiki/Knuth%27s_Algorithm_X
+.. [2] http://en.wikipedia.org/wiki/Exact_cover
+.. [3] http://en.wikipedia.org/wiki/Dancing_Links
+"""
+
+from puzzler import strategies
+
+
+class ExactCover(object):
+
+    """
+    Given a sparse matrix of 0s and 1s, find every set of rows containing
+    exactly one 1 in each primary column (and at most one 1 in each secondary
+    column).  See `load_matrix` for a description of the data structure.
+    Uses the Dancing Links approach to Knuth's Algorithm X, with the four-way
+    links kept in parallel integer arrays (nodes are array indices).
+    """
+
+    __slots__ = ('left', 'right', 'up', 'down', 'column', 'row', 'size',
+                 'names', 'row_nodes', 'strategy', 'key', 'weight',
+                 'solution', 'num_solutions', 'num_searches', 'max_searches')
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
+        """
+        Parameters:
+
+        * `matrix` & `secondary`: see `self.load_matrix`.
+
+        * `state`: a `puzzler.SessionState` object which stores the runtime
+          state of this puzzle (we're resuming a previously interrupted
+          puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: the name of a column selection strategy (see
+          `puzzler.strategies`), or None for the default.
+        """
+        self.left = self.right = self.up = self.down = None
+        """Node link arrays, set in `self.load_matrix()`."""
+
+        self.column = None
+        """Array mapping each node to its column header node."""
+
+        self.row = None
+        """Array mapping each node to its matrix row index (-1 for the root
+        and column header nodes)."""
+
+        self.size = None
+        """Array of active node counts, indexed by column header node."""
+
+        self.names = None
+        """List of column names, indexed by column header node."""
+
+        self.row_nodes = None
+        """Array mapping each matrix row index to its first datum node."""
+
+        self.strategy = strategy
+        """The column selection strategy name (None for the default)."""
+
+        self.key = None
+        """Array of static column selection keys, indexed by column header
+        node (see `puzzler.strategies`)."""
+
+        self.weight = None
+        """Column size weight for `self.choose_keyed_column`."""
+
+        self.solution = []
+        self.num_solutions = 0
+        self.num_searches = 0
+        self.max_searches = None
+        """If set, `self.solve` stops when `self.num_searches` reaches this
+        number (a limit on the total searches, including those of earlier
+        calls)."""
+
+        if state:
+            self.solution = state.solution
+            self.num_solutions = state.num_solutions
+            self.num_searches = state.num_searches
+        if matrix:
+            self.load_matrix(matrix, secondary)
+
+    def load_matrix(self, matrix, secondary=0):
+        """
+        Convert and store the input `matrix` as a four-way linked
+        representation of a sparse matrix, held in integer arrays.
+
+        The input `matrix` is a two-dimensional list of tuples:
+
+        * Each row is a tuple of equal length.
+
+        * The first row contains the column names: first the puzzle piece
+          names, then the solution space coordinates.  For example::
+
+              ('A', 'B', 'C', '0,0', '1,0', '0,1', '1,1')
+
+        * The subsequent rows consist of 1 & 0 (True & False) values.  Each
+          row contains a 1/True value in the column identifying the piece, and
+          1/True values in each column identifying the position.  There must
+          be one row for each possible position of each puzzle piece.
+
+        The `secondary` parameter is the number of secondary (rightmost)
+        columns: columns which may, but need not, participate in the solution.
+
+        The converted data structure has the same shape as that of
+        `puzzler.exact_cover_dlx`, but each node is an integer index into the
+        parallel arrays `self.left`, `self.right`, `self.up`, `self.down`,
+        `self.column` and `self.row`.  Node 0 is the root; nodes 1 through N
+        are the column headers, in matrix order; the datum nodes follow, row
+        by row.  The secondary columns are not linked into the list of column
+        headers.
+        """
+        names = matrix[0]
+        num_columns = len(names)
+        primary = num_columns - secondary
+        rows = [[j + 1 for j in range(num_columns) if row[j]]
+                for row in matrix[1:]]
+        # All arrays share these integer objects (saves memory):
+        node = range(num_columns + 2 + sum(len(row) for row in rows))
+        self.names = ['root'] + list(names)
+        self.left = left = [node[c - 1] for c in range(num_columns + 1)]
+        self.right = right = node[1:num_columns + 2]
+        left[0] = node[primary]
+        right[primary] = node[0]
+        for c in range(primary + 1, num_columns + 1):
+            left[c] = right[c] = node[c]
+        self.up = up = node[:num_columns + 1]
+        self.down = down = node[:num_columns + 1]
+        self.column = column = node[:num_columns + 1]
+        self.row = row_index = [-1] * (num_columns + 1)
+        self.size = size = [0] * (num_columns + 1)
+        self.row_nodes = row_nodes = []
+        for r, columns in enumerate(rows):
+            if not columns:
+                # an empty row has no nodes, and is never part of a solution:
+                row_nodes.append(None)
+                continue
+            first = len(left)
+            last = first + len(columns) - 1
+            row_nodes.append(node[first])
+            for n, c in enumerate(columns, first):
+                left.append(node[n - 1])
+                right.append(node[n + 1])
+                up.append(up[c])
+                down.append(node[c])
+                column.append(node[c])
+                row_index.append(r)
+                down[up[c]] = node[n]
+                up[c] = node[n]
+                size[c] += 1
+            left[first] = node[last]
+            right[last] = node[first]
+        if not strategies.is_native(self.strategy):
+            keys, self.weight = strategies.column_keys(
+                self.strategy, names, len(rows))
+            self.key = [None] + keys
+
+    def solve(self):
+        """
+        A generator that produces all solutions: Algorithm X.
+
+        The search is iterative.  `stack` holds one frame per search level:
+        the covered column and its current row node (the column itself before
+        the first row is tried).  A non-empty `self.solution` at the start is
+        a resume prefix: at each level, rows before the recorded row are
+        skipped (already explored).
+        """
+        left = self.left
+        right = self.right
+        down = self.down
+        column = self.column
+        row_index = self.row
+        cover = self.cover
+        uncover = self.uncover
+        if strategies.is_native(self.strategy):
+            choose_column = self.choose_column
+        else:
+            choose_column = self.choose_keyed_column
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        while True:
+            if right[0] == 0:
+                yield self.full_solution()
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                c = choose_column()
+                cover(c)
+                stack.append([c, c])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                c, r = frame
+                level = len(stack) - 1
+                if r != c:
+                    solution.pop()
+                    j = left[r]
+                    while j != r:
+                        uncover(column[j])
+                        j = left[j]
+                r = down[r]
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    while r != c and row_index[r] != solution[level]:
+                        r = down[r]
+                    if r == c:
+                        del solution[level:]
+                if r != c:
+                    if len(solution) == level:
+                        solution.append(row_index[r])
+                    j = right[r]
+                    while j != r:
+                        cover(column[j])
+                        j = right[j]
+                    frame[1] = r
+                    break
+                uncover(c)
+                stack.pop()
+            else:
+                return
+
+    def choose_column(self):
+        """
+        Return the leftmost active column with the fewest active rows.  The
+        scan stops early at an empty column (a dead end).
+        """
+        right = self.right
+        size = self.size
+        c = right[0]
+        best = c
+        min_size = size[c]
+        c = right[c]
+        while c and min_size:
+            if size[c] < min_size:
+                best = c
+                min_size = size[c]
+            c = right[c]
+        return best
+
+    def choose_keyed_column(self):
+        """
+        Return the active column with the lowest ``key + weight * size``, for
+        a column selection strategy (see `puzzler.strategies`).
+        """
+        right = self.right
+        size = self.size
+        key = self.key
+        weight = self.weight
+        c = right[0]
+        best = c
+        min_key = key[c] + weight * size[c]
+        c = right[c]
+        while c:
+            k = key[c] + weight * size[c]
+            if k < min_key:
+                best = c
+                min_key = k
+            c = right[c]
+        return best
+
+    def cover(self, c):
+        left = self.left
+        right = self.right
+        up = self.up
+        down = self.down
+        column = self.column
+        size = self.size
+        left[right[c]] = left[c]
+        right[left[c]] = right[c]
+        i = down[c]
+        while i != c:
+            j = right[i]
+            while j != i:
+                up[down[j]] = up[j]
+                down[up[j]] = down[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, c):
+        left = self.left
+        right = self.right
+        up = self.up
+        down = self.down
+        column = self.column
+        size = self.size
+        i = up[c]
+        while i != c:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                up[down[j]] = j
+                down[up[j]] = j
+                j = left[j]
+            i = up[i]
+        left[right[c]] = c
+        right[left[c]] = c
+
+    def row_names(self, r):
+        """Return a sorted list of the column names of matrix row `r`."""
+        right = self.right
+        column = self.column
+        names = self.names
+        first = self.row_nodes[r]
+        row = [names[column[first]]]
+        j = right[first]
+        while j != first:
+            row.append(names[column[j]])
+            j = right[j]
+        row.sort()
+        return row
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (row indices).
+        """
+        return [self.row_names(r) for r in self.solution]
+
+    def format_solution(self):
+        """Return a simple formatted string representation of the solution."""
+        self.num_solutions += 1
+        parts = ['solution %i:' % self.num_solutions]
+        for row in self.full_solution():
+            parts.append(
+                ' '.join(cell for cell in row
+                         # omit secondary columns (intersections):
+                         if not ((',' in cell) and (cell.endswith('i')))))
+        return '\n'.join(parts)
+
+
+if __name__ == '__main__':
+    print 'testing exact_cover_dlxa.py:\n'
+    matrix = [
+        'A  B  C  D  E  F  G'.split(),
+        [0, 0, 1, 0, 1, 1, 0],
+        [1, 0, 0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0, 1, 0],
+        [1, 0, 0, 1, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 1, 0, 1]]
+    puzzle = ExactCover(matrix)
+    for solution in puzzle.solve():
+        print puzzle.format_solution(), '\n'
+        print 'unformatted:\n', solution, '\n'
+    print puzzle.num_searches, 'searches'
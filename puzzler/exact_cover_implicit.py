@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+A puzzle board filler, as `puzzler.exact_cover_board`, which doesn't need
+the rows of the exact cover matrix: it holds the piece aspects and the board
+cells of the puzzle instead, and generates the placements anchored at a cell
+when the search first reaches it.  Recently used placement lists are kept in
+a small LRU cache.
+
+The full matrix of a large polycube puzzle (every translation of every
+aspect, as a dense row) takes much time and memory to build before the
+search can start; here, start-up is almost immediate.
+
+Puzzles whose matrix rows are not plain translations of the aspects (see
+`puzzler.puzzles.Puzzle.supports_implicit_matrix`) are solved from their
+matrix, as by `puzzler.exact_cover_board`.
+"""
+
+import collections
+
+from puzzler import exact_cover_board
+from puzzler import strategies
+
+
+class ExactCover(exact_cover_board.ExactCover):
+
+    """
+    Given a puzzle (see `load_puzzle`) or a sparse matrix of 0s and 1s (see
+    `load_matrix`), find every set of rows containing exactly one 1 in each
+    primary column (and at most one 1 in each secondary column).  Fills the
+    lowest empty board cell first, generating the placements anchored there
+    on demand (see `self.solve`).
+    """
+
+    decomposition = False
+    """Splitting the search into independent groups is not supported."""
+
+    pruning = False
+    """Pruning checks are not supported."""
+
+    implicit_matrix = True
+    """This engine can generate the matrix rows of a puzzle itself (see
+    `load_puzzle`)."""
+
+    placement_cache_size = 2 ** 10
+    """The maximum number of board cells whose placements are cached."""
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
+        """
+        Parameters: see `puzzler.exact_cover_bits.ExactCover.__init__`.
+        The `strategy` must be None or the default column selection
+        strategy: the board search has its own, built in.
+        """
+        if not strategies.is_native(strategy):
+            raise strategies.StrategyError(
+                'The "implicit" algorithm only supports the default column '
+                'selection strategy ("%s").' % strategies.default)
+
+        self.aspects = None
+        """A list of 2-tuples, one per piece aspect: the piece's column
+        bitset, and the aspect's coordinates relative to its lowest
+        coordinate (in sorted order).  None if the rows of a matrix are
+        loaded instead (see `load_matrix`)."""
+
+        self.coords = None
+        """A list of board cell coordinates (tuples), indexed by column
+        ID."""
+
+        self.cell_ids = None
+        """A dict mapping board cell coordinates (tuples) to column IDs."""
+
+        self.placement_cache = collections.OrderedDict()
+        """LRU cache mapping column IDs of board cells to their placements
+        (see `self.placements`)."""
+
+        exact_cover_board.ExactCover.__init__(
+            self, matrix, secondary, state, strategy)
+
+    def load_matrix(self, matrix, secondary=0, multiplicities=None):
+        """See `puzzler.exact_cover_board.ExactCover.load_matrix`."""
+        self.aspects = None
+        self.coords = None
+        self.cell_ids = None
+        self.placement_cache.clear()
+        exact_cover_board.ExactCover.load_matrix(
+            self, matrix, secondary, multiplicities)
+
+    def load_puzzle(self, puzzle):
+        """
+        Prepare to solve `puzzle`, a `puzzler.puzzles.Puzzle` instance.  If
+        only its matrix header was built (``puzzle.implicit_matrix``), the
+        rows are generated on demand from ``puzzle.pieces`` and
+        ``puzzle.solution_coords``; otherwise its matrix is loaded.
+
+        Column IDs are assigned in column name order, as in
+        `puzzler.exact_cover_bits`: the board cells first, then the pieces.
+        The search fills the cells in this order, so it must match the order
+        of their coordinates; if not, the matrix rows are built after all.
+        """
+        if not puzzle.implicit_matrix:
+            self.load_matrix(puzzle.matrix, puzzle.secondary_columns)
+            return
+        header = puzzle.matrix[0]
+        pieces = puzzle.matrix_header_pieces()
+        labels = dict(zip(puzzle.matrix_header_coords(), header[len(pieces):]))
+        coords = sorted(tuple(coord) for coord in labels)
+        if [labels[coord] for coord in coords] != sorted(labels.values()):
+            puzzle.build_matrix()
+            puzzle.implicit_matrix = False
+            self.load_matrix(puzzle.matrix, puzzle.secondary_columns)
+            return
+        self.names = [labels[coord] for coord in coords] + sorted(pieces)
+        self.coords = coords
+        self.cell_ids = dict((coord, c) for c, coord in enumerate(coords))
+        self.cells = (1 << len(coords)) - 1
+        self.primary = (1 << len(self.names)) - 1
+        piece_ids = dict((name, c) for c, name in enumerate(self.names))
+        self.aspects = []
+        for name in sorted(pieces):
+            for coord_list, aspect in puzzle.pieces[name]:
+                origin = coord_list[0]
+                self.aspects.append(
+                    (1 << piece_ids[name],
+                     tuple(tuple(a - o for a, o in zip(coord, origin))
+                           for coord in coord_list)))
+        self.placement_cache.clear()
+        self.anchors = None
+        self.rows = self.row_bits = self.column_bits = self.columns = None
+        self.conflicts = None
+        self.bounds = self.ranged = self.keys = None
+        self.dead_end = None
+
+    def placements(self, cell):
+        """
+        Return a list of the placements anchored at `cell` (a column ID):
+        the aspect translations whose lowest coordinate is the cell's, which
+        fit on the board.  Each placement is a 2-tuple, (row ID, column
+        bitset); row IDs are ``cell * len(self.aspects) + aspect index``.
+        The lists are generated in aspect order, so the search produces the
+        solutions in the order of `puzzler.exact_cover_board`.
+        """
+        cache = self.placement_cache
+        placements = cache.pop(cell, None)
+        if placements is None:
+            placements = []
+            cell_ids = self.cell_ids
+            origin = self.coords[cell]
+            base = cell * len(self.aspects)
+            for i, (piece_bit, offsets) in enumerate(self.aspects):
+                bits = piece_bit
+                for offset in offsets:
+                    c = cell_ids.get(
+                        tuple([o + a for o, a in zip(offset, origin)]))
+                    if c is None:
+                        break
+                    bits |= 1 << c
+                else:
+                    placements.append((base + i, bits))
+            if len(cache) >= self.placement_cache_size:
+                cache.popitem(last=False)
+        cache[cell] = placements
+        return placements
+
+    def solve(self):
+        """
+        A generator that produces all solutions.
+
+        The search is that of `puzzler.exact_cover_board.ExactCover.solve`,
+        with the placements of each cell from `self.placements`.  A
+        non-empty `self.solution` at the start is a resume prefix.
+
+        Without aspects (a matrix was loaded), the search is that of
+        `puzzler.exact_cover_board`.
+        """
+        if self.aspects is None:
+            for solution in exact_cover_board.ExactCover.solve(self):
+                yield solution
+            return
+        cells = self.cells
+        primary = self.primary
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        filled = 0
+        while True:
+            empty = cells & ~filled
+            if not empty:
+                if not primary & ~filled:
+                    yield self.full_solution()
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                placements = self.placements(
+                    (empty & -empty).bit_length() - 1)
+                i = 0
+                level = len(stack)
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    i = len(placements)
+                    for j, (r, bits) in enumerate(placements):
+                        if r == solution[level]:
+                            i = j
+                            break
+                    else:
+                        del solution[level:]
+                stack.append([filled, placements, i, None])
+            # backtrack to the next untried placement, and fill it:
+            while stack:
+                frame = stack[-1]
+                filled, placements, i, r = frame
+                level = len(stack) - 1
+                if r is not None:
+                    solution.pop()
+                num_placements = len(placements)
+                while i < num_placements and placements[i][1] & filled:
+                    i += 1
+                if i < num_placements:
+                    frame[2] = i + 1
+                    r, bits = placements[i]
+                    frame[3] = r
+                    if len(solution) == level:
+                        solution.append(r)
+                    filled |= bits
+                    break
+                stack.pop()
+            else:
+                return
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (row indices).
+        """
+        if self.aspects is None:
+            return exact_cover_board.ExactCover.full_solution(self)
+        names = self.names
+        num_aspects = len(self.aspects)
+        solution = []
+        for r in self.solution:
+            cell = r // num_aspects
+            for row, bits in self.placements(cell):
+                if row == r:
+                    break
+            else:
+                raise ValueError('invalid row ID: %s' % r)
+            row_names = []
+            while bits:
+                low_bit = bits & -bits
+                bits ^= low_bit
+                row_names.append(names[low_bit.bit_length() - 1])
+            solution.append(row_names)
+        return solution
+
+
+if __name__ == '__main__':
+    print 'testing exact_cover_implicit.py:\n'
+    from puzzler.puzzles.pentominoes import Pentominoes3x20
+    puzzle = Pentominoes3x20(init_puzzle=False)
+    puzzle.init_puzzle(implicit=True)
+    solver = ExactCover()
+    solver.load_puzzle(puzzle)
+    for solution in solver.solve():
+        print solver.format_solution(), '\n'
+        print puzzle.format_solution(solution, normalized=False), '\n'
+    print solver.num_searches, 'searches'
@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+An implementation of Donald E. Knuth's 'Algorithm X' [1]_ for the generalized
+exact cover problem [2]_ using NumPy [3]_ boolean arrays.
+
+Column sizes are maintained with vectorized reductions, and covering a row
+eliminates every conflicting row at once with boolean masks.  This pays off
+for wide matrices, such as those of the polytrig & polytwig puzzles, with
+their many secondary (intersection) columns.  Requires NumPy.
+
+.. [1] http://en.wikipedia.org/wiki/Knuth%27s_Algorithm_X
+.. [2] http://en.wikipedia.org/wiki/Exact_cover
+.. [3] http://www.numpy.org/
+"""
+
+from pprint import pprint
+
+import numpy
+
+from puzzler import strategies
+
+
+class ExactCover(object):
+
+    """
+    Given a sparse matrix of 0s and 1s, find every set of rows containing
+    exactly one 1 in each primary column (and at most one 1 in each secondary
+    column).  See `load_matrix` for a description of the data structure.
+    Uses NumPy boolean arrays to implement Knuth's Algorithm X.
+    """
+
+    subtrees = True
+    """This engine's search can be split into the subtrees of
+    `puzzler.exact_cover_bits.ExactCover.subtree_prefixes` (it searches in
+    the same order)."""
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
+        """
+        Parameters:
+
+        * `matrix` & `secondary`: see `self.load_matrix`.
+
+        * `state`: a `puzzler.SessionState` object which stores the runtime
+          state of this puzzle (we're resuming a previously interrupted
+          puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: the name of a column selection strategy (see
+          `puzzler.strategies`), or None for the default.
+        """
+        self.matrix = None
+        """A two-dimensional boolean array, indexed by row and column ID."""
+
+        self.columns = None
+        """The transpose of `self.matrix` (indexed by column ID and row),
+        stored contiguously for fast column access."""
+
+        self.rows = None
+        """A list of integer arrays of column IDs, one per row: all the
+        columns containing a 1/True."""
+
+        self.primary = None
+        """A boolean array, indexed by column ID: True for primary columns."""
+
+        self.names = None
+        """A list of column names, indexed by column ID."""
+
+        self.strategy = strategy
+        """The column selection strategy name (None for the default)."""
+
+        self.keys = None
+        """An integer array of static column selection keys, indexed by
+        column ID (see `puzzler.strategies`); None for the default."""
+
+        self.weight = None
+        """Column size weight for the column selection keys."""
+
+        self.solution = []
+        self.num_solutions = 0
+        self.num_searches = 0
+        self.max_searches = None
+        """If set, `self.solve` stops when `self.num_searches` reaches this
+        number (a limit on the total searches, including those of earlier
+        calls)."""
+
+        if state:
+            self.solution = state.solution
+            self.num_solutions = state.num_solutions
+            self.num_searches = state.num_searches
+        if matrix:
+            self.load_matrix(matrix, secondary)
+
+    def load_matrix(self, matrix, secondary=0):
+        """
+        Convert and store the input `matrix` into `self.matrix`,
+        `self.columns`, `self.rows`, and `self.primary`.
+
+        The input `matrix` is a two-dimensional list of tuples:
+
+        * Each row is a tuple of equal length.
+
+        * The first row contains the column names: first the puzzle piece
+          names, then the solution space coordinates.  For example::
+
+              ('A', 'B', 'C', '0,0', '1,0', '0,1', '1,1')
+
+        * The subsequent rows consist of 1 & 0 (True & False) values.  Each
+          row contains a 1/True value in the column identifying the piece, and
+          1/True values in each column identifying the position.  There must
+          be one row for each possible position of each puzzle piece.
+
+        The `secondary` parameter is the number of secondary (rightmost)
+        columns: columns which may, but need not, participate in the solution.
+
+        Columns are identified by integer IDs, assigned in column name order
+        (as in `puzzler.exact_cover_x2`, so both engines choose the same
+        columns and produce solutions in the same order).
+        """
+        column_names = matrix[0]
+        num_columns = len(column_names)
+        order = sorted(range(num_columns), key=column_names.__getitem__)
+        self.names = [column_names[j] for j in order]
+        self.matrix = numpy.array(
+            [[bool(row[j]) for j in order] for row in matrix[1:]],
+            dtype=bool).reshape(len(matrix) - 1, num_columns)
+        self.columns = numpy.ascontiguousarray(self.matrix.T)
+        self.rows = [numpy.flatnonzero(row) for row in self.matrix]
+        self.primary = numpy.array(
+            [j < num_columns - secondary for j in order], dtype=bool)
+        if not strategies.is_native(self.strategy):
+            keys, self.weight = strategies.column_keys(
+                self.strategy, self.names, len(self.rows))
+            self.keys = numpy.array(keys)
+
+    def solve(self):
+        """
+        A generator that produces all solutions: Algorithm X.
+
+        The search state consists of three arrays: the active rows (rows
+        which don't conflict with any row in the partial solution), the
+        uncovered primary columns, and the column sizes (active rows per
+        column).  Covering a row computes all three anew for the next level;
+        uncovering just restores the previous arrays.  `stack` holds one
+        frame per search level: the arrays, the candidate rows (a list), the
+        index of the next candidate, and the current row.  A non-empty
+        `self.solution` at the start is a resume prefix.
+        """
+        matrix = self.matrix
+        columns = self.columns
+        rows = self.rows
+        keys = self.keys
+        weight = self.weight
+        solution = self.solution
+        max_searches = self.max_searches
+        if keys is None:
+            not_available = len(rows) + 1
+        else:
+            not_available = keys.max() + weight * len(rows) + 1
+        stack = []
+        active = numpy.ones(len(rows), dtype=bool)
+        uncovered = self.primary.copy()
+        sizes = matrix.sum(axis=0)
+        while True:
+            if not uncovered.any():
+                yield self.full_solution()
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                # the uncovered column with the fewest active rows (lowest
+                # column ID on ties), or with the lowest strategy key:
+                if keys is None:
+                    values = sizes
+                else:
+                    values = keys + weight * sizes
+                c = numpy.where(uncovered, values, not_available).argmin()
+                candidates = numpy.flatnonzero(columns[c] & active).tolist()
+                start = 0
+                level = len(stack)
+                if len(solution) > level:
+                    # skip rows already fully explored
+                    try:
+                        start = candidates.index(solution[level])
+                    except ValueError:
+                        start = len(candidates)
+                        del solution[level:]
+                stack.append(
+                    [active, uncovered, sizes, candidates, start, None])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                active, uncovered, sizes, candidates, i, r = frame
+                level = len(stack) - 1
+                if r is not None:
+                    solution.pop()
+                if i < len(candidates):
+                    frame[4] = i + 1
+                    frame[5] = r = candidates[i]
+                    if len(solution) == level:
+                        solution.append(r)
+                    row_columns = rows[r]
+                    removed = columns[row_columns].any(axis=0) & active
+                    active = active & ~removed
+                    sizes = sizes - matrix[removed].sum(axis=0)
+                    uncovered = uncovered.copy()
+                    uncovered[row_columns] = False
+                    break
+                stack.pop()
+            else:
+                return
+
+    def full_solution(self):
+        """
+        Return an expanded representation (full row details) of a solution,
+        based on the internal minimal representation (row indices).
+        """
+        names = self.names
+        return [[names[c] for c in self.rows[r]] for r in self.solution]
+
+    def format_solution(self):
+        """Return a simple formatted string representation of the solution."""
+        self.num_solutions += 1
+        solution = self.full_solution()
+        parts = ['solution %i:' % self.num_solutions]
+        for row in solution:
+            parts.append(
+                ' '.join(cell for cell in row
+                         # omit secondary columns (intersections):
+                         if not ((',' in cell) and (cell.endswith('i')))))
+        return '\n'.join(parts)
+
+
+if __name__ == '__main__':
+    print 'testing exact_cover_numpy.py:\n'
+    matrix = [
+        'A  B  C  D  E  F  G'.split(),
+        [0, 0, 1, 0, 1, 1, 0],
+        [1, 0, 0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0, 1, 0],
+        [1, 0, 0, 1, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 1, 0, 1]]
+    puzzle = ExactCover(matrix)
+    print 'matrix ='
+    pprint(puzzle.matrix.astype(int).tolist())
+    for solution in puzzle.solve():
+        print '\n', puzzle.format_solution(), '\n'
+        print 'unformatted:\n', solution, '\n'
+    print puzzle.num_searches, 'searches'
@@ -25,6 +25,8 @@ try:
 except ImportError:
     pass
 
+from puzzler import strategies
+
 
 class ExactCover(object):
 
@@ -35,7 +37,12 @@ class ExactCover(object):
     Uses the native approach to Knuth's Algorithm X.
     """
 
-    def __init__(self, matrix=None, secondary=0, state=None):
+    subtrees = True
+    """This engine's search can be split into the subtrees of
+    `puzzler.exact_cover_bits.ExactCover.subtree_prefixes` (it searches in
+    the same order)."""
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
         """
         Parameters:
 
@@ -44,21 +51,46 @@ class ExactCover(object):
         * `state`: a `puzzler.SessionState` object which stores the runtime
           state of this puzzle (we're resuming a previously interrupted
           puzzle), or None (no state, we're starting from the beginning).
+
+        * `strategy`: the name of a column selection strategy (see
+          `puzzler.strategies`), or None for the default.
         """
         self.columns = None
-        """A dictionary mapping column names to sets of row indices (the index
+        """A dictionary mapping column IDs to sets of row indices (the index
         of each row which contains a 1/True for that column)."""
 
         self.secondary_columns = None
-        """A set of secondary column names."""
+        """A set of secondary column IDs."""
+
+        self.primary_columns = None
+        """A dictionary mapping the uncovered primary column IDs to their row
+        index sets (the same set objects as in `self.columns`).  The search is
+        complete when this is empty."""
 
         self.rows = None
-        """A list of lists of column names.  Each list represents one row of
+        """A list of lists of column IDs.  Each list represents one row of
         the exact cover matrix: all the columns containing a 1/True."""
 
+        self.names = None
+        """A list of column names, indexed by column ID."""
+
+        self.strategy = strategy
+        """The column selection strategy name (None for the default)."""
+
+        self.keys = None
+        """A list of static column selection keys, indexed by column ID
+        (see `puzzler.strategies`); None for the default strategy."""
+
+        self.weight = None
+        """Column size weight for the column selection keys."""
+
         self.solution = []
         self.num_solutions = 0
         self.num_searches = 0
+        self.max_searches = None
+        """If set, `self.solve` stops when `self.num_searches` reaches this
+        number (a limit on the total searches, including those of earlier
+        calls)."""
 
         if state:
             self.solution = state.solution
@@ -70,7 +102,7 @@ class ExactCover(object):
     def load_matrix(self, matrix, secondary=0):
         """
         Convert and store the input `matrix` into `self.columns`,
-        `self.secondary_columns`, and `self.rows`.
+        `self.secondary_columns`, `self.primary_columns`, and `self.rows`.
 
         The input `matrix` is a two-dimensional list of tuples:
 
@@ -88,45 +120,107 @@ class ExactCover(object):
 
         The `secondary` parameter is the number of secondary (rightmost)
         columns: columns which may, but need not, participate in the solution.
+
+        Columns are identified by integer IDs, assigned in column name order:
+        comparing IDs gives the same result as comparing names (which keeps
+        the choice of column reproducible), but is cheaper.  Column names are
+        only used to format solutions.
         """
         matrix_iter = iter(matrix)
         column_names = matrix_iter.next()
+        num_columns = len(column_names)
+        order = sorted(range(num_columns), key=column_names.__getitem__)
+        column_ids = [None] * num_columns
+        for c, j in enumerate(order):
+            column_ids[j] = c
+        self.names = [column_names[j] for j in order]
         self.secondary_columns = set(
-            column_names[(len(column_names) - secondary):])
-        self.columns = dict((j, set()) for j in column_names)
+            column_ids[(num_columns - secondary):])
+        self.columns = dict((c, set()) for c in range(num_columns))
         self.rows = [
-            [column_names[j] for j in range(len(column_names)) if row[j]]
+            [column_ids[j] for j in range(num_columns) if row[j]]
             for row in matrix_iter]
         for (r, row) in enumerate(self.rows):
             for c in row:
                 self.columns[c].add(r)
+        self.primary_columns = dict(
+            (c, rows) for (c, rows) in self.columns.items()
+            if c not in self.secondary_columns)
+        if not strategies.is_native(self.strategy):
+            self.keys, self.weight = strategies.column_keys(
+                self.strategy, self.names, len(self.rows))
+
+    def solve(self):
+        """
+        A generator that produces all solutions: Algorithm X.
 
-    def solve(self, level=0):
-        """A generator that produces all solutions: Algorithm X."""
-        if not (set(self.columns) - self.secondary_columns):
-            yield self.full_solution()
-            return
-        self.num_searches += 1
-        _size, c = min((len(self.columns[column]), column)
-                       for column in self.columns
-                       if column not in self.secondary_columns)
-        # Since `self.columns` is being modified, a copy must be made here.
-        # `sorted()` is used instead of `list()` to get reproducible output.
-        for r in sorted(self.columns[c]):
-            if len(self.solution) > level:
-                if self.solution[level] != r:
+        The search is iterative.  `stack` holds one frame per search level:
+        the level's candidate rows, the position of the next candidate to
+        try, and the columns covered by the current candidate (or None).
+        A non-empty `self.solution` at the start is a resume prefix: at each
+        level, rows before the recorded row are skipped (already explored).
+        """
+        columns = self.columns
+        primary_columns = self.primary_columns
+        keys = self.keys
+        weight = self.weight
+        solution = self.solution
+        max_searches = self.max_searches
+        stack = []
+        while True:
+            if not primary_columns:
+                yield self.full_solution()
+            else:
+                self.num_searches += 1
+                if self.num_searches == max_searches:
+                    return
+                if keys is None:
+                    _size, c = min(
+                        (len(rows), column)
+                        for (column, rows) in primary_columns.iteritems())
+                else:
+                    _key, c = min(
+                        (keys[column] + weight * len(rows), column)
+                        for (column, rows) in primary_columns.iteritems())
+                # Since `self.columns` is being modified, a copy must be made
+                # here.  `sorted()` is used instead of `list()` to get
+                # reproducible output: set iteration order depends on the
+                # history of additions & removals, so it would differ after a
+                # resume.  The chosen column is the smallest, so this is
+                # cheap (cheaper than filtering a presorted list of rows).
+                candidates = sorted(columns[c])
+                start = 0
+                level = len(stack)
+                if len(solution) > level:
                     # skip rows already fully explored
-                    continue
+                    if solution[level] in columns[c]:
+                        start = candidates.index(solution[level])
+                    else:
+                        start = len(candidates)
+                        del solution[level:]
+                stack.append([candidates, start, None])
+            # backtrack to the next untried row, and cover it:
+            while stack:
+                frame = stack[-1]
+                candidates, i, covered = frame
+                level = len(stack) - 1
+                if covered is not None:
+                    self.uncover(candidates[i - 1], covered)
+                    solution.pop()
+                if i < len(candidates):
+                    r = candidates[i]
+                    if len(solution) == level:
+                        solution.append(r)
+                    frame[1] = i + 1
+                    frame[2] = self.cover(r)
+                    break
+                stack.pop()
             else:
-                self.solution.append(r)
-            covered = self.cover(r)
-            for s in self.solve(level+1):
-                yield s
-            self.uncover(r, covered)
-            self.solution.pop()
+                return
 
     def cover(self, r):
         columns = self.columns
+        primary_columns = self.primary_columns
         rows = self.rows
         covered = []
         for j in rows[r]:
@@ -134,14 +228,19 @@ class ExactCover(object):
                 for k in rows[i]:
                     if k != j:
                         columns[k].remove(i)
-            covered.append(self.columns.pop(j))
+            covered.append(columns.pop(j))
+            primary_columns.pop(j, None)
         return covered
 
     def uncover(self, r, covered):
         columns = self.columns
+        primary_columns = self.primary_columns
+        secondary_columns = self.secondary_columns
         rows = self.rows
         for j in reversed(rows[r]):
             columns[j] = covered.pop()
+            if j not in secondary_columns:
+                primary_columns[j] = columns[j]
             for i in columns[j]:
                 for k in rows[i]:
                     if k != j:
@@ -152,7 +251,9 @@ class ExactCover(object):
         Return an expanded representation (full row details) of a solution,
         based on the internal minimal representation (row indices).
         """
-        return [sorted(self.rows[r]) for r in self.solution]
+        names = self.names
+        return [[names[c] for c in sorted(self.rows[r])]
+                for r in self.solution]
 
     def format_solution(self):
         """Return a simple formatted string representation of the solution."""
@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+An implementation of Donald E. Knuth's 'Algorithm X' [1]_ for the generalized
+exact cover problem [2]_ which builds a zero-suppressed decision diagram
+(ZDD) [3]_ of all the solutions, memoizing the search as in Nishino et al.'s
+'DXZ' [4]_.
+
+The search is that of `puzzler.exact_cover_bits`, whose state is a pair of
+bitsets: the active rows and the uncovered primary columns.  This pair
+determines the rest of the search completely, so each distinct state is
+searched once; when a state recurs (the same board area covered by other
+pieces or placements), its sub-diagram is shared.  Dead ends are memoized
+too.  The diagram can be far smaller than the list of solutions, and
+counting, enumerating, or sampling the solutions from it is cheap.
+
+.. [1] http://en.wikipedia.org/wiki/Knuth%27s_Algorithm_X
+.. [2] http://en.wikipedia.org/wiki/Exact_cover
+.. [3] http://en.wikipedia.org/wiki/Zero-suppressed_decision_diagram
+.. [4] Masaaki Nishino, Norihito Yasuda, Shin-ichi Minato, and Masaaki
+   Nagata, "Dancing with Decision Diagrams: A Combined Approach to Exact
+   Cover", AAAI 2017.
+"""
+
+import random
+import cPickle as pickle
+
+from puzzler import exact_cover_bits
+
+
+class ExactCover(exact_cover_bits.ExactCover):
+
+    """
+    Given a sparse matrix of 0s and 1s, find every set of rows containing
+    exactly one 1 in each primary column (and at most one 1 in each secondary
+    column).  See `load_matrix` for a description of the data structure.
+    Builds a ZDD of all the solutions (`self.zdd`) with a memoized version of
+    `puzzler.exact_cover_bits`' Algorithm X, extended with colored secondary
+    columns (Knuth's Algorithm C).
+    """
+
+    multiplicities = False
+    """Column multiplicities are not supported."""
+
+    decomposition = False
+    """Splitting the search into independent groups is not supported."""
+
+    pruning = False
+    """Pruning checks are not supported."""
+
+    subtrees = False
+    """The search can't be split into the subtrees of `subtree_prefixes`:
+    its memo is shared by the whole search tree."""
+
+    def __init__(self, matrix=None, secondary=0, state=None, strategy=None):
+        """
+        Parameters: see `puzzler.exact_cover_bits.ExactCover.__init__`.
+        """
+        self.zdd = None
+        """The `ZDD` of all solutions, once `self.build_zdd` has completed;
+        otherwise None."""
+
+        exact_cover_bits.ExactCover.__init__(
+            self, matrix, secondary, state, strategy)
+
+    def load_matrix(self, matrix, secondary=0, multiplicities=None):
+        """
+        See `puzzler.exact_cover_bits.ExactCover.load_matrix`.  Column
+        multiplicities are not supported.
+        """
+        if multiplicities:
+            raise ValueError(
+                'The "zdd" algorithm does not support column multiplicities.')
+        exact_cover_bits.ExactCover.load_matrix(self, matrix, secondary)
+        self.zdd = None
+
+    def build_zdd(self):
+        """
+        Search for all solutions, building `self.zdd`.  Return True when
+        done, or False if `self.max_searches` was reached first (in which
+        case `self.zdd` is left as None).
+
+        The search is iterative, like `self.solve` in
+        `puzzler.exact_cover_bits`.  `memo` maps each search state (the
+        active rows & the uncovered columns) already searched to its ZDD
+        node.  Each frame of `stack` holds the state, the untried candidate
+        rows (a row bitset), the current row, and the (row, node) pairs of
+        the rows leading to solutions so far.  When a frame is done, these
+        are chained into the state's node: the node of the first row
+        (lowest index), whose LO branch is the node of the next row, and so
+        on, in the order `self.solve` produces the solutions.
+        """
+        conflicts = self.conflicts
+        row_bits = self.row_bits
+        if self.keys is None:
+            choose_rows = self.choose_rows
+        else:
+            choose_rows = self.choose_keyed_rows
+        max_searches = self.max_searches
+        zdd = ZDD(self.names, self.rows)
+        node = zdd.node
+        memo = {}
+        stack = []
+        active = (1 << len(self.rows)) - 1
+        uncovered = self.primary
+        while True:
+            if not uncovered:
+                result = ZDD.top
+            else:
+                result = memo.get((active, uncovered))
+                if result is None:
+                    self.num_searches += 1
+                    if self.num_searches == max_searches:
+                        return False
+                    stack.append([active, uncovered,
+                                  choose_rows(active, uncovered), None, []])
+            # return to the next untried row, finishing frames on the way:
+            while stack:
+                frame = stack[-1]
+                active, uncovered, candidates, r, branches = frame
+                if r is not None and result:
+                    branches.append((r, result))
+                if candidates:
+                    low_bit = candidates & -candidates
+                    frame[2] = candidates ^ low_bit
+                    frame[3] = r = low_bit.bit_length() - 1
+                    for row_conflicts in conflicts[r]:
+                        active &= ~row_conflicts
+                    uncovered &= ~row_bits[r]
+                    break
+                result = ZDD.bottom
+                for r, branch in reversed(branches):
+                    result = node(r, result, branch)
+                memo[active, uncovered] = result
+                stack.pop()
+            else:
+                zdd.root = result
+                self.zdd = zdd
+                return True
+
+    def solve(self):
+        """
+        A generator that produces all solutions, from `self.zdd` (built
+        first, if necessary), in the same order as
+        `puzzler.exact_cover_bits`.  Nothing is produced if
+        `self.max_searches` is reached while building.
+
+        A non-empty `self.solution` at the start is a resume prefix:
+        solutions before it are skipped.
+        """
+        if self.zdd is None and not self.build_zdd():
+            return
+        solution = self.solution
+        prefix = list(solution)
+        for rows in self.zdd.paths():
+            if rows < prefix:
+                continue
+            solution[:] = rows
+            yield self.full_solution()
+        del solution[:]
+
+
+class ZDD(object):
+
+    """
+    A zero-suppressed decision diagram representing a family of exact cover
+    solutions (sets of matrix rows).
+
+    Nodes are integers.  Node 0 (`self.bottom`) represents the empty family
+    (no solution), and node 1 (`self.top`) the family containing only the
+    empty set.  Every other node `n` has a row label (``self.label[n]``)
+    and two branches: LO (``self.lo[n]``), the solutions without that row,
+    and HI (``self.hi[n]``), the remaining rows of the solutions with it.
+    The branches of a node are always created before the node itself, so
+    children have lower numbers than their parents.
+
+    As in DXZ, the labels along a path follow the search (the column chosen
+    at each level), not a single global row order: the diagram supports
+    counting, enumeration, & sampling, but not the set operations of
+    ordered ZDDs.
+
+    The diagram keeps the column names & row column lists of its exact
+    cover matrix (see `puzzler.exact_cover_bits.ExactCover`), to expand
+    solutions into their full row details, so it can be saved (see
+    `write_diagrams`) & used without the puzzle's matrix.
+    """
+
+    bottom = 0
+    top = 1
+
+    def __init__(self, names, rows, name=None):
+        self.names = names
+        """A list of column names, indexed by column ID."""
+
+        self.rows = rows
+        """A list of lists of column IDs, one per matrix row."""
+
+        self.name = name
+        """An optional name (e.g. of the puzzle component)."""
+
+        self.label = [None, None]
+        self.lo = [None, None]
+        self.hi = [None, None]
+
+        self.root = self.bottom
+        """The node representing the whole family of solutions."""
+
+        self.unique = {}
+        """Maps (label, lo, hi) triples to existing nodes, so that identical
+        sub-diagrams are shared."""
+
+        self.counts = None
+        """A list of the number of solutions below each node (computed on
+        demand by `self.count`)."""
+
+    def __getstate__(self):
+        # copy the dict since we change it:
+        odict = self.__dict__.copy()
+        # remove derived data, rebuilt on demand:
+        odict['unique'] = None
+        odict['counts'] = None
+        return odict
+
+    def __setstate__(self, odict):
+        self.__dict__.update(odict)
+        self.unique = dict(
+            ((self.label[n], self.lo[n], self.hi[n]), n)
+            for n in range(2, len(self.label)))
+
+    def __len__(self):
+        """Return the number of nodes, including the two terminal nodes."""
+        return len(self.label)
+
+    def node(self, label, lo, hi):
+        """
+        Return the node with row `label` and branches `lo` & `hi`, creating
+        it if necessary.  A node whose HI branch is `self.bottom` is
+        suppressed (its LO branch is returned).
+        """
+        if hi == self.bottom:
+            return lo
+        key = (label, lo, hi)
+        n = self.unique.get(key)
+        if n is None:
+            n = self.unique[key] = len(self.label)
+            self.label.append(label)
+            self.lo.append(lo)
+            self.hi.append(hi)
+            self.counts = None
+        return n
+
+    def count(self, node=None):
+        """
+        Return the number of solutions represented by `node` (default: the
+        root).
+        """
+        if self.counts is None:
+            lo = self.lo
+            hi = self.hi
+            self.counts = counts = [0, 1]
+            for n in xrange(2, len(self.label)):
+                counts.append(counts[lo[n]] + counts[hi[n]])
+        if node is None:
+            node = self.root
+        return self.counts[node]
+
+    def paths(self):
+        """
+        A generator that produces the solutions as lists of row indices, in
+        search order (HI branches first).
+        """
+        label = self.label
+        lo = self.lo
+        hi = self.hi
+        path = []
+        stack = [(self.root, 0)]
+        while stack:
+            n, depth = stack.pop()
+            del path[depth:]
+            while n > self.top:
+                if lo[n] != self.bottom:
+                    stack.append((lo[n], depth))
+                path.append(label[n])
+                depth += 1
+                n = hi[n]
+            if n == self.top:
+                yield list(path)
+
+    def path(self, index):
+        """
+        Return solution number `index` (counting from 0, in the order of
+        `self.paths`) as a list of row indices.
+        """
+        if not 0 <= index < self.count():
+            raise IndexError('solution index out of range: %s' % index)
+        counts = self.counts
+        label = self.label
+        lo = self.lo
+        hi = self.hi
+        path = []
+        n = self.root
+        while n > self.top:
+            if index < counts[hi[n]]:
+                path.append(label[n])
+                n = hi[n]
+            else:
+                index -= counts[hi[n]]
+                n = lo[n]
+        return path
+
+    def expand(self, path):
+        """
+        Return the full row details of a solution (lists of column names, as
+        produced by the exact cover engines), given its row indices.
+        """
+        names = self.names
+        return [[names[c] for c in sorted(self.rows[r])] for r in path]
+
+    def solutions(self):
+        """A generator that produces all solutions, with full row details."""
+        for path in self.paths():
+            yield self.expand(path)
+
+    def solution(self, index):
+        """Return solution number `index` (from 0), with full row details."""
+        return self.expand(self.path(index))
+
+    def sample(self, rng=random):
+        """
+        Return a solution chosen uniformly at random (with full row details),
+        using `rng` (a `random.Random` instance, or the `random` module).
+        """
+        return self.solution(rng.randrange(self.count()))
+
+
+def write_diagrams(path, diagrams):
+    """Save a list of `ZDD` objects to file `path`."""
+    zdd_file = open(path, 'wb')
+    pickle.dump(diagrams, zdd_file, 2)
+    zdd_file.close()
+
+def read_diagrams(path):
+    """Return the list of `ZDD` objects saved in file `path`."""
+    zdd_file = open(path, 'rb')
+    diagrams = pickle.load(zdd_file)
+    zdd_file.close()
+    return diagrams
+
+
+if __name__ == '__main__':
+    print 'testing exact_cover_zdd.py:\n'
+    matrix = [
+        'A  B  C  D  E  F  G'.split(),
+        [0, 0, 1, 0, 1, 1, 0],
+        [1, 0, 0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0, 1, 0],
+        [1, 0, 0, 1, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 1, 0, 1]]
+    puzzle = ExactCover(matrix)
+    for solution in puzzle.solve():
+        print puzzle.format_solution(), '\n'
+        print 'unformatted:\n', solution, '\n'
+    print puzzle.num_searches, 'searches,', len(puzzle.zdd), 'ZDD nodes'
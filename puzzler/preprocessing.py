@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+Exact cover matrix preprocessing: removal of rows which can't be part of
+any solution, in the manner of Knuth's DLX-PRE [1]_.
+
+A row is useless if it conflicts with every row of some primary column
+(other than its own columns): once the row is chosen, that column can't be
+covered.  For example, a polyomino placement which cuts off a corner cell
+too small for any piece conflicts with every placement covering that cell.
+Removing rows can make other rows useless, so the pass is repeated until
+nothing changes.  The solutions are unaffected, and every engine can use the
+reduced matrix; searches are cheaper, as dead ends are cut off early.
+
+.. [1] Donald E. Knuth, "DLX-PRE",
+   http://www-cs-faculty.stanford.edu/~knuth/programs/dlx-pre.w
+"""
+
+from puzzler.exact_cover_bits import bitset
+
+
+def reduce_matrix(matrix, secondary=0, multiplicities=None):
+    """
+    Return a 2-tuple: a copy of `matrix` without the rows which can't be
+    part of any solution, and the number of rows removed.
+
+    Parameters: see `puzzler.exact_cover_bits.ExactCover.load_matrix`.
+    Columns are all kept, in the same order.  Conservatively, only
+    uncolored columns with a maximum multiplicity of 1 are counted as
+    conflicts, and only primary columns with a minimum multiplicity of at
+    least 1 must be covered.  A primary column without rows makes the
+    matrix unsolvable; it is left to the exact cover engine.
+    """
+    if multiplicities is None:
+        multiplicities = {}
+    header = matrix[0]
+    rows = matrix[1:]
+    num_columns = len(header)
+    num_primary = num_columns - secondary
+    required = []
+    exclusive = []
+    for j, name in enumerate(header):
+        minimum, maximum = multiplicities.get(name, (1, 1))
+        if j < num_primary:
+            if minimum >= 1:
+                required.append(j)
+        elif [row for row in rows if isinstance(row[j], tuple)]:
+            # colored column; rows of the same color don't conflict
+            continue
+        if maximum == 1:
+            exclusive.append(j)
+    row_columns = [[j for j in range(num_columns) if row[j]] for row in rows]
+    row_conflict_columns = [[j for j in exclusive if row[j]] for row in rows]
+    active = (1 << len(rows)) - 1
+    num_removed = 0
+    while True:
+        column_rows = [[] for j in range(num_columns)]
+        for r, columns in enumerate(row_columns):
+            if (active >> r) & 1:
+                for j in columns:
+                    column_rows[j].append(r)
+        columns = [bitset(column) for column in column_rows]
+        conflicts = {}
+        useless = 0
+        for j in required:
+            if not column_rows[j]:
+                continue
+            # the rows conflicting with every row of column j:
+            blocked = active & ~columns[j]
+            for r in column_rows[j]:
+                if not blocked:
+                    break
+                row_conflicts = conflicts.get(r)
+                if row_conflicts is None:
+                    row_conflicts = 0
+                    for k in row_conflict_columns[r]:
+                        row_conflicts |= columns[k]
+                    conflicts[r] = row_conflicts
+                blocked &= row_conflicts
+            useless |= blocked
+        if not useless:
+            break
+        active &= ~useless
+        num_removed += bin(useless).count('1')
+    reduced = [header]
+    reduced.extend(row for r, row in enumerate(rows) if (active >> r) & 1)
+    return reduced, num_removed
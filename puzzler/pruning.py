@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+Pruning checks for the exact cover engines.
+
+A puzzle may supply a pruning check (see
+`puzzler.puzzles.Puzzle.pruning_check`): a cheap test, run by the engine
+after each row is covered, of whether the remaining problem can still have
+a solution.  A state failing the test is a dead end, and is not searched.
+The checks never cut off a solution, so the solutions found are the same,
+in the same order; only the number of searches changes.
+
+A check object has a `bind` method, called by the engine once per matrix
+with the engine's column names, rows, and primary columns; it returns a
+function of the uncovered primary columns (a column bitset, as in
+`puzzler.exact_cover_bits`) which returns True for a dead end, or None if
+the check doesn't apply to the matrix.
+"""
+
+import re
+
+
+class IslandCheck(object):
+
+    """
+    Dead-region pruning for polyform puzzles: the uncovered board cells are
+    split into islands (connected regions), and each island must be exactly
+    tileable by some of the remaining pieces.
+
+    * Area: the island's number of cells must be a sum of the sizes of some
+      of the remaining pieces.  For pieces all of one size (e.g. the
+      pentominoes), this is divisibility by the piece size.
+
+    * Shape: an island no larger than `self.region_limit` cells must be
+      tileable by the remaining pieces that fit it.  This is checked by a
+      small search, whose results are memoized by island shape & remaining
+      pieces (the same small holes recur all over the search).
+
+    Board cells are the columns whose names are comma-separated integer
+    coordinates (see `puzzler.strategies`), with the adjacency of
+    `coord_class` (a `puzzler.coordsys` coordinate class).  Where a row's
+    cells aren't connected by that adjacency (e.g. on a board which wraps
+    around), its cells are all made adjacent, so every placement lies
+    within one island and no solution is cut off.  The check only
+    applies to matrices whose cells are all primary columns, and whose rows
+    each contain exactly one other primary column (the piece), with the
+    same number of cells for every row of a piece.
+    """
+
+    memo_size = 2 ** 14
+    """The maximum number of entries in each cache of small islands
+    (cleared when full)."""
+
+    def __init__(self, coord_class, region_limit=None):
+        """
+        Parameters:
+
+        * `coord_class`: the coordinate class of the board cells, providing
+          a ``neighbors`` method.
+
+        * `region_limit`: the size of the largest island to check for
+          tileability; default: the size of the largest piece (so only
+          holes for one or two small pieces are searched; larger limits cut
+          off more states, but cost more time than they save).
+        """
+        self.coord_class = coord_class
+
+        self.region_limit = region_limit
+        """Islands of this many cells or fewer get the shape check."""
+
+        self.cells = 0
+        """A column bitset of the board cells."""
+
+        self.pieces = 0
+        """A column bitset of the piece columns."""
+
+        self.neighbors = None
+        """A dict mapping each cell's column ID to a column bitset of its
+        adjacent cells."""
+
+        self.sizes = None
+        """A dict mapping each piece's column ID to its number of cells."""
+
+        self.cell_rows = None
+        """A dict mapping each cell's column ID to a list of its rows."""
+
+        self.row_cells = None
+        """A list of column bitsets, one per row: the row's cells."""
+
+        self.row_piece = None
+        """A list of column bitsets, one per row: the row's piece."""
+
+        self.sums = {}
+        """Cache mapping piece column bitsets to bitsets of the areas they
+        can fill: bit `n` is set if some of the pieces total `n` cells."""
+
+        self.island_rows = {}
+        """Cache mapping island column bitsets to 2-tuples: the rows inside
+        the island (a list) and their pieces (a column bitset)."""
+
+        self.memo = {}
+        """Memo mapping (island, pieces) column bitset pairs to True if the
+        island can be tiled by some of the pieces (only pieces which fit the
+        island count)."""
+
+    cell_name_re = re.compile(r'-?\d+(,-?\d+)+$')
+
+    def bind(self, names, rows, primary):
+        """
+        Prepare the check for an exact cover matrix: `names` is a list of
+        column names, indexed by column ID; `rows` a list of lists of column
+        IDs, one per matrix row; `primary` a column bitset of the primary
+        columns.  Return `self.dead_end`, or None if the check doesn't apply
+        to the matrix.
+        """
+        cell_ids = {}
+        for c, name in enumerate(names):
+            if self.cell_name_re.match(name):
+                if not (primary >> c) & 1:
+                    return None
+                coord = tuple(int(part) for part in name.split(','))
+                cell_ids[coord] = c
+        if not cell_ids:
+            return None
+        self.cells = cells = sum(1 << c for c in cell_ids.values())
+        self.pieces = primary & ~cells
+        self.neighbors = {}
+        for coord, c in cell_ids.items():
+            bits = 0
+            for neighbor in self.coord_class(coord).neighbors():
+                n = cell_ids.get(tuple(neighbor))
+                if n is not None:
+                    bits |= 1 << n
+            self.neighbors[c] = bits
+        self.sizes = {}
+        self.cell_rows = dict((c, []) for c in cell_ids.values())
+        self.row_cells = []
+        self.row_piece = []
+        for r, row in enumerate(rows):
+            row_cells = 0
+            row_piece = 0
+            for c in row:
+                if (cells >> c) & 1:
+                    row_cells |= 1 << c
+                    self.cell_rows[c].append(r)
+                elif (primary >> c) & 1:
+                    if row_piece:
+                        return None
+                    row_piece = 1 << c
+            if not row_piece:
+                return None
+            size = bin(row_cells).count('1')
+            piece = row_piece.bit_length() - 1
+            if self.sizes.setdefault(piece, size) != size:
+                return None
+            self.row_cells.append(row_cells)
+            self.row_piece.append(row_piece)
+            if not self.connected(row_cells):
+                rest = row_cells
+                while rest:
+                    low_bit = rest & -rest
+                    rest ^= low_bit
+                    self.neighbors[low_bit.bit_length() - 1] |= (
+                        row_cells & ~low_bit)
+        if len(self.sizes) != bin(self.pieces).count('1'):
+            # a primary column without rows; no solutions anyway
+            return None
+        if self.region_limit is None:
+            self.region_limit = max(self.sizes.values())
+        self.sums = {}
+        self.island_rows = {}
+        self.memo = {}
+        return self.dead_end
+
+    def connected(self, cells):
+        """
+        Return True if `cells` (a non-empty column bitset) form one region
+        under the current adjacency (`self.neighbors`).
+        """
+        region = frontier = cells & -cells
+        while frontier:
+            low_bit = frontier & -frontier
+            frontier ^= low_bit
+            ring = self.neighbors[low_bit.bit_length() - 1] & cells & ~region
+            region |= ring
+            frontier |= ring
+        return region == cells
+
+    def dead_end(self, uncovered):
+        """
+        Return True if the state with `uncovered` primary columns (a column
+        bitset) has an island which can't be tiled by the remaining pieces.
+
+        Islands are grown from their lowest cell, a ring of neighbors at a
+        time.
+        """
+        neighbors = self.neighbors
+        cells = uncovered & self.cells
+        pieces = uncovered & self.pieces
+        sums = self.sums.get(pieces)
+        if sums is None:
+            sums = 1
+            rest = pieces
+            while rest:
+                low_bit = rest & -rest
+                rest ^= low_bit
+                sums |= sums << self.sizes[low_bit.bit_length() - 1]
+            self.sums[pieces] = sums
+        region_limit = self.region_limit
+        while cells:
+            island = frontier = cells & -cells
+            while frontier:
+                ring = 0
+                while frontier:
+                    low_bit = frontier & -frontier
+                    frontier ^= low_bit
+                    ring |= neighbors[low_bit.bit_length() - 1]
+                frontier = ring & cells & ~island
+                island |= frontier
+            cells &= ~island
+            area = bin(island).count('1')
+            if not (sums >> area) & 1:
+                return True
+            if area <= region_limit and not self.tileable(island, pieces):
+                return True
+        return False
+
+    def tileable(self, island, pieces):
+        """
+        Return True if `island` (a column bitset of cells) can be tiled by
+        some of the `pieces` (a column bitset).  Results are memoized, by
+        island and the pieces which fit it.
+        """
+        island_rows = self.island_rows.get(island)
+        if island_rows is None:
+            row_cells = self.row_cells
+            rows = set()
+            rest = island
+            while rest:
+                low_bit = rest & -rest
+                rest ^= low_bit
+                rows.update(self.cell_rows[low_bit.bit_length() - 1])
+            rows = [r for r in sorted(rows) if not row_cells[r] & ~island]
+            fitting = 0
+            for r in rows:
+                fitting |= self.row_piece[r]
+            island_rows = (rows, fitting)
+            if len(self.island_rows) >= self.memo_size:
+                self.island_rows.clear()
+            self.island_rows[island] = island_rows
+        rows, fitting = island_rows
+        key = (island, pieces & fitting)
+        result = self.memo.get(key)
+        if result is None:
+            result = self.tile(island, pieces & fitting, rows)
+            if len(self.memo) >= self.memo_size:
+                self.memo.clear()
+            self.memo[key] = result
+        return result
+
+    def tile(self, island, pieces, rows):
+        """
+        Return True if `island` can be exactly covered by `rows` (all inside
+        the island) using each of the `pieces` at most once: a plain
+        recursive search, covering the lowest cell first.
+        """
+        if not island:
+            return True
+        low_bit = island & -island
+        row_cells = self.row_cells
+        row_piece = self.row_piece
+        for r in rows:
+            if ( row_cells[r] & low_bit and row_piece[r] & pieces
+                 and not row_cells[r] & ~island):
+                if self.tile(island & ~row_cells[r], pieces & ~row_piece[r],
+                             rows):
+                    return True
+        return False
@@ -50,6 +50,24 @@ class Puzzle(object):
 
     secondary_columns = 0
 
+    piece_multiplicities = {}
+    """Mapping of piece names to (minimum, maximum) 2-tuples: the number of
+    copies of the piece in a solution, where other than exactly one.
+    Requires an exact cover engine supporting column multiplicities (see
+    `puzzler.exact_cover_bits`)."""
+
+    duplicate_pieces = {}
+    """Mapping of the names of extra copies of pieces to the names of the
+    original pieces.  With an exact cover engine supporting column
+    multiplicities, the copies are left out and the original piece column is
+    given a multiplicity instead, so interchangeable pieces are never
+    permuted.  Other engines place the copies as separate pieces."""
+
+    column_strategy = None
+    """The name of the preferred exact cover column selection strategy (see
+    `puzzler.strategies`), or None for the default.  Overridden by the
+    ``--strategy`` command-line option."""
+
     empty_cell = ' '
 
     margin = 1
@@ -134,12 +152,27 @@ class Puzzle(object):
         """Return a tuple of puzzle component classes (sub-puzzles)."""
         return (cls,)
 
-    def __init__(self, init_puzzle=True):
+    def __init__(self, init_puzzle=True, colored_columns=False,
+                 multiplicities=False):
         """
         Use `init_puzzle` to speed up initialization when not actually solving
-        the puzzle.
+        the puzzle.  Use `colored_columns` if the exact cover engine supports
+        colored secondary columns, and `multiplicities` if it supports column
+        multiplicities (see `puzzler.exact_cover_bits`).
         """
 
+        self.colored_columns = colored_columns
+        """Build a matrix with colored secondary columns, if the puzzle
+        supports them."""
+
+        self.multiplicities = multiplicities
+        """Use column multiplicities for `self.duplicate_pieces` and
+        `self.piece_multiplicities`."""
+
+        self.column_multiplicities = {}
+        """Mapping of matrix column names to (minimum, maximum) 2-tuples, for
+        the exact cover engine (see `self.build_multiplicities`)."""
+
         self.solutions = set()
         """Set of all permutations of solutions, for duplicate checking."""
 
@@ -170,19 +203,53 @@ class Puzzle(object):
         self.matrix_columns = {}
         """Mapping of `self.matrix` column names to indices."""
 
+        self.implicit_matrix = False
+        """True if only the header of `self.matrix` was built, the rows
+        being left to the exact cover engine (see `self.init_puzzle`)."""
+
         # Make an object-local deep copy of the dict:
         self.piece_data = copy.deepcopy(self.piece_data)
         # Now we can modify it as we like:
         self.customize_piece_data()
+        self.build_multiplicities()
 
         if init_puzzle:
             self.init_puzzle()
 
-    def init_puzzle(self):
-        """Initialize the puzzle pieces and matrix."""
+    def init_puzzle(self, implicit=False):
+        """
+        Initialize the puzzle pieces and matrix.  If `implicit` is set and
+        the matrix rows can be generated on demand (see
+        `self.supports_implicit_matrix`), only the matrix header is built.
+        """
+        if self.piece_multiplicities and not self.multiplicities:
+            raise ValueError(
+                '%s requires an exact cover engine supporting column '
+                'multiplicities (e.g. "-a bits").' % self.__class__.__name__)
         self.build_aspects()
         self.build_matrix_header()
-        self.build_matrix()
+        self.implicit_matrix = bool(
+            implicit and self.supports_implicit_matrix())
+        if not self.implicit_matrix:
+            self.build_matrix()
+
+    def supports_implicit_matrix(self):
+        """
+        Return True if the matrix rows are exactly the translations of the
+        aspects in `self.pieces` which fit in `self.solution_coords`, one
+        piece column plus cell columns per row, so that an exact cover
+        engine can generate them on demand from those two attributes (see
+        `puzzler.exact_cover_implicit`).  That is the case for puzzles
+        using the regular matrix building methods of `Puzzle2D` or
+        `Puzzle3D`, without secondary columns or column multiplicities.
+        """
+        if self.secondary_columns or self.column_multiplicities:
+            return False
+        for name, classes in implicit_matrix_methods:
+            method = getattr(self.__class__, name).im_func
+            if method not in [getattr(cls, name).im_func for cls in classes]:
+                return False
+        return True
 
     def coordinates(self):
         """
@@ -201,6 +268,30 @@ class Puzzle(object):
         """
         pass
 
+    def pruning_check(self):
+        """
+        Return a pruning check for the exact cover engine (see
+        `puzzler.pruning`), or None for no pruning.
+
+        Override in subclasses.
+        """
+        return None
+
+    def build_multiplicities(self):
+        """
+        Populate `self.column_multiplicities` from `self.duplicate_pieces` &
+        `self.piece_multiplicities`, and remove the duplicate pieces from
+        `self.piece_data`, if column multiplicities are enabled.
+        """
+        if not self.multiplicities:
+            return
+        for duplicate, name in sorted(self.duplicate_pieces.items()):
+            if duplicate in self.piece_data and name in self.piece_data:
+                del self.piece_data[duplicate]
+                copies = self.column_multiplicities.get(name, (1, 1))[0] + 1
+                self.column_multiplicities[name] = (copies, copies)
+        self.column_multiplicities.update(self.piece_multiplicities)
+
     def build_aspects(self):
         """Populate `self.aspects` and `self.pieces`."""
         self.build_regular_aspects(sorted(self.piece_data.keys()))
@@ -1076,6 +1167,17 @@ class PuzzlePseudo3D(Puzzle3D, Puzzle2D):
         raise NotImplementedError
 
 
+implicit_matrix_methods = (
+    ('build_matrix', (Puzzle,)),
+    ('build_matrix_header', (Puzzle2D, Puzzle3D)),
+    ('build_regular_matrix', (Puzzle2D, Puzzle3D)),
+    ('build_matrix_row', (Puzzle2D, Puzzle3D)),
+    ('matrix_header_coords', (Puzzle,)))
+"""The matrix building methods (names, and the classes of the acceptable
+implementations) of puzzles supporting implicit matrices (see
+`Puzzle.supports_implicit_matrix`)."""
+
+
 class OneSidedLowercaseMixin(object):
 
     """
@@ -11,13 +11,17 @@ Polycube puzzle base classes.
 
 import copy
 
+from puzzler import coordsys
+from puzzler import pruning
 from puzzler.puzzles import Puzzle3D
 from puzzler.puzzles.polyominoes import Pentominoes, Hexominoes
 
 
 class Polycubes(Puzzle3D):
 
-    pass
+    def pruning_check(self):
+        """Dead-region pruning (see `puzzler.pruning.IslandCheck`)."""
+        return pruning.IslandCheck(coordsys.Cartesian3D)
 
 
 class Monocube(Polycubes):
@@ -212,6 +216,8 @@ class PentacubesPlus(Pentacubes):
     http://www.gamepuzzles.com/polycube.htm#SQd.
     """
 
+    duplicate_pieces = {'J35': 'L35'}
+
     def customize_piece_data(self):
         """Add J35, a copy of L35."""
         Pentacubes.customize_piece_data(self)
@@ -278,6 +284,7 @@ class SolidHexominoesPlus(SolidHexominoes):
     piece_data['S16'] = copy.deepcopy(piece_data['N06'])
     piece_colors = copy.deepcopy(SolidHexominoes.piece_colors)
     piece_colors['S16'] = piece_colors['N06']
+    duplicate_pieces = {'S16': 'N06'}
 
 
 class Hexacubes(Polycubes):
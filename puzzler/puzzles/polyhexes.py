@@ -14,6 +14,7 @@ import math
 import collections
 
 from puzzler import coordsys
+from puzzler import pruning
 from puzzler.puzzles import Puzzle2D, OneSidedLowercaseMixin
 
 
@@ -28,6 +29,10 @@ class Polyhexes(Puzzle2D):
 
     coord_class = coordsys.Hexagonal2D
 
+    def pruning_check(self):
+        """Dead-region pruning (see `puzzler.pruning.IslandCheck`)."""
+        return pruning.IslandCheck(self.coord_class)
+
     def coordinates(self):
         return self.coordinates_parallelogram(self.width, self.height)
 
@@ -13,6 +13,7 @@ import math
 import copy
 
 from puzzler import coordsys
+from puzzler import pruning
 from puzzler.puzzles import (
     Puzzle, Puzzle3D, PuzzlePseudo3D, OneSidedLowercaseMixin)
 
@@ -45,6 +46,10 @@ class Polyiamonds(PuzzlePseudo3D):
 </polygon>
 '''
 
+    def pruning_check(self):
+        """Dead-region pruning (see `puzzler.pruning.IslandCheck`)."""
+        return pruning.IslandCheck(coordsys.Triangular3D)
+
     def coordinates(self):
         return self.coordinates_parallelogram(self.width, self.height)
 
@@ -12,6 +12,7 @@ Polyomino puzzle base classes.
 import copy
 
 from puzzler import coordsys
+from puzzler import pruning
 from puzzler.puzzles import Puzzle2D, OneSidedLowercaseMixin
 
 
@@ -25,6 +26,10 @@ class Polyominoes(Puzzle2D):
     # for format_solution:
     piece_width = 3
 
+    def pruning_check(self):
+        """Dead-region pruning (see `puzzler.pruning.IslandCheck`)."""
+        return pruning.IslandCheck(self.coord_class)
+
     def format_solution(self, solution,  normalized=True, **kwargs):
         """Convert solutions to uppercase to avoid duplicates."""
         formatted = Puzzle2D.format_solution(
@@ -302,6 +307,7 @@ class HexominoesPlus(Hexominoes):
     piece_colors = copy.deepcopy(Hexominoes.piece_colors)
     piece_colors['S16'] = piece_colors['N06']
     asymmetric_pieces = Hexominoes.asymmetric_pieces + ['S16']
+    duplicate_pieces = {'S16': 'N06', 's16': 'n06'}
 
     def format_solution(self, solution, normalized=True,
                         x_reversed=False, y_reversed=False):
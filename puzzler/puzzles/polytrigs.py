@@ -37,8 +37,11 @@ class Polytrigs(Polysticks):
 
     svg_curve = 'M %(x0).3f,%(y0).3f a %(r).3f,%(r).3f 0 0,1 %(dx).3f,%(dy).3f'
 
-    def __init__(self, init_puzzle=True):
-        Polysticks.__init__(self, init_puzzle=init_puzzle)
+    def __init__(self, init_puzzle=True, colored_columns=False,
+                 multiplicities=False):
+        Polysticks.__init__(self, init_puzzle=init_puzzle,
+                            colored_columns=colored_columns,
+                            multiplicities=multiplicities)
         self.svg_deltas, self.svg_radii = self.calculate_svg_details()
 
     def coordinates(self):
@@ -239,18 +242,32 @@ class Polytrigs(Polysticks):
             headers.append(key)
         deltas = ((1,0,0), (0,1,0), (-1,1,0))
         intersections = set()
+        num_rays = {}
         for coord in sorted(self.solution_coords):
             (x, y, z) = coord
             header = '%0*i,%0*i,%0*i' % (
                 self.x_width, x, self.y_width, y, self.z_width, z)
             self.matrix_columns[header] = len(headers)
             headers.append(header)
-            intersections.update(set(coord.intersection_coordinates()))
+            if self.colored_columns:
+                for point in ((x, y), coord.endpoint()[:2]):
+                    num_rays[point] = num_rays.get(point, 0) + 1
+            else:
+                intersections.update(set(coord.intersection_coordinates()))
         primary = len(headers)
-        for (x, y, z) in sorted(intersections):
-            header = '%0*i,%0*i,%01ii' % (self.x_width, x, self.y_width, y, z)
-            self.matrix_columns[header] = len(headers)
-            headers.append(header)
+        if self.colored_columns:
+            # one column per point; crossings need 4 or more segments:
+            for (x, y) in sorted(point for (point, count) in num_rays.items()
+                                 if count >= 4):
+                header = '%0*i,%0*ii' % (self.x_width, x, self.y_width, y)
+                self.matrix_columns[header] = len(headers)
+                headers.append(header)
+        else:
+            for (x, y, z) in sorted(intersections):
+                header = '%0*i,%0*i,%01ii' % (
+                    self.x_width, x, self.y_width, y, z)
+                self.matrix_columns[header] = len(headers)
+                headers.append(header)
         self.secondary_columns = len(headers) - primary
         self.matrix.append(tuple(headers))
 
@@ -261,10 +278,16 @@ class Polytrigs(Polysticks):
             label = '%0*i,%0*i,%0*i' % (
                 self.x_width, x, self.y_width, y, self.z_width, z)
             row[self.matrix_columns[label]] = label
-        for (x,y,z) in coords.intersections():
-            label = '%0*i,%0*i,%ii' % (self.x_width, x, self.y_width, y, z)
-            if label in self.matrix_columns:
-                row[self.matrix_columns[label]] = label
+        if self.colored_columns:
+            for (x,y), color in coords.crossing_colors().items():
+                label = '%0*i,%0*ii' % (self.x_width, x, self.y_width, y)
+                if label in self.matrix_columns:
+                    row[self.matrix_columns[label]] = (label, color)
+        else:
+            for (x,y,z) in coords.intersections():
+                label = '%0*i,%0*i,%ii' % (self.x_width, x, self.y_width, y, z)
+                if label in self.matrix_columns:
+                    row[self.matrix_columns[label]] = label
         self.matrix.append(tuple(row))
 
     def format_solution(self, solution, normalized=True, rotate_180=False):
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+Compact, read-only exact cover matrices, shared between processes.
+
+A puzzle matrix is a list of dense tuples: mostly zeros, with a handful of
+non-zero values per row.  `pack` writes it to a file in a sparse binary
+form, and `SharedMatrix` memory-maps that file and presents it as the same
+sequence of tuples, decoding each row when it is accessed.  Any engine's
+``load_matrix`` (and `puzzler.prefix_matrix`) can use it as is.
+
+The processes mapping the file share one copy of it (the operating
+system's), and a `SharedMatrix` is pickled as its file name: handing a
+matrix to a worker process costs a file name and a ``mmap`` call, however
+large the matrix is.
+
+File layout (native byte order; entries are unsigned 32-bit integers):
+
+* The header (`header_format`): the `magic` string, the number of rows
+  (excluding the column names), the number of entries (non-zero values),
+  and the size of the table.
+* The table: a pickled 2-tuple, the column names (the first matrix row)
+  and a list of the distinct non-zero values.
+* The row offsets: for each row, the index of its first entry, plus the
+  total number of entries.
+* The entries' column indices, row by row.
+* The entries' values (indices into the table's list of values).
+"""
+
+import os
+import mmap
+import array
+import struct
+import tempfile
+import cPickle as pickle
+
+
+magic = 'PZMATRIX'
+
+header_format = '=8sIII'
+"""`struct` format of the file header: magic string, number of rows, number
+of entries, and table size."""
+
+entry_format = 'I'
+"""`array` & `struct` type code of the row offsets and entries."""
+
+entry_size = struct.calcsize('=' + entry_format)
+
+
+def pack(matrix, path=None):
+    """
+    Write exact cover `matrix` (see
+    `puzzler.exact_cover_bits.ExactCover.load_matrix`) to file `path` (a
+    new temporary file by default) in compact form, and return a
+    `SharedMatrix` owning the file: closing it removes the file.
+    """
+    if path is None:
+        handle, path = tempfile.mkstemp(prefix='puzzler-', suffix='.matrix')
+        os.close(handle)
+    rows = iter(matrix)
+    names = rows.next()
+    values = []
+    value_index = {}
+    offsets = array.array(entry_format, [0])
+    columns = array.array(entry_format)
+    entries = array.array(entry_format)
+    for row in rows:
+        for j, value in enumerate(row):
+            if not value:
+                continue
+            # 1 == True, but the value is reproduced exactly:
+            key = (value.__class__, value)
+            if key not in value_index:
+                value_index[key] = len(values)
+                values.append(value)
+            columns.append(j)
+            entries.append(value_index[key])
+        offsets.append(len(columns))
+    table = pickle.dumps((names, values), pickle.HIGHEST_PROTOCOL)
+    matrix_file = open(path, 'wb')
+    try:
+        matrix_file.write(struct.pack(
+            header_format, magic, len(offsets) - 1, len(columns), len(table)))
+        matrix_file.write(table)
+        offsets.tofile(matrix_file)
+        columns.tofile(matrix_file)
+        entries.tofile(matrix_file)
+    finally:
+        matrix_file.close()
+    return SharedMatrix(path, owner=True)
+
+
+class SharedMatrix(object):
+
+    """
+    A read-only view of an exact cover matrix file written by `pack`: a
+    sequence of the matrix's rows (the column names, then the rows as dense
+    tuples).  Slices are views too.
+    """
+
+    def __init__(self, path, owner=False):
+        self.path = path
+        """The matrix file name."""
+
+        self.owner = owner
+        """If true, `close` removes the file."""
+
+        matrix_file = open(path, 'rb')
+        try:
+            self.map = mmap.mmap(matrix_file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        finally:
+            matrix_file.close()
+        header_size = struct.calcsize(header_format)
+        file_magic, num_rows, num_entries, table_size = struct.unpack_from(
+            header_format, self.map)
+        if file_magic != magic:
+            raise ValueError('%s is not a matrix file.' % path)
+        self.names, self.values = pickle.loads(
+            self.map[header_size:header_size + table_size])
+        self.offsets_start = header_size + table_size
+        self.columns_start = self.offsets_start + (num_rows + 1) * entry_size
+        self.entries_start = self.columns_start + num_entries * entry_size
+        # the rows viewed, by full matrix index (row 0: column names):
+        self.first = 0
+        self.step = 1
+        self.length = num_rows + 1
+
+    def view(self, first, step, length):
+        """
+        Return a view of `length` rows of the full matrix, from row `first`
+        by `step`, sharing this matrix's mapping.
+        """
+        view = object.__new__(SharedMatrix)
+        view.__dict__.update(self.__dict__)
+        view.owner = False
+        view.first = first
+        view.step = step
+        view.length = length
+        return view
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.length)
+            return self.view(self.first + start * self.step,
+                             self.step * step, len(xrange(start, stop, step)))
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('matrix index out of range')
+        return self.row(self.first + index * self.step)
+
+    def __iter__(self):
+        for i in xrange(self.length):
+            yield self.row(self.first + i * self.step)
+
+    def row(self, r):
+        """
+        Return row `r` of the full matrix: the column names (for row 0) or
+        a dense tuple of values.
+        """
+        if r == 0:
+            return self.names
+        row = [0] * len(self.names)
+        for j, value in zip(*self.sparse_row(r)):
+            row[j] = value
+        return tuple(row)
+
+    def sparse_row(self, r):
+        """
+        Return row `r` (> 0) of the full matrix as a 2-tuple: its non-zero
+        columns' indices, and their values.
+        """
+        start, end = struct.unpack_from(
+            '=2' + entry_format, self.map,
+            self.offsets_start + entry_size * (r - 1))
+        count_format = '=%s%s' % (end - start, entry_format)
+        columns = struct.unpack_from(
+            count_format, self.map, self.columns_start + entry_size * start)
+        entries = struct.unpack_from(
+            count_format, self.map, self.entries_start + entry_size * start)
+        return columns, [self.values[e] for e in entries]
+
+    def __reduce__(self):
+        # only the file name & view are pickled; the file is mapped again:
+        return open_view, (self.path, self.first, self.step, self.length)
+
+    def close(self):
+        """Unmap the file, and remove it if this matrix owns it."""
+        self.map.close()
+        if self.owner:
+            os.remove(self.path)
+
+
+def open_view(path, first, step, length):
+    """Map matrix file `path` and return a view of it (see `SharedMatrix`)."""
+    return SharedMatrix(path).view(first, step, length)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see __init__.py)
+
+"""
+Column selection strategies for the exact cover engines.
+
+At each search node, Algorithm X chooses an uncovered primary column and
+tries each of its rows in turn.  The engines' native choice is the column
+with the fewest remaining rows ("mrv", for "minimum remaining values"),
+ties broken by column order.  The other strategies are expressed as a
+static key per column plus a weight: the engine chooses the column with the
+lowest ``key + weight * size``, where "size" is the column's number of
+remaining rows.
+
+A "random:SEED" strategy (see `random_strategy`) is used internally for
+randomized searches: fewest remaining rows, ties broken randomly.
+
+Piece columns are those whose names contain no comma; the others are board
+cells (or other coordinate-based columns), whose names are
+comma-separated integer coordinates, possibly followed by a letter (as in
+the "i" of polystick intersection columns).  Board positions are compared
+numerically, coordinate by coordinate.
+"""
+
+import random
+import re
+
+
+default = 'mrv'
+
+strategies = {
+    'mrv': 'fewest remaining rows, ties broken by column order',
+    'position': 'fewest remaining rows, ties broken by board position',
+    'pieces': 'piece columns before cells, fewest remaining rows first',
+    'scan': 'first uncovered cell in board position order, then pieces',}
+"""Mapping of strategy names to descriptions."""
+
+choices = ('mrv', 'position', 'pieces', 'scan')
+
+
+class StrategyError(ValueError):
+
+    """Unknown or unsupported column selection strategy."""
+
+    pass
+
+
+def is_native(strategy):
+    """Return True if `strategy` is the engines' built-in column choice."""
+    return strategy is None or strategy == default
+
+def random_strategy(seed):
+    """
+    Return the name of a strategy choosing the column with the fewest
+    remaining rows, breaking ties in a random order determined by `seed`
+    (an integer).
+    """
+    return 'random:%s' % seed
+
+def position_key(name):
+    """
+    Return a sort key for a column name: piece columns first (by name), then
+    cell columns, ordered by numeric coordinates.
+    """
+    if ',' not in name:
+        return (0, (), name)
+    coordinates = tuple(int(part) for part in coordinate_re.findall(name))
+    return (1, coordinates, name)
+
+coordinate_re = re.compile(r'-?\d+')
+
+def column_keys(strategy, names, num_rows):
+    """
+    Return the static keys and the size weight for `strategy`: a list of
+    integer keys (parallel to `names`, a list of column names), and an
+    integer.  `num_rows` is the number of rows in the matrix.  The engine
+    chooses the uncovered primary column with the lowest ``key + weight *
+    size``.  Keys are unique, so ties need no further breaking.
+    """
+    n = len(names)
+    if strategy and strategy.startswith('random:'):
+        keys = range(n)
+        random.Random(int(strategy[len('random:'):])).shuffle(keys)
+        return keys, n
+    if strategy not in strategies or is_native(strategy):
+        raise StrategyError(
+            'No column keys for column selection strategy %r.' % strategy)
+    order = sorted(range(n), key=lambda j: position_key(names[j]))
+    ranks = [None] * n
+    for rank, j in enumerate(order):
+        ranks[j] = rank
+    pieces = [',' not in name for name in names]
+    if strategy == 'position':
+        # size first, then position:
+        return ranks, n
+    elif strategy == 'pieces':
+        # any piece column sorts before any cell column:
+        cells_offset = n * (num_rows + 1)
+        return ([rank + (not piece) * cells_offset
+                 for rank, piece in zip(ranks, pieces)], n)
+    elif strategy == 'scan':
+        # position only; pieces (ranked first) go last:
+        return ([rank + piece * n for rank, piece in zip(ranks, pieces)], 0)
@@ -20,3 +20,20 @@ def plural_s(number):
         return ''
     else:
         return 's'
+
+def luby(i):
+    """
+    Return term `i` (counting from 1) of the Luby sequence: 1, 1, 2, 1, 1, 2,
+    4, 1, 1, 2, 1, 1, 2, 4, 8, ...  Used to schedule search restarts (it is
+    within a constant factor of the optimal universal schedule).
+    """
+    k = 1
+    while True:
+        if i == (1 << k) - 1:
+            return 1 << (k - 1)
+        elif i < (1 << k) - 1:
+            # the sequence repeats itself after each term 2**(k-1):
+            i -= (1 << (k - 1)) - 1
+            k = 1
+        else:
+            k += 1
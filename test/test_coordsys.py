@@ -213,6 +213,22 @@ class TriangularGrid3DTests(unittest.TestCase):
              (2, 0, 0), (2, 0, 1), (2, 0, 2), (2, 0, 3), (2, 0, 4), (2, 0, 5)])
 
 
+class TriangularGrid3DCoordSetTests(unittest.TestCase):
+
+    def colors(self, coords):
+        return coordsys.TriangularGrid3DCoordSet(coords).crossing_colors()
+
+    def test_crossing_colors(self):
+        # straight through point (1,0):
+        self.assertEquals(self.colors([(0,0,0), (1,0,0)]), {(1,0): '03'})
+        # adjacent rays (60 degrees) can't be crossed:
+        self.assertEquals(self.colors([(0,0,0), (0,0,1)]), {})
+        # back-to-back one-gappers share a color:
+        self.assertEquals(self.colors([(0,0,0), (0,0,2)]), {(0,0): '02'})
+        self.assertEquals(self.colors([(-1,0,0), (1,-1,2)]), {(0,0): '02'})
+        self.assertEquals(self.colors([(0,0,1), (-1,0,0)]), {(0,0): '04'})
+
+
 class HexagonalGrid3DTests(unittest.TestCase):
 
     o = coordsys.HexagonalGrid3D((0,0,0))
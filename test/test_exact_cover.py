@@ -0,0 +1,796 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see alltests.py)
+
+import os
+import cPickle as pickle
+import random
+import tempfile
+import unittest
+
+from puzzler import exact_cover_bits
+from puzzler import exact_cover_board
+from puzzler import exact_cover_cells
+from puzzler import exact_cover_dlx
+from puzzler import exact_cover_dlxa
+from puzzler import exact_cover_implicit
+from puzzler import exact_cover_x2
+from puzzler import exact_cover_zdd
+from puzzler import preprocessing
+from puzzler import pruning
+from puzzler import shared_matrix
+from puzzler import strategies
+from puzzler.puzzles.pentominoes import Pentominoes3x20
+from puzzler.puzzles.somacubes import Soma3x3x3, SomaCrystal
+from puzzler.puzzles.tetrahexes import Tetrahexes4x7
+from puzzler.puzzles.tetrominoes import Tetrominoes5x4Tube
+
+try:
+    from puzzler import exact_cover_numpy
+except ImportError:
+    exact_cover_numpy = None
+
+
+class ExactCoverTests(unittest.TestCase):
+
+    matrix = [
+        'A  B  C  D  E  F  G'.split(),
+        [0, 0, 1, 0, 1, 1, 0],
+        [1, 0, 0, 1, 0, 0, 1],
+        [0, 1, 1, 0, 0, 1, 0],
+        [1, 0, 0, 1, 0, 0, 0],
+        [0, 1, 0, 0, 0, 0, 1],
+        [0, 0, 0, 1, 1, 0, 1]]
+
+    secondary_matrix = [
+        'A  B  C  x  y'.split(),
+        [1, 0, 0, 1, 0],
+        [0, 1, 0, 1, 0],
+        [0, 1, 0, 0, 1],
+        [0, 0, 1, 0, 0],
+        [0, 0, 1, 1, 1]]
+
+    modules = (exact_cover_bits, exact_cover_cells, exact_cover_dlx,
+               exact_cover_dlxa, exact_cover_x2)
+    if exact_cover_numpy:
+        modules += (exact_cover_numpy,)
+
+    def solutions(self, module, matrix, secondary=0):
+        solver = module.ExactCover(matrix, secondary)
+        return sorted(sorted(solution) for solution in solver.solve())
+
+    def test_simple(self):
+        for module in self.modules:
+            self.assertEquals(
+                self.solutions(module, self.matrix),
+                [[['A', 'D'], ['B', 'G'], ['C', 'E', 'F']]])
+
+    def test_secondary(self):
+        for module in self.modules:
+            self.assertEquals(
+                self.solutions(module, self.secondary_matrix, secondary=2),
+                [[['A', 'x'], ['B', 'y'], ['C']]])
+
+    def test_colored_columns(self):
+        matrix = [
+            'A  B  x'.split(),
+            [1, 0, ('x', 'red')],
+            [0, 1, ('x', 'red')],
+            [1, 0, ('x', 'blue')],
+            [0, 1, 'x']]
+        self.assertEquals(
+            self.solutions(exact_cover_bits, matrix, secondary=1),
+            [[['A', 'x'], ['B', 'x']]])
+
+    def test_multiplicities(self):
+        matrix = [
+            'A  B  C  D'.split(),
+            [1, 1, 0, 0],
+            [1, 0, 1, 0],
+            [0, 0, 1, 1],
+            [0, 1, 0, 1],
+            [1, 0, 0, 1],
+            [0, 0, 0, 1]]
+        solver = exact_cover_bits.ExactCover()
+        # A: two rows, B: optional, D: one or two rows:
+        solver.load_matrix(matrix, multiplicities={
+            'A': (2, 2), 'B': (0, 1), 'D': (1, 2)})
+        self.assertEquals(
+            sorted(sorted(solution) for solution in solver.solve()),
+            [[['A', 'B'], ['A', 'C'], ['D']],
+             [['A', 'B'], ['A', 'D'], ['C', 'D']],
+             [['A', 'C'], ['A', 'D']],
+             [['A', 'C'], ['A', 'D'], ['B', 'D']],
+             [['A', 'C'], ['A', 'D'], ['D']]])
+
+    def test_format_solution(self):
+        for module in self.modules:
+            solver = module.ExactCover(self.matrix)
+            for solution in solver.solve():
+                formatted = solver.format_solution()
+            self.assertEquals(formatted.splitlines()[0], 'solution 1:')
+            self.assertEquals(
+                sorted(formatted.splitlines()[1:]), ['A D', 'B G', 'C E F'])
+
+
+class State:
+
+    """Stands in for `puzzler.SessionState`."""
+
+    def __init__(self, solution, num_solutions=0, num_searches=0):
+        self.solution = solution
+        self.num_solutions = num_solutions
+        self.num_searches = num_searches
+
+
+class EngineEquivalenceTests(unittest.TestCase):
+
+    """Compare engines on a real puzzle, Soma3x3x3 (240 solutions)."""
+
+    puzzle = Soma3x3x3()
+
+    def run_solver(self, module):
+        solver = module.ExactCover(
+            self.puzzle.matrix, self.puzzle.secondary_columns)
+        return list(solver.solve()), solver.num_searches
+
+    def test_dlxa_matches_dlx(self):
+        solutions, searches = self.run_solver(exact_cover_dlx)
+        self.assertEquals(len(solutions), 240)
+        self.assertEquals(self.run_solver(exact_cover_dlxa),
+                          (solutions, searches))
+
+    def test_empty_row(self):
+        matrix = [['a', 'b', 's'], [1, 0, 0], [0, 1, 0], [0, 0, 0], [0, 0, 1]]
+        for module in ExactCoverTests.modules:
+            solver = module.ExactCover(matrix, 1)
+            self.assertEquals(list(solver.solve()), [[['a'], ['b']]],
+                              module.__name__)
+
+    def test_cells_matches_dlx(self):
+        solutions, searches = self.run_solver(exact_cover_dlx)
+        self.assertEquals(self.run_solver(exact_cover_cells),
+                          (solutions, searches))
+
+    def test_bits_matches_x2(self):
+        solutions, searches = self.run_solver(exact_cover_x2)
+        self.assertEquals(self.run_solver(exact_cover_bits),
+                          (solutions, searches))
+
+    @unittest.skipUnless(exact_cover_numpy, 'requires NumPy')
+    def test_numpy_matches_x2(self):
+        solutions, searches = self.run_solver(exact_cover_x2)
+        self.assertEquals(self.run_solver(exact_cover_numpy),
+                          (solutions, searches))
+
+    def test_resume(self):
+        matrix = self.puzzle.matrix
+        for module in ExactCoverTests.modules:
+            solver = module.ExactCover(matrix)
+            solutions = list(solver.solve())
+            solver = module.ExactCover(matrix)
+            generator = solver.solve()
+            for i in range(100):
+                generator.next()
+            state = State(list(solver.solution))
+            solver = module.ExactCover(matrix, state=state)
+            self.assertEquals(list(solver.solve()), solutions[99:])
+
+    def test_max_searches(self):
+        for module in ExactCoverTests.modules:
+            solver = module.ExactCover(self.puzzle.matrix)
+            solver.max_searches = 100
+            solutions = list(solver.solve())
+            self.assertEquals(solver.num_searches, 100)
+            self.assert_(0 < len(solutions) < 240)
+
+    def test_random_strategy(self):
+        results = []
+        for seed in (1, 1, 2):
+            solver = exact_cover_x2.ExactCover(
+                self.puzzle.matrix, strategy=strategies.random_strategy(seed))
+            results.append(list(solver.solve()))
+        self.assertEquals(results[0], results[1])
+        self.assertNotEquals(results[0], results[2])
+        self.assertEquals(sorted(sorted(solution) for solution in results[0]),
+                          sorted(sorted(solution) for solution in results[2]))
+
+    def test_dlx_legacy_resume(self):
+        matrix = self.puzzle.matrix
+        solver = exact_cover_dlx.ExactCover(matrix)
+        generator = solver.solve()
+        for i in range(100):
+            solution = generator.next()
+        prefix = list(solver.solution)
+        state = State(solution)         # column names, as saved before
+        solver = exact_cover_dlx.ExactCover(matrix, state=state)
+        self.assertEquals(solver.solution, prefix)
+
+
+class CountTests(unittest.TestCase):
+
+    """Cached solution counting, checked against full enumeration."""
+
+    def test_soma(self):
+        matrix = EngineEquivalenceTests.puzzle.matrix
+        for cache_size in (None, 10, 1):
+            solver = exact_cover_bits.ExactCover(matrix)
+            self.assertEquals(solver.count_solutions(cache_size), 240)
+        # recurring states are searched once:
+        self.assert_(solver.num_searches < 4224)
+
+    def test_strategies(self):
+        puzzle = StrategyEngineTests.puzzle
+        for strategy in strategies.choices:
+            solver = exact_cover_bits.ExactCover(
+                puzzle.matrix, puzzle.secondary_columns, strategy=strategy)
+            self.assertEquals(solver.count_solutions(), 7)
+
+    def test_colored_columns(self):
+        matrix = [
+            'A  B  C  x'.split(),
+            [1, 0, 0, ('x', 'red')],
+            [0, 1, 0, ('x', 'red')],
+            [1, 0, 0, ('x', 'blue')],
+            [0, 1, 0, ('x', 'green')],
+            [0, 0, 1, 0],
+            [0, 0, 1, 'x']]
+        solver = exact_cover_bits.ExactCover(matrix, secondary=1)
+        # the same columns are used after rows 0 & 2, but not the same rows
+        # remain active:
+        self.assertEquals(solver.count_solutions(), 1)
+
+    def test_multiplicities(self):
+        solver = exact_cover_bits.ExactCover()
+        solver.load_matrix(ExactCoverTests.matrix,
+                           multiplicities={'D': (1, 2)})
+        self.assertEquals(solver.count_solutions(),
+                          len(list(solver.solve())))
+
+    def test_max_searches(self):
+        solver = exact_cover_bits.ExactCover(
+            EngineEquivalenceTests.puzzle.matrix)
+        solver.max_searches = 100
+        self.assertEquals(solver.count_solutions(), None)
+
+
+def doubled(matrix):
+    """
+    Return a matrix combining two independent copies of `matrix` (which must
+    not have secondary columns), with 'a' & 'b' column name suffixes.
+    """
+    header = ([name + 'a' for name in matrix[0]]
+              + [name + 'b' for name in matrix[0]])
+    blank = (0,) * len(matrix[0])
+    return ([header] + [tuple(row) + blank for row in matrix[1:]]
+            + [blank + tuple(row) for row in matrix[1:]])
+
+
+class DecompositionTests(unittest.TestCase):
+
+    """Independent groups, on doubled puzzles."""
+
+    def solver(self, puzzle, decompose=True):
+        solver = exact_cover_bits.ExactCover(doubled(puzzle.matrix))
+        solver.decompose = decompose
+        return solver
+
+    def test_split(self):
+        solver = self.solver(StrategyEngineTests.puzzle)
+        groups = solver.split((1 << len(solver.rows)) - 1, solver.primary)
+        self.assertEquals(len(groups), 2)
+        self.assertEquals(groups[0][0] | groups[1][0],
+                          (1 << len(solver.rows)) - 1)
+        self.assertEquals(groups[0][1] | groups[1][1], solver.primary)
+
+    def test_count(self):
+        solver = self.solver(EngineEquivalenceTests.puzzle)
+        self.assertEquals(solver.count_solutions(), 240 * 240)
+        # each copy is searched once:
+        self.assert_(solver.num_searches < 2 * 4224)
+
+    def test_solve(self):
+        solver = self.solver(StrategyEngineTests.puzzle, decompose=False)
+        solutions = sorted(sorted(solution) for solution in solver.solve())
+        self.assertEquals(len(solutions), 49)
+        solver = self.solver(StrategyEngineTests.puzzle)
+        self.assertEquals(
+            sorted(sorted(solution) for solution in solver.solve()),
+            solutions)
+        # each copy is searched once (88 searches), instead of 730 searches:
+        self.assertEquals(solver.num_searches, 88 * 2)
+
+    def test_dead_group(self):
+        matrix = doubled(StrategyEngineTests.puzzle.matrix)
+        # no row for the last column of the second copy:
+        matrix = [matrix[0]] + [row for row in matrix[1:] if not row[-1]]
+        solver = exact_cover_bits.ExactCover(matrix)
+        solver.decompose = True
+        self.assertEquals(list(solver.solve()), [])
+        self.assertEquals(solver.count_solutions(), 0)
+
+    def test_max_searches(self):
+        solver = self.solver(EngineEquivalenceTests.puzzle)
+        solver.max_searches = 100
+        self.assertEquals(list(solver.solve()), [])
+        self.assertEquals(solver.num_searches, 100)
+
+
+class PreprocessingTests(unittest.TestCase):
+
+    """Removal of useless rows, checked against unreduced searches."""
+
+    matrix = [
+        'A  B  C  D'.split(),
+        [1, 0, 1, 1],           # conflicts with every row of B
+        [0, 1, 1, 0],
+        [0, 1, 0, 1],
+        [1, 0, 0, 0],
+        [0, 0, 1, 1],           # conflicts with every row of B
+        [0, 0, 1, 0],
+        [0, 0, 0, 1]]
+
+    def test_simple(self):
+        reduced, num_removed = preprocessing.reduce_matrix(self.matrix)
+        self.assertEquals(num_removed, 2)
+        self.assertEquals(reduced,
+                          [self.matrix[i] for i in (0, 2, 3, 4, 6, 7)])
+        solutions = ExactCoverTests('test_simple').solutions
+        self.assertEquals(solutions(exact_cover_bits, reduced),
+                          solutions(exact_cover_bits, self.matrix))
+
+    def test_multiplicities(self):
+        # B is optional: no rows are useless
+        reduced, num_removed = preprocessing.reduce_matrix(
+            self.matrix, multiplicities={'B': (0, 1)})
+        self.assertEquals(num_removed, 0)
+        self.assertEquals(reduced, self.matrix)
+
+    def test_colored_columns(self):
+        matrix = [
+            'A  B  x'.split(),
+            [1, 0, ('x', 'red')],
+            [0, 1, ('x', 'red')],
+            [1, 0, ('x', 'blue')],
+            [0, 1, 'x']]
+        self.assertEquals(preprocessing.reduce_matrix(matrix, secondary=1),
+                          (matrix, 0))
+
+    def test_puzzles(self):
+        for puzzle in (Pentominoes3x20(), EngineEquivalenceTests.puzzle):
+            reduced, num_removed = preprocessing.reduce_matrix(puzzle.matrix)
+            self.assert_(num_removed)
+            self.assertEquals(len(reduced), len(puzzle.matrix) - num_removed)
+            solutions = ExactCoverTests('test_simple').solutions
+            for module in (exact_cover_bits, exact_cover_x2):
+                self.assertEquals(solutions(module, reduced),
+                                  solutions(module, puzzle.matrix))
+
+
+class PruningTests(unittest.TestCase):
+
+    """Dead-region pruning, checked against unpruned searches."""
+
+    puzzle = Pentominoes3x20()
+
+    def solver(self, puzzle, prune=True):
+        solver = exact_cover_bits.ExactCover(
+            puzzle.matrix, puzzle.secondary_columns)
+        if prune:
+            solver.pruning_check = puzzle.pruning_check()
+            solver.load_matrix(puzzle.matrix, puzzle.secondary_columns)
+        return solver
+
+    def test_solve(self):
+        for puzzle in (self.puzzle, EngineEquivalenceTests.puzzle):
+            plain = self.solver(puzzle, prune=False)
+            solutions = list(plain.solve())
+            solver = self.solver(puzzle)
+            self.assertEquals(list(solver.solve()), solutions)
+            self.assert_(solver.num_pruned)
+            self.assert_(solver.num_searches < plain.num_searches)
+
+    def test_count(self):
+        solver = self.solver(EngineEquivalenceTests.puzzle)
+        self.assertEquals(solver.count_solutions(), 240)
+        self.assert_(solver.num_pruned)
+
+    def test_resume(self):
+        puzzle = EngineEquivalenceTests.puzzle
+        solutions = list(self.solver(puzzle).solve())
+        solver = self.solver(puzzle)
+        generator = solver.solve()
+        for i in range(100):
+            generator.next()
+        state = State(list(solver.solution))
+        solver = exact_cover_bits.ExactCover(state=state)
+        solver.pruning_check = puzzle.pruning_check()
+        solver.load_matrix(puzzle.matrix)
+        self.assertEquals(list(solver.solve()), solutions[99:])
+
+    def test_islands(self):
+        solver = self.solver(self.puzzle)
+        names = solver.names
+        dead_end = solver.dead_end
+        uncovered = solver.primary
+        self.assertFalse(dead_end(uncovered))
+        # covering the neighbors of a corner cell isolates it:
+        for name in ('01,0', '00,1'):
+            uncovered &= ~(1 << names.index(name))
+        self.assert_(dead_end(uncovered))
+
+    def test_wrap_around(self):
+        # placements wrap around the tube, across non-adjacent coordinates:
+        puzzle = Tetrominoes5x4Tube()
+        solutions = list(self.solver(puzzle, prune=False).solve())
+        self.assertEquals(len(solutions), 7)
+        self.assertEquals(list(self.solver(puzzle).solve()), solutions)
+
+    def test_not_applicable(self):
+        # no board cells:
+        solver = exact_cover_bits.ExactCover()
+        solver.pruning_check = pruning.IslandCheck(Pentominoes3x20.coord_class)
+        solver.load_matrix(ExactCoverTests.matrix)
+        self.assertEquals(solver.dead_end, None)
+        # with column multiplicities:
+        solver = exact_cover_bits.ExactCover()
+        solver.pruning_check = self.puzzle.pruning_check()
+        solver.load_matrix(self.puzzle.matrix, multiplicities={'X': (0, 1)})
+        self.assertEquals(solver.dead_end, None)
+
+
+class SubtreeTests(unittest.TestCase):
+
+    """Subtree prefixes for parallel searches, checked against searches."""
+
+    def test_prefixes(self):
+        matrix = EngineEquivalenceTests.puzzle.matrix
+        solver = exact_cover_bits.ExactCover(matrix)
+        solutions = []
+        for solution in solver.solve():
+            solutions.append(list(solver.solution))
+        splitter = exact_cover_bits.ExactCover(matrix)
+        prefixes = splitter.subtree_prefixes(10)
+        self.assert_(len(prefixes) >= 10)
+        # in search order, the subtrees produce the same solutions:
+        ordered = []
+        for prefix in prefixes:
+            ordered.extend(solution for solution in solutions
+                           if solution[:len(prefix)] == prefix)
+        self.assertEquals(ordered, solutions)
+
+    def test_complete_prefix(self):
+        solver = exact_cover_bits.ExactCover(ExactCoverTests.matrix)
+        self.assertEquals(solver.subtree_prefixes(100, max_depth=5),
+                          [[3, 0, 4]])
+        # the whole search tree was expanded:
+        searcher = exact_cover_bits.ExactCover(ExactCoverTests.matrix)
+        list(searcher.solve())
+        self.assertEquals(solver.num_searches, searcher.num_searches)
+
+
+class SharedMatrixTests(unittest.TestCase):
+
+    """Packed matrix files, read as puzzle matrices."""
+
+    colored_matrix = [
+        'A  B  x'.split(),
+        (1, 0, ('x', 'red')),
+        (0, 1, ('x', 'red')),
+        (True, 0, ('x', 'blue')),
+        (0, 1, 'x')]
+
+    def setUp(self):
+        self.shared = shared_matrix.pack(self.colored_matrix)
+
+    def tearDown(self):
+        self.shared.close()
+
+    def test_rows(self):
+        matrix = self.colored_matrix
+        self.assertEquals(list(self.shared), matrix)
+        self.assertEquals(len(self.shared), len(matrix))
+        self.assert_(self.shared[3][0] is True)
+        self.assertEquals(self.shared[-1], matrix[-1])
+        self.assertRaises(IndexError, self.shared.__getitem__, 5)
+        self.assertEquals(list(self.shared[1:]), matrix[1:])
+        self.assertEquals(list(self.shared[1:][::-2]), matrix[1:][::-2])
+
+    def test_pickle(self):
+        view = pickle.loads(pickle.dumps(self.shared[2:]))
+        self.assertEquals(list(view), self.colored_matrix[2:])
+        view.close()
+        # only the owner removes the file:
+        self.assert_(os.path.exists(self.shared.path))
+
+    def test_close(self):
+        path = self.shared.path
+        self.shared.close()
+        self.assertFalse(os.path.exists(path))
+        self.shared = shared_matrix.pack(self.colored_matrix)
+
+    def test_engines(self):
+        puzzle = EngineEquivalenceTests.puzzle
+        shared = shared_matrix.pack(puzzle.matrix)
+        try:
+            for module in ExactCoverTests.modules:
+                solver = module.ExactCover(
+                    puzzle.matrix, puzzle.secondary_columns)
+                shared_solver = module.ExactCover(
+                    shared, puzzle.secondary_columns)
+                self.assertEquals(list(shared_solver.solve()),
+                                  list(solver.solve()))
+                self.assertEquals(shared_solver.num_searches,
+                                  solver.num_searches)
+        finally:
+            shared.close()
+        solver = exact_cover_bits.ExactCover(self.shared, 1)
+        self.assertEquals(
+            sorted(sorted(solution) for solution in solver.solve()),
+            [[['A', 'x'], ['B', 'x']]])
+
+
+class BoardTests(unittest.TestCase):
+
+    """The board engine, checked against the bits engine."""
+
+    def solutions(self, module, matrix, secondary=0):
+        solver = module.ExactCover(matrix, secondary)
+        return sorted(sorted(solution) for solution in solver.solve())
+
+    def test_matches_bits(self):
+        for matrix in (EngineEquivalenceTests.puzzle.matrix,
+                       PruningTests.puzzle.matrix):
+            solver = exact_cover_board.ExactCover(matrix)
+            self.assert_(solver.anchors is not None)
+            solutions = self.solutions(exact_cover_bits, matrix)
+            self.assert_(solutions)
+            self.assertEquals(self.solutions(exact_cover_board, matrix),
+                              solutions)
+
+    def test_fallback(self):
+        for matrix, secondary in ((ExactCoverTests.matrix, 0),
+                                  (ExactCoverTests.secondary_matrix, 2)):
+            solver = exact_cover_board.ExactCover(matrix, secondary)
+            self.assertEquals(solver.anchors, None)
+            solutions = list(solver.solve())
+            bits_solver = exact_cover_bits.ExactCover(matrix, secondary)
+            self.assertEquals(solutions, list(bits_solver.solve()))
+            self.assertEquals(solver.num_searches, bits_solver.num_searches)
+
+    def test_resume(self):
+        matrix = EngineEquivalenceTests.puzzle.matrix
+        solutions = list(exact_cover_board.ExactCover(matrix).solve())
+        solver = exact_cover_board.ExactCover(matrix)
+        generator = solver.solve()
+        for i in range(100):
+            generator.next()
+        state = State(list(solver.solution))
+        solver = exact_cover_board.ExactCover(matrix, state=state)
+        self.assertEquals(list(solver.solve()), solutions[99:])
+
+    def test_max_searches(self):
+        solver = exact_cover_board.ExactCover(
+            EngineEquivalenceTests.puzzle.matrix)
+        solver.max_searches = 100
+        list(solver.solve())
+        self.assertEquals(solver.num_searches, 100)
+
+    def test_pruning(self):
+        puzzle = PruningTests.puzzle
+        solver = exact_cover_board.ExactCover(puzzle.matrix)
+        solutions = list(solver.solve())
+        pruned = exact_cover_board.ExactCover()
+        pruned.pruning_check = puzzle.pruning_check()
+        pruned.load_matrix(puzzle.matrix)
+        self.assertEquals(list(pruned.solve()), solutions)
+        self.assert_(pruned.num_searches < solver.num_searches)
+
+    def test_strategy(self):
+        self.assertRaises(strategies.StrategyError,
+                          exact_cover_board.ExactCover, strategy='scan')
+
+
+class ImplicitTests(unittest.TestCase):
+
+    """The implicit-matrix engine, checked against the board engine."""
+
+    def implicit_solver(self, puzzle_class, state=None):
+        puzzle = puzzle_class(init_puzzle=False)
+        puzzle.init_puzzle(implicit=True)
+        self.assert_(puzzle.implicit_matrix)
+        self.assertEquals(len(puzzle.matrix), 1)
+        solver = exact_cover_implicit.ExactCover(state=state)
+        solver.load_puzzle(puzzle)
+        return solver
+
+    def test_matches_board(self):
+        for puzzle_class in (Tetrahexes4x7, SomaCrystal):
+            solver = self.implicit_solver(puzzle_class)
+            board_solver = exact_cover_board.ExactCover(
+                puzzle_class().matrix)
+            solutions = list(board_solver.solve())
+            self.assert_(solutions)
+            self.assertEquals(list(solver.solve()), solutions)
+            self.assertEquals(solver.num_searches, board_solver.num_searches)
+
+    def test_fallback(self):
+        puzzle = Pentominoes3x20(init_puzzle=False)
+        puzzle.init_puzzle(implicit=True)
+        self.failIf(puzzle.implicit_matrix)
+        solver = exact_cover_implicit.ExactCover()
+        solver.load_puzzle(puzzle)
+        self.assertEquals(
+            list(solver.solve()),
+            list(exact_cover_board.ExactCover(puzzle.matrix).solve()))
+
+    def test_resume(self):
+        solutions = list(self.implicit_solver(Tetrahexes4x7).solve())
+        solver = self.implicit_solver(Tetrahexes4x7)
+        generator = solver.solve()
+        for i in range(4):
+            generator.next()
+        state = State(list(solver.solution))
+        solver = self.implicit_solver(Tetrahexes4x7, state=state)
+        self.assertEquals(list(solver.solve()), solutions[3:])
+
+    def test_placement_cache(self):
+        solutions = list(self.implicit_solver(Tetrahexes4x7).solve())
+        solver = self.implicit_solver(Tetrahexes4x7)
+        solver.placement_cache_size = 2
+        self.assertEquals(list(solver.solve()), solutions)
+        self.assertEquals(len(solver.placement_cache), 2)
+
+    def test_max_searches(self):
+        solver = self.implicit_solver(SomaCrystal)
+        solver.max_searches = 100
+        list(solver.solve())
+        self.assertEquals(solver.num_searches, 100)
+
+    def test_strategy(self):
+        self.assertRaises(strategies.StrategyError,
+                          exact_cover_implicit.ExactCover, strategy='scan')
+
+
+class ZDDTests(unittest.TestCase):
+
+    """The ZDD engine, on Soma3x3x3 (240 solutions)."""
+
+    puzzle = EngineEquivalenceTests.puzzle
+
+    def test_simple(self):
+        solutions = ExactCoverTests('test_simple').solutions
+        self.assertEquals(
+            solutions(exact_cover_zdd, ExactCoverTests.matrix),
+            [[['A', 'D'], ['B', 'G'], ['C', 'E', 'F']]])
+        self.assertEquals(
+            solutions(exact_cover_zdd, ExactCoverTests.secondary_matrix,
+                      secondary=2),
+            [[['A', 'x'], ['B', 'y'], ['C']]])
+
+    def test_matches_bits(self):
+        matrix = self.puzzle.matrix
+        solver = exact_cover_bits.ExactCover(matrix)
+        solutions = list(solver.solve())
+        solver = exact_cover_zdd.ExactCover(matrix)
+        self.assertEquals(list(solver.solve()), solutions)
+        # shared sub-diagrams are searched once:
+        self.assert_(solver.num_searches < 4224)
+        zdd = solver.zdd
+        self.assertEquals(zdd.count(), 240)
+        self.assertEquals(list(zdd.solutions()), solutions)
+        self.assertEquals(zdd.solution(99), solutions[99])
+        self.assertRaises(IndexError, zdd.path, 240)
+        self.assert_(zdd.sample(random.Random(1)) in solutions)
+
+    def test_resume(self):
+        matrix = self.puzzle.matrix
+        solver = exact_cover_zdd.ExactCover(matrix)
+        solutions = list(solver.solve())
+        solver = exact_cover_zdd.ExactCover(matrix)
+        generator = solver.solve()
+        for i in range(100):
+            generator.next()
+        state = State(list(solver.solution))
+        solver = exact_cover_zdd.ExactCover(matrix, state=state)
+        self.assertEquals(list(solver.solve()), solutions[99:])
+
+    def test_max_searches(self):
+        solver = exact_cover_zdd.ExactCover(self.puzzle.matrix)
+        solver.max_searches = 100
+        self.assertEquals(list(solver.solve()), [])
+        self.assertEquals(solver.num_searches, 100)
+        self.assertEquals(solver.zdd, None)
+
+    def test_save(self):
+        solver = exact_cover_zdd.ExactCover(self.puzzle.matrix)
+        solver.build_zdd()
+        path = tempfile.mktemp()
+        try:
+            exact_cover_zdd.write_diagrams(path, [solver.zdd])
+            zdd, = exact_cover_zdd.read_diagrams(path)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+        self.assertEquals(list(zdd.solutions()), list(solver.zdd.solutions()))
+        self.assertEquals(zdd.count(), 240)
+        # the unique table is rebuilt:
+        self.assertEquals(zdd.node(zdd.label[2], zdd.lo[2], zdd.hi[2]), 2)
+
+    def test_multiplicities(self):
+        self.assertRaises(
+            ValueError, exact_cover_zdd.ExactCover().load_matrix,
+            ExactCoverTests.matrix, multiplicities={'A': (2, 2)})
+
+
+class StrategyEngineTests(unittest.TestCase):
+
+    """Column selection strategies, on Tetrominoes5x4Tube (7 solutions)."""
+
+    puzzle = Tetrominoes5x4Tube()
+
+    def test_strategies(self):
+        solver = exact_cover_x2.ExactCover(
+            self.puzzle.matrix, self.puzzle.secondary_columns)
+        solutions = sorted(sorted(solution) for solution in solver.solve())
+        for strategy in strategies.choices:
+            results = []
+            for module in ExactCoverTests.modules:
+                solver = module.ExactCover(
+                    self.puzzle.matrix, self.puzzle.secondary_columns,
+                    strategy=strategy)
+                found = list(solver.solve())
+                self.assertEquals(
+                    sorted(sorted(solution) for solution in found), solutions)
+                results.append(solver.num_searches)
+            if strategy != strategies.default:
+                # strategy keys are unique; no engine-specific tie-breaking:
+                self.assertEquals(len(set(results)), 1, (strategy, results))
+
+    def test_strategy_resume(self):
+        matrix = self.puzzle.matrix
+        for module in ExactCoverTests.modules:
+            solver = module.ExactCover(matrix, strategy='pieces')
+            solutions = list(solver.solve())
+            solver = module.ExactCover(matrix, strategy='pieces')
+            generator = solver.solve()
+            for i in range(3):
+                generator.next()
+            state = State(list(solver.solution))
+            solver = module.ExactCover(matrix, state=state, strategy='pieces')
+            self.assertEquals(list(solver.solve()), solutions[2:])
+
+
+class StrategyTests(unittest.TestCase):
+
+    names = ['L', 'I', '0,1', '1,0', '0,0', '10,0', '2,0', '0,0i']
+
+    def test_position_order(self):
+        keys, weight = strategies.column_keys('position', self.names, 5)
+        self.assertEquals(weight, len(self.names))
+        self.assertEquals(
+            [name for key, name in sorted(zip(keys, self.names))],
+            ['I', 'L', '0,0', '0,0i', '0,1', '1,0', '2,0', '10,0'])
+
+    def test_pieces_first(self):
+        keys, weight = strategies.column_keys('pieces', self.names, 5)
+        # a piece column with all 5 rows beats an empty cell column:
+        self.assert_(keys[0] + 5 * weight < keys[4])
+
+    def test_scan_ignores_size(self):
+        keys, weight = strategies.column_keys('scan', self.names, 5)
+        self.assertEquals(weight, 0)
+        self.assertEquals(min(keys), keys[4])
+
+    def test_native(self):
+        self.assertRaises(strategies.StrategyError, strategies.column_keys,
+                          strategies.default, self.names, 5)
+        self.assertRaises(strategies.StrategyError, strategies.column_keys,
+                          'bogus', self.names, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,16 +5,27 @@
 # Copyright: (C) 1998-2015 by David J. Goodger
 # License: GPL 2 (see alltests.py)
 
+import os
 import sys
 import copy
+import socket
+import tempfile
 import unittest
+import multiprocessing
 from cStringIO import StringIO
 from pprint import pprint, pformat
 
 import puzzler.puzzles
+import puzzler.puzzles.hexiamonds
+import puzzler.puzzles.hexominoes
 import puzzler.puzzles.pentominoes
+import puzzler.puzzles.polyominoes
 import puzzler.puzzles.polytrigs
+import puzzler.puzzles.somacubes
+import puzzler.puzzles.tetrahexes
+import puzzler.puzzles.tritrigs
 from puzzler import coordsys
+from puzzler import distributed
 
 
 class Struct:
@@ -25,6 +36,19 @@ class Struct:
         self.__dict__.update(keyword_args)
 
 
+def run_settings(**keyword_args):
+    """
+    Return the `puzzler.run` settings for a plain search with `-a bits`,
+    updated with `keyword_args`.
+    """
+    settings = Struct(
+        read_solution=None, report_search_state=False,
+        algorithm='bits', strategy=None, dry_run=False, stop_after=None,
+        svg=None, x3d=None, search_state_file=None)
+    settings.__dict__.update(keyword_args)
+    return settings
+
+
 class MockPuzzle(puzzler.puzzles.Puzzle2D):
 
     height = 4
@@ -170,6 +194,530 @@ class Polytrig_Test_Puzzle(puzzler.puzzles.polytrigs.Polytrigs12):
 #         return 'test'
 
 
+class DoubleTetrominoes_Test_Puzzle(puzzler.puzzles.polyominoes.Tetrominoes):
+
+    """Two sets of the I, L & O tetrominoes in a 6x4 rectangle."""
+
+    width = 6
+    height = 4
+
+    duplicate_pieces = {'i4': 'I4', 'l4': 'L4', 'o4': 'O4'}
+
+    def customize_piece_data(self):
+        del self.piece_data['T4'], self.piece_data['Z4']
+        for name in ('I4', 'L4', 'O4'):
+            self.piece_data[name.lower()] = copy.deepcopy(
+                self.piece_data[name])
+            self.piece_colors[name.lower()] = self.piece_colors[name]
+
+    def coordinates(self):
+        return self.coordinates_rectangle(self.width, self.height)
+
+
+class MultiplicitiesTests(unittest.TestCase):
+
+    def test_duplicate_pieces(self):
+        counts = []
+        for multiplicities in (False, True):
+            puzzle = DoubleTetrominoes_Test_Puzzle(
+                multiplicities=multiplicities)
+            solver = puzzler.exact_cover_bits.ExactCover()
+            puzzler.load_matrix(solver, puzzle)
+            counts.append(len(list(solver.solve())))
+        self.assertEquals(
+            puzzle.column_multiplicities,
+            {'I4': (2, 2), 'L4': (2, 2), 'O4': (2, 2)})
+        # each solution is found once, not once per permutation of the
+        # three pairs of identical pieces:
+        self.assertEquals(counts, [92 * 2 ** 3, 92])
+
+    def test_hexominoes_plus(self):
+        puzzle = puzzler.puzzles.hexominoes.HexominoesPlus18x12(
+            init_puzzle=False, multiplicities=True)
+        self.assert_('S16' not in puzzle.piece_data)
+        self.assertEquals(puzzle.column_multiplicities, {'N06': (2, 2)})
+        puzzle = puzzler.puzzles.hexominoes.HexominoesPlus18x12(
+            init_puzzle=False)
+        self.assert_('S16' in puzzle.piece_data)
+        self.assertEquals(puzzle.column_multiplicities, {})
+
+    def test_piece_multiplicities(self):
+
+        class Optional_Test_Puzzle(DoubleTetrominoes_Test_Puzzle):
+            piece_multiplicities = {'O4': (0, 2)}
+
+        self.assertRaises(ValueError, Optional_Test_Puzzle)
+        puzzle = Optional_Test_Puzzle(multiplicities=True)
+        self.assertEquals(puzzle.column_multiplicities['O4'], (0, 2))
+        # engines without multiplicities are refused cleanly:
+        self.assertRaises(SystemExit, puzzler.run, Optional_Test_Puzzle,
+                          output_stream=StringIO(),
+                          settings=run_settings(algorithm='x2'))
+
+
+class PruningTests(unittest.TestCase):
+
+    def test_pruning_checks(self):
+        for puzzle_class in (
+                puzzler.puzzles.pentominoes.Pentominoes3x20,
+                puzzler.puzzles.hexiamonds.Hexiamonds3x12,
+                puzzler.puzzles.tetrahexes.Tetrahexes4x7,
+                puzzler.puzzles.somacubes.Soma3x3x3):
+            puzzle = puzzle_class()
+            solver = puzzler.exact_cover_bits.ExactCover()
+            solver.pruning_check = puzzle.pruning_check()
+            puzzler.load_matrix(solver, puzzle)
+            self.assert_(solver.dead_end is not None, puzzle_class.__name__)
+        self.assertEquals(Polytrig_Test_Puzzle().pruning_check(), None)
+
+    def test_prune(self):
+        settings = run_settings(prune=True, algorithm=None)
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(puzzler.puzzles.pentominoes.Pentominoes3x20,
+                        output_stream=stream, settings=settings), 2)
+        self.assertEquals(settings.algorithm, 'bits')
+        self.assert_(' pruned), ' in stream.getvalue())
+
+
+def solutions(output):
+    """Return the solution records of `output`, without the final report."""
+    output = output[:output.rindex('\n\n')]
+    return output.split('\nsolution ')[1:]
+
+
+class InterruptedStream:
+
+    """An output stream interrupted by the user before writing `text`."""
+
+    def __init__(self, text):
+        self.text = text
+        self.stream = StringIO()
+
+    def write(self, text):
+        if text.startswith(self.text):
+            raise KeyboardInterrupt
+        self.stream.write(text)
+
+    def flush(self):
+        pass
+
+
+class Pentominoes3x20Twice(puzzler.puzzles.pentominoes.Pentominoes3x20):
+
+    """Two identical components, for parallel component searches."""
+
+    @classmethod
+    def components(cls):
+        return (Pentominoes3x20A, Pentominoes3x20B)
+
+
+class Pentominoes3x20A(Pentominoes3x20Twice):
+
+    pass
+
+
+class Pentominoes3x20B(Pentominoes3x20Twice):
+
+    pass
+
+
+class ParallelTests(unittest.TestCase):
+
+    def settings(self, **keyword_args):
+        keyword_args.setdefault('jobs', 2)
+        return run_settings(**keyword_args)
+
+    def test_matches_solve(self):
+        puzzle_class = puzzler.puzzles.pentominoes.Pentominoes3x20
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(puzzle_class, output_stream=stream,
+                        settings=self.settings(jobs=None)), 2)
+        single = stream.getvalue()
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(puzzle_class, output_stream=stream,
+                        settings=self.settings()), 2)
+        output = stream.getvalue()
+        self.assert_(' subtrees with 2 processes\n' in output)
+        self.assertEquals(solutions(output), solutions(single))
+        # the searches are counted once:
+        self.assertEquals(output.splitlines()[-1].split(', duration')[0],
+                          single.splitlines()[-1].split(', duration')[0])
+
+    def test_algorithm(self):
+        # the board filler's search tree differs from the subtree split's:
+        self.assertRaises(
+            SystemExit, puzzler.run,
+            puzzler.puzzles.pentominoes.Pentominoes3x20,
+            output_stream=StringIO(),
+            settings=self.settings(algorithm='board'))
+        # but components are searched whole:
+        stream = StringIO()
+        puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                    settings=self.settings(algorithm='board', jobs=None))
+        single = stream.getvalue()
+        stream = StringIO()
+        puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                    settings=self.settings(algorithm='board'))
+        self.assertEquals(solutions(stream.getvalue()), solutions(single))
+        # an algorithm supporting the split is chosen by default:
+        settings = self.settings(algorithm=None)
+        puzzler.choose_algorithm(Pentominoes3x20Twice, settings)
+        self.assert_(puzzler.exact_cover_modules[
+            settings.algorithm].ExactCover.subtrees)
+
+    def test_modes(self):
+        # incompatible or ignored options are refused:
+        for options in (dict(count=True), dict(zdd='puzzle.zdd'),
+                        dict(first=True, jobs=None, prune=True),
+                        dict(count=True, jobs=None, algorithm='dlx'),
+                        dict(shard='1/2')):
+            self.assertRaises(
+                SystemExit, puzzler.run,
+                puzzler.puzzles.pentominoes.Pentominoes3x20,
+                output_stream=StringIO(), settings=self.settings(**options))
+
+    def test_stop_after(self):
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(puzzler.puzzles.pentominoes.Pentominoes3x20,
+                        output_stream=stream,
+                        settings=self.settings(stop_after=1)), 1)
+        self.assert_('User-requested solution limit reached.'
+                     in stream.getvalue())
+
+    def test_resume(self):
+        puzzle_class = puzzler.puzzles.pentominoes.Pentominoes3x20
+        state_path = tempfile.mktemp()
+        try:
+            stream = InterruptedStream('solution 2:')
+            self.assertRaises(
+                SystemExit, puzzler.run, puzzle_class, output_stream=stream,
+                settings=self.settings(search_state_file=state_path))
+            state = puzzler.SessionState.restore(state_path, read_only=True)
+            self.assert_(state.subtrees)
+            # the interrupted subtree is searched again:
+            stream = StringIO()
+            self.assertEquals(
+                puzzler.run(puzzle_class, output_stream=stream,
+                            settings=self.settings(
+                                search_state_file=state_path)), 2)
+            output = stream.getvalue()
+            self.assert_(output.startswith('\nResuming session ('))
+            self.assert_('\n2 solutions, 4818 searches, ' in output)
+            self.assertFalse(os.path.exists(state_path))
+        finally:
+            if os.path.exists(state_path):
+                os.unlink(state_path)
+
+    def test_components(self):
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                        settings=self.settings(jobs=None)), 4)
+        single = stream.getvalue()
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                        settings=self.settings()), 4)
+        output = stream.getvalue()
+        self.assert_(output.startswith(
+            'searching 2 components with 2 processes, largest first '
+            '(Pentominoes3x20A, Pentominoes3x20B)\n'))
+        self.assertEquals(solutions(output), solutions(single))
+        self.assertEquals(output.split(', duration')[1].splitlines()[1:],
+                          single.split(', duration')[1].splitlines()[1:])
+
+    def test_components_resume(self):
+        state_path = tempfile.mktemp()
+        try:
+            stream = InterruptedStream('solution 3:')
+            self.assertRaises(
+                SystemExit, puzzler.run, Pentominoes3x20Twice,
+                output_stream=stream,
+                settings=self.settings(search_state_file=state_path))
+            state = puzzler.SessionState.restore(state_path, read_only=True)
+            self.assertEquals(state.completed_components,
+                              set(['Pentominoes3x20A']))
+            self.assertEquals(state.num_solutions, 2)
+            stream = StringIO()
+            self.assertEquals(
+                puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                            settings=self.settings(
+                                search_state_file=state_path)), 4)
+            output = stream.getvalue()
+            self.assert_('\nsolving Pentominoes3x20B:\n' in output)
+            self.assertFalse('Pentominoes3x20A' in output)
+            self.assertEquals(len(solutions(output)), 2)
+        finally:
+            if os.path.exists(state_path):
+                os.unlink(state_path)
+
+
+class DistributedTests(unittest.TestCase):
+
+    def items(self):
+        return [distributed.WorkItem((0, 0), 0, [[1]]),
+                distributed.WorkItem((0, 1), 0, [[2]])]
+
+    def test_split(self):
+        coordinator = distributed.Coordinator({}, self.items())
+        self.assertEquals(coordinator.request_work('a'), (0, 0, [[1]]))
+        self.assertEquals(coordinator.request_work('b'), (1, 0, [[2]]))
+        # no work left; the busy workers are asked to split theirs:
+        self.assertEquals(coordinator.request_work('c'), 'wait')
+        self.assertEquals(coordinator.heartbeat('a', 0), True)
+        self.assert_(coordinator.split('a', 0, [[1, 3]], [[1, 4], [1, 5]], 1))
+        self.assertEquals(coordinator.heartbeat('a', 0), False)
+        self.assertEquals(coordinator.request_work('c'),
+                          (2, 0, [[1, 4], [1, 5]]))
+        for worker, item_id, rows in (('c', 2, [1, 4]), ('b', 1, [2]),
+                                      ('a', 0, [1, 3])):
+            self.assert_(coordinator.submit(worker, item_id, [rows], 10, 0))
+        self.assertEquals(
+            [(item.key, item.result) for item in coordinator.pop_results(0)],
+            [((0, 0), ([[1, 3]], 11, 0)),
+             ((0, 0, -1), ([[1, 4]], 10, 0)),
+             ((0, 1), ([[2]], 10, 0))])
+        self.assertFalse(coordinator.pending())
+
+    def test_lost_worker(self):
+        coordinator = distributed.Coordinator({}, self.items())
+        self.assertEquals(coordinator.request_work('a')[0], 0)
+        self.assertEquals(coordinator.request_work('b')[0], 1)
+        coordinator.last_seen['a'] -= distributed.worker_timeout + 1
+        self.assertEquals(coordinator.reissue_lost(), set(['a']))
+        self.assertEquals(coordinator.request_work('c')[0], 0)
+        # a late result is ignored:
+        self.assertEquals(coordinator.heartbeat('a', 0), None)
+        self.assertFalse(coordinator.submit('a', 0, [[1]], 10, 0))
+        self.assert_(coordinator.submit('c', 0, [[1]], 10, 0))
+
+    def test_algorithm(self):
+        # the board filler's search tree differs from the subtree split's:
+        self.assertRaises(
+            SystemExit, puzzler.run, Pentominoes3x20Twice,
+            output_stream=StringIO(),
+            settings=run_settings(algorithm='board',
+                                  coordinator='127.0.0.1:0'))
+
+    def test_authkey(self):
+        # workers need the coordinator's key; there is no default:
+        self.assertRaises(
+            SystemExit, puzzler.run, Pentominoes3x20Twice,
+            output_stream=StringIO(),
+            settings=run_settings(worker='127.0.0.1:1', algorithm=None))
+
+    def test_coordinated(self):
+        stream = StringIO()
+        puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                    settings=run_settings())
+        single = stream.getvalue()
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        address = '127.0.0.1:%s' % listener.getsockname()[1]
+        listener.close()
+        devnull = open(os.devnull, 'w')
+        workers = [
+            multiprocessing.Process(
+                target=puzzler.run,
+                args=(Pentominoes3x20Twice, devnull,
+                      run_settings(worker=address, authkey='test',
+                                   algorithm=None)))
+            for i in range(2)]
+        try:
+            for worker in workers:
+                worker.start()
+            stream = StringIO()
+            self.assertEquals(
+                puzzler.run(Pentominoes3x20Twice, output_stream=stream,
+                            settings=run_settings(coordinator=address,
+                                                  authkey='test')), 4)
+        finally:
+            for worker in workers:
+                worker.join(10)
+                if worker.is_alive():
+                    worker.terminate()
+            devnull.close()
+        output = stream.getvalue()
+        self.assert_(output.startswith('coordinating '))
+        self.assertEquals(solutions(output), solutions(single))
+        self.assertEquals(output.split(', duration')[1].splitlines()[1:],
+                          single.split(', duration')[1].splitlines()[1:])
+        self.assertEquals(
+            output.split(', duration')[0].splitlines()[-1],
+            single.split(', duration')[0].splitlines()[-1])
+
+
+class ShardTests(unittest.TestCase):
+
+    puzzle_class = puzzler.puzzles.somacubes.SomaSteps
+
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def run_shards(self, num_shards, **keyword_args):
+        """Search the shards; return their log paths and solution counts."""
+        paths = []
+        counts = []
+        for shard in range(1, num_shards + 1):
+            path = tempfile.mktemp()
+            self.paths.append(path)
+            paths.append(path)
+            counts.append(puzzler.run(
+                self.puzzle_class, output_stream=StringIO(),
+                settings=run_settings(
+                    shard='%s/%s' % (shard, num_shards), shard_log=path,
+                    **keyword_args)))
+        return paths, counts
+
+    def merge(self, paths):
+        stream = StringIO()
+        count = puzzler.run(
+            self.puzzle_class, output_stream=stream,
+            settings=run_settings(merge_shards=True, shard_logs=paths,
+                                  algorithm=None))
+        return count, stream.getvalue()
+
+    def test_merge(self):
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(self.puzzle_class, output_stream=stream,
+                        settings=run_settings()), 164)
+        single = stream.getvalue()
+        paths, counts = self.run_shards(3)
+        # duplicates across shards are eliminated by the merge:
+        self.assert_(sum(counts) > 164)
+        count, output = self.merge(paths)
+        self.assertEquals(count, 164)
+        self.assertEquals(output.split('\nsolution 1:')[0],
+                          single.split('\nsolution 1:')[0])
+        self.assertEquals(solutions(output), solutions(single))
+        self.assertEquals(output.split(', duration')[0].splitlines()[-1],
+                          single.split(', duration')[0].splitlines()[-1])
+
+    def test_algorithm(self):
+        self.assertRaises(SystemExit, self.run_shards, 2, algorithm='board')
+        # engines searching in the subtree split's order are supported:
+        stream = StringIO()
+        puzzler.run(self.puzzle_class, output_stream=stream,
+                    settings=run_settings(algorithm='x2'))
+        single = stream.getvalue()
+        output = self.merge(self.run_shards(2, algorithm='x2')[0])[1]
+        self.assertEquals(solutions(output), solutions(single))
+        self.assertEquals(output.split(', duration')[0].splitlines()[-1],
+                          single.split(', duration')[0].splitlines()[-1])
+
+    def test_incomplete(self):
+        paths, counts = self.run_shards(3)
+        self.assertRaises(SystemExit, self.merge, paths[:2])
+        self.assertRaises(SystemExit, self.merge, paths[:2] + paths[1:])
+
+    def test_resume(self):
+        single = self.merge(self.run_shards(2)[0])[1]
+        state_path = tempfile.mktemp()
+        log_path = tempfile.mktemp()
+        self.paths.extend([state_path, log_path])
+        settings = run_settings(shard='1/2', shard_log=log_path,
+                                search_state_file=state_path)
+        self.assertRaises(
+            SystemExit, puzzler.run, self.puzzle_class,
+            output_stream=InterruptedStream('solution 20:'),
+            settings=settings)
+        state = puzzler.SessionState.restore(state_path, read_only=True)
+        self.assertEquals(state.shard, (1, 2, 2))
+        self.assert_(state.subtree_index)
+        stream = StringIO()
+        puzzler.run(self.puzzle_class, output_stream=stream,
+                    settings=copy.copy(settings))
+        self.assert_(stream.getvalue().startswith('\nResuming session ('))
+        self.assertFalse(os.path.exists(state_path))
+        paths = [log_path, self.run_shards(2)[0][1]]
+        self.assertEquals(self.merge(paths)[1].split(', duration')[0],
+                          single.split(', duration')[0])
+
+
+class PreprocessingTests(unittest.TestCase):
+
+    def test_preprocess(self):
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(puzzler.puzzles.pentominoes.Pentominoes3x20,
+                        output_stream=stream,
+                        settings=run_settings(algorithm='dlx',
+                                              preprocess=True)), 2)
+        self.assert_('preprocessing removed 184 of '
+                     in stream.getvalue())
+
+    def test_resume(self):
+        puzzle_class = puzzler.puzzles.pentominoes.Pentominoes3x20
+        state_path = tempfile.mktemp()
+        stream = StringIO()
+        puzzler.run(puzzle_class, output_stream=stream,
+                    settings=run_settings(algorithm='dlx'))
+        # the diagram of the last solution (preprocessing reorders rows):
+        last = solutions(stream.getvalue())[-1].split('\n\n')[-1]
+        try:
+            for preprocess in (True, False):
+                self.assertRaises(
+                    SystemExit, puzzler.run, puzzle_class,
+                    output_stream=InterruptedStream('solution 1:'),
+                    settings=run_settings(
+                        algorithm='dlx', preprocess=preprocess,
+                        search_state_file=state_path))
+                # the saved partial solution indexes the other matrix rows:
+                self.assertRaises(
+                    SystemExit, puzzler.run, puzzle_class,
+                    output_stream=StringIO(),
+                    settings=run_settings(
+                        algorithm='dlx', preprocess=not preprocess,
+                        search_state_file=state_path))
+                stream = StringIO()
+                puzzler.run(puzzle_class, output_stream=stream,
+                            settings=run_settings(
+                                algorithm='dlx', preprocess=preprocess,
+                                search_state_file=state_path))
+                output = stream.getvalue()
+                self.assert_(output.startswith('\nResuming session ('))
+                self.assertEquals(
+                    solutions(output)[-1].split('\n\n')[-1], last)
+                self.assertFalse(os.path.exists(state_path))
+        finally:
+            if os.path.exists(state_path):
+                os.unlink(state_path)
+
+
+class ImplicitMatrixTests(unittest.TestCase):
+
+    def test_supports_implicit_matrix(self):
+        for puzzle_class, supported in (
+                (puzzler.puzzles.tetrahexes.Tetrahexes4x7, True),
+                (puzzler.puzzles.somacubes.SomaCrystal, True),
+                # restricted matrix (symmetry):
+                (puzzler.puzzles.pentominoes.Pentominoes3x20, False),
+                # secondary columns:
+                (Polytrig_Test_Puzzle, False)):
+            puzzle = puzzle_class(init_puzzle=False)
+            puzzle.init_puzzle(implicit=True)
+            self.assertEquals(puzzle.implicit_matrix, supported,
+                              puzzle_class.__name__)
+            self.assertEquals(len(puzzle.matrix) == 1, supported)
+
+    def test_implicit(self):
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(puzzler.puzzles.tetrahexes.Tetrahexes4x7,
+                        output_stream=stream,
+                        settings=run_settings(algorithm='implicit')), 9)
+
+
 class Test_Polytrigs(unittest.TestCase):
 
     def test_details(self):
@@ -261,6 +809,167 @@ V2  \ I1  \
         svg_output = svg_stream.getvalue()
         self.assertEquals(svg_output, self.svg_output)
 
+    def first_settings(self, **keyword_args):
+        settings = dict(
+            read_solution=None, report_search_state=False, first=True,
+            seed=1, algorithm='x2', dry_run=False, svg=None, x3d=None,
+            thin_svg=False)
+        settings.update(keyword_args)
+        return Struct(**settings)
+
+    def test_first(self):
+        outputs = []
+        for i in range(2):
+            stream = StringIO()
+            self.assertEquals(
+                puzzler.run(Polytrig_Test_Puzzle, output_stream=stream,
+                            settings=self.first_settings()), 1)
+            outputs.append(stream.getvalue())
+        self.assert_(outputs[0].startswith('random seed: 1\n'))
+        self.assert_('\nsolution 1:\n' in outputs[0])
+        # reproducible, apart from the duration:
+        self.assertEquals(outputs[0].split('duration')[0],
+                          outputs[1].split('duration')[0])
+
+    def test_first_algorithm(self):
+        # an engine without randomized restarts (like the C extension) first:
+        class ExactCover:
+            restarts = False
+        choices = puzzler.algorithm_choices
+        puzzler.algorithm_choices = ('norestarts',) + choices
+        puzzler.exact_cover_modules['norestarts'] = Struct(
+            ExactCover=ExactCover)
+        try:
+            settings = self.first_settings(algorithm=None)
+            self.assertEquals(
+                puzzler.run(Polytrig_Test_Puzzle, output_stream=StringIO(),
+                            settings=settings), 1)
+            self.assertNotEquals(settings.algorithm, 'norestarts')
+            self.assertRaises(
+                SystemExit, puzzler.run, Polytrig_Test_Puzzle,
+                output_stream=StringIO(),
+                settings=self.first_settings(algorithm='norestarts'))
+        finally:
+            puzzler.algorithm_choices = choices
+            del puzzler.exact_cover_modules['norestarts']
+
+    def test_first_exhausted(self):
+
+        class Unsolvable_Test_Puzzle(Polytrig_Test_Puzzle):
+            width = 4
+
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(Unsolvable_Test_Puzzle, output_stream=stream,
+                        settings=self.first_settings(algorithm='dlx')), 0)
+        self.assert_(' 1 attempt, ' in stream.getvalue())
+
+    def test_portfolio(self):
+        record_path = tempfile.mktemp()
+        settings = run_settings(portfolio=True, portfolio_file=record_path,
+                                algorithm=None, thin_svg=False)
+        stream = StringIO()
+        try:
+            self.assertEquals(
+                puzzler.run(Polytrig_Test_Puzzle, output_stream=stream,
+                            settings=settings), 2)
+            output = stream.getvalue()
+            self.assert_(output.startswith('portfolio: racing '))
+            self.assert_('\nsolving Polytrig_Test_Puzzle:\n' in output)
+            self.assert_('\n2 solutions, ' in output)
+            self.assert_('\nportfolio winner: -a ' in output)
+            records = puzzler.read_portfolio_record(record_path)
+            winner = records[puzzler.portfolio_key(Polytrig_Test_Puzzle)]
+            self.assert_(('\nportfolio winner: -a %s --strategy %s, '
+                          % winner) in output)
+            # later runs use the winner:
+            settings = run_settings(portfolio_file=record_path,
+                                    algorithm=None)
+            puzzler.choose_algorithm(Polytrig_Test_Puzzle, settings)
+            self.assertEquals((settings.algorithm, settings.strategy), winner)
+            self.assertEquals(
+                puzzler.portfolio_configurations(winner)[0], winner)
+        finally:
+            if os.path.exists(record_path):
+                os.unlink(record_path)
+
+    def test_portfolio_dead_worker(self):
+        settings = run_settings(portfolio=True, portfolio_file=None,
+                                algorithm=None, thin_svg=False)
+        portfolio_worker = puzzler.portfolio_worker
+        def dying_worker(puzzle_class, puzzles, settings, index, results):
+            # killed without a result, as by the OOM killer:
+            if index or dead_workers == 'all':
+                os._exit(9)
+            portfolio_worker(puzzle_class, puzzles, settings, index, results)
+        puzzler.portfolio_worker = dying_worker
+        try:
+            dead_workers = 'some'
+            self.assertEquals(
+                puzzler.run(Polytrig_Test_Puzzle, output_stream=StringIO(),
+                            settings=copy.copy(settings)), 2)
+            dead_workers = 'all'
+            self.assertRaises(
+                SystemExit, puzzler.run, Polytrig_Test_Puzzle,
+                output_stream=StringIO(), settings=copy.copy(settings))
+        finally:
+            puzzler.portfolio_worker = portfolio_worker
+
+    def test_count(self):
+        settings = Struct(
+            read_solution=None, report_search_state=False, count=True,
+            cache_size=100, algorithm=None, strategy=None, dry_run=False)
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(Polytrig_Test_Puzzle, output_stream=stream,
+                        settings=settings), 2)
+        self.assert_('\n2 solutions, ' in stream.getvalue())
+
+    def test_zdd(self):
+        zdd_path = tempfile.mktemp()
+        settings = Struct(
+            read_solution=None, report_search_state=False, zdd=zdd_path,
+            algorithm=None, strategy=None, dry_run=False, svg=None, x3d=None)
+        stream = StringIO()
+        try:
+            self.assertEquals(
+                puzzler.run(Polytrig_Test_Puzzle, output_stream=stream,
+                            settings=settings), 2)
+            self.assert_('\n2 solutions, ' in stream.getvalue())
+            diagrams = puzzler.exact_cover_zdd.read_diagrams(zdd_path)
+        finally:
+            if os.path.exists(zdd_path):
+                os.unlink(zdd_path)
+        self.assertEquals([diagram.name for diagram in diagrams],
+                          ['Polytrig_Test_Puzzle'])
+        puzzle = Polytrig_Test_Puzzle(colored_columns=True)
+        solver = puzzler.exact_cover_bits.ExactCover(
+            puzzle.matrix, puzzle.secondary_columns)
+        self.assertEquals(list(diagrams[0].solutions()), list(solver.solve()))
+
+    def test_colored_columns(self):
+        # 9 solutions, 7313 searches:
+        puzzle_class = puzzler.puzzles.tritrigs.OneSidedTritrigsTrilobedCuboid
+        solutions = []
+        for colored in (False, True):
+            puzzle = puzzle_class(colored_columns=colored)
+            solver = puzzler.exact_cover_bits.ExactCover(
+                puzzle.matrix, puzzle.secondary_columns)
+            solutions.append(
+                sorted(puzzle.format_solution(solution)
+                       for solution in solver.solve()))
+        self.assertEquals(len(solutions[0]), 9)
+        self.assertEquals(solutions[0], solutions[1])
+
+    def test_column_strategy(self):
+
+        class Scan_Test_Puzzle(Polytrig_Test_Puzzle):
+            column_strategy = 'scan'
+
+        stream = StringIO()
+        self.assertEquals(
+            puzzler.run(Scan_Test_Puzzle, output_stream=stream), 2)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# $Id$
+
+# Author: David Goodger <goodger@python.org>
+# Copyright: (C) 1998-2015 by David J. Goodger
+# License: GPL 2 (see alltests.py)
+
+import unittest
+
+from puzzler import utils
+
+
+class LubyTests(unittest.TestCase):
+
+    def test_luby(self):
+        self.assertEquals([utils.luby(i) for i in range(1, 16)],
+                          [1, 1, 2, 1, 1, 2, 4, 1, 1, 2, 1, 1, 2, 4, 8])
+        self.assertEquals(utils.luby(2 ** 20 - 1), 2 ** 19)
+
+
+if __name__ == '__main__':
+    unittest.main()